@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = "accounts"
+
+    def ready(self):
+        from accounts import signals
+        from accounts.backends import token_cache
+        from config.metrics import registry
+
+        registry.register_gauges("token_cache", token_cache.stats)
@@ -1,33 +1,160 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.db.models import Case, Q, When
+from django.utils.translation import gettext_lazy as _
 from rest_framework.authtoken.models import Token
 from rest_framework.authentication import TokenAuthentication, get_authorization_header
 from rest_framework import exceptions
+from config.cache import is_process_local
 from config.utils import response_error_handler
 
 
 class UserBackend(ModelBackend):
+    """Log in by username or email with one query and one password hash.
+
+    Emails match case-insensitively (served by the ``UPPER(email)`` index of
+    accounts migration 0003); a username match wins over an email match, and
+    the oldest account wins among shared emails.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        user = super().authenticate(request, username, password, **kwargs)
-        if user:
-            return user
         UserModel = get_user_model()
-
         if username is None:
             username = kwargs.get(UserModel.USERNAME_FIELD, kwargs.get("email"))
-        try:
-            user = UserModel._default_manager.get(email=username)
-        except get_user_model().DoesNotExist:
+        if username is None or password is None:
+            return None
+        user = (
+            UserModel._default_manager.filter(
+                Q(username=username) | Q(email__iexact=username)
+            )
+            .order_by(Case(When(username=username, then=0), default=1), "pk")
+            .first()
+        )
+        if user is None:
+            # hash anyway so unknown users take as long as wrong passwords
             UserModel().set_password(password)
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
 
     def get_token(self, user):
         token = Token.objects.get(user=user)
         return token
 
 
+class TokenCache:
+    """Token -> user snapshot, in a process-local LRU over a shared cache.
+
+    Entries are keyed by the SHA-256 of the token and hold only ``fields``;
+    every lookup builds a fresh user from them, the other columns (the
+    password hash among them) deferred to the database. Local entries live
+    ``local_ttl`` seconds and shared ones ``shared_ttl``. Token deletion and
+    user changes evict the key from the shared cache and this process at
+    once; other processes drop their copy within ``local_ttl``.
+
+    The shared tier is skipped when ``alias`` is process-local (local
+    memory): other workers could not see its evictions.
+    """
+
+    prefix = "auth-token:"
+    fields = ("id", "username", "is_active", "is_staff", "is_superuser")
+
+    def __init__(self, size=2048, local_ttl=30, shared_ttl=300, alias="default"):
+        self.size = size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.counts = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    @property
+    def shared(self):
+        cache = caches[self.alias]
+        return None if is_process_local(cache) else cache
+
+    @staticmethod
+    def digest(key):
+        return sha256(key.encode()).hexdigest()
+
+    def user(self, values):
+        UserModel = get_user_model()
+        return UserModel.from_db(router.db_for_read(UserModel), self.fields, values)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _remember(self, digest, values):
+        with self._lock:
+            self._entries[digest] = (monotonic() + self.local_ttl, values)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        digest = self.digest(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(digest)
+                self.counts["local_hits"] += 1
+                return self.user(entry[1])
+            self._entries.pop(digest, None)
+        shared = self.shared
+        values = shared.get(self.prefix + digest) if shared is not None else None
+        if values is None:
+            self._count("misses")
+            return None
+        self._count("shared_hits")
+        self._remember(digest, values)
+        return self.user(values)
+
+    def set(self, key, user):
+        digest = self.digest(key)
+        values = tuple(getattr(user, field) for field in self.fields)
+        if self.shared is not None:
+            self.shared.set(self.prefix + digest, values, self.shared_ttl)
+        self._remember(digest, values)
+
+    def invalidate(self, *keys):
+        digests = [self.digest(key) for key in keys]
+        if self.shared is not None:
+            self.shared.delete_many([self.prefix + digest for digest in digests])
+        with self._lock:
+            for digest in digests:
+                self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts, size=len(self._entries))
+        lookups = counts["local_hits"] + counts["shared_hits"] + counts["misses"]
+        hits = counts["local_hits"] + counts["shared_hits"]
+        counts["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return counts
+
+
+token_cache = TokenCache(
+    size=getattr(settings, "TOKEN_CACHE_SIZE", 2048),
+    local_ttl=getattr(settings, "TOKEN_CACHE_LOCAL_TTL", 30),
+    shared_ttl=getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+    alias=getattr(settings, "TOKEN_CACHE_ALIAS", "default"),
+)
+
+
 class TokenAuthBackend(TokenAuthentication):
     def authenticate(self, request):
         auth = get_authorization_header(request).split()
@@ -50,3 +177,12 @@ class TokenAuthBackend(TokenAuthentication):
             raise exceptions.AuthenticationFailed(msg)
 
         return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        # unsaved stand-in: request.auth keeps its type without a query
+        return user, Token(key=key, user=user)
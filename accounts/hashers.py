@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor of ``PASSWORD_HASH_ITERATIONS``.
+
+    The algorithm name is unchanged, so existing hashes keep verifying and
+    Django re-encodes them at the configured work factor on the next
+    successful login. Pick the value with ``manage.py benchmark_hasher``.
+    """
+
+    @property
+    def iterations(self):
+        configured = getattr(settings, "PASSWORD_HASH_ITERATIONS", None)
+        return configured or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,43 @@
+import json
+from statistics import median
+from time import perf_counter
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the default password hasher and suggest the PBKDF2 iteration "
+        "count that fits a per-login latency budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=100.0)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--iterations", type=int)
+
+    def time_hash(self, hasher, rounds, iterations):
+        salt = hasher.salt()
+        options = {"iterations": iterations} if iterations else {}
+        timings = []
+        for _ in range(rounds):
+            started = perf_counter()
+            hasher.encode("benchmark-password", salt, **options)
+            timings.append((perf_counter() - started) * 1000)
+        return median(timings)
+
+    def handle(self, *args, **options):
+        hasher = get_hasher()
+        iterations = options["iterations"] or getattr(hasher, "iterations", None)
+        elapsed = self.time_hash(hasher, max(options["rounds"], 1), iterations)
+        result = {
+            "hasher": hasher.algorithm,
+            "iterations": iterations,
+            "median_ms": round(elapsed, 2),
+            "target_ms": options["target_ms"],
+        }
+        if iterations:
+            suggested = int(iterations * options["target_ms"] / elapsed)
+            result["suggested_iterations"] = suggested // 1000 * 1000 or 1000
+        self.stdout.write(json.dumps(result))
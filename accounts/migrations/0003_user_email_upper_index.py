@@ -0,0 +1,37 @@
+from django.db import IntegrityError, migrations, transaction
+
+INDEX = "accounts_user_email_upper"
+
+
+def create_email_index(apps, schema_editor):
+    """Case-insensitive email index serving ``email__iexact`` logins.
+
+    Unique when the existing data allows it; duplicates left over from
+    before the constraint only get a plain index.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    table = connection.ops.quote_name(apps.get_model("accounts", "User")._meta.db_table)
+    statement = "CREATE {} INDEX IF NOT EXISTS %s ON %s (UPPER(email)) WHERE email <> ''"
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(statement.format("UNIQUE") % (INDEX, table))
+    except IntegrityError:
+        schema_editor.execute(statement.format("") % (INDEX, table))
+
+
+def drop_email_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20190717_1238'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -8,3 +8,11 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class UploadClaim(models.Model):
+    """Object key of an upload ticket already attached; one row per key."""
+
+    key = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    claimed_at = models.DateTimeField(auto_now_add=True)
@@ -2,11 +2,17 @@ from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.utils import model_meta
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.serializers import raise_errors_on_nested_writes
 from rest_framework.exceptions import ErrorDetail, ValidationError
+from django.db.models import Exists, OuterRef, Prefetch, Q, Value
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from rest_framework.authtoken.models import Token
+from config import uploads
+from config.fields import FastListSerializer, SparseFieldsetMixin
+from reservations.models import RoomReservation
+from rooms.models import Room
 from config.utils import response_error_handler
 
 
@@ -16,14 +22,19 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
         Token.objects.create(user=instance)
 
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
+        list_serializer_class = FastListSerializer
         fields = ["id", "username", "image", "description"]
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     reservations = serializers.SerializerMethodField()
+    reservations_window = serializers.SerializerMethodField()
+    upload = serializers.CharField(
+        write_only=True, required=False, help_text="ticket of a direct upload"
+    )
 
     class Meta:
         model = get_user_model()
@@ -33,16 +44,78 @@ class UserDetailSerializer(serializers.ModelSerializer):
             "first_name",
             "last_name",
             "image",
+            "upload",
             "description",
             "rooms",
             "reservations",
+            "reservations_window",
         ]
 
+    def update(self, instance, validated_data):
+        ticket = validated_data.pop("upload", None)
+        if ticket:
+            user = self.context.get("request").user
+            key, content_type = uploads.claim(ticket, user, "profile")
+            validated_data["image"] = key
+            users = self.Meta.model.objects.filter(id=instance.id, image=key)
+            uploads.validate_later(key, content_type, lambda: users.update(image=""))
+        return super().update(instance, validated_data)
+
+    @staticmethod
+    def setup_eager_loading(queryset, since=None, until=None, fields=None):
+        """Prefetch reservations starting in ``[since, until)`` with their state.
+
+        ``has_older_reservations`` tells whether history goes back further.
+        ``fields`` leaves out the prefetches of the fields not rendered.
+        """
+        if fields is not None:
+            columns = UserDetailSerializer.sparse_columns(fields)
+            queryset = queryset.only(*columns)
+        window = Q()
+        if since is not None:
+            window &= Q(start_date__gte=since)
+        if until is not None:
+            window &= Q(start_date__lt=until)
+        reservations = (
+            RoomReservation.objects.filter(window)
+            .select_related("room__state")
+            .only("start_date", "end_date", "user", "room__state__name")
+            .order_by("-start_date", "-id")
+        )
+        older = Value(False)
+        if since is not None:
+            older = Exists(
+                RoomReservation.objects.filter(user=OuterRef("pk"), start_date__lt=since)
+            )
+        if fields is None or "reservations_window" in fields:
+            queryset = queryset.annotate(has_older_reservations=older)
+        if fields is None or "reservations" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch("reservations", queryset=reservations)
+            )
+        if fields is None or "rooms" in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch("rooms", queryset=Room.objects.only("id", "host"))
+            )
+        return queryset
+
+    def get_reservations_window(self, obj):
+        """Bounds of the listed reservations and the link to older ones."""
+        view = self.context.get("view")
+        request = self.context.get("request")
+        since, until = view.reservation_window() if view else (None, None)
+        previous = None
+        if getattr(obj, "has_older_reservations", False) and request:
+            previous = replace_query_param(
+                request.build_absolute_uri(), "reservations_until", since.isoformat()
+            )
+        return {"since": since, "until": until, "previous": previous}
+
     def get_reservations(self, obj):
         reservations = obj.reservations.all()
         return [
             {
-                f"{r.room.state.name}-{r.id}": {
+                f"{getattr(r.room.state, 'name', '')}-{r.id}": {
                     "start_date": r.start_date,
                     "end_date": r.end_date,
                     "room": r.room.id,
@@ -103,6 +176,12 @@ class StaffSerializer(serializers.ModelSerializer):
             "is_staff",
         ]
 
+    def validate_email(self, value):
+        users = self.Meta.model.objects.filter(email__iexact=value)
+        if value and users.exists():
+            raise ValidationError("email already registered")
+        return value
+
     def create(self, validated_data):
         key_a = "FBI_I"
         key_b = "FBI_F"
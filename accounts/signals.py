@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from accounts.backends import token_cache
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance=None, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_tokens(sender, instance=None, update_fields=None, **kwargs):
+    # login only touches last_login, which cached users may keep stale
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    keys = Token.objects.filter(user_id=instance.id).values_list("key", flat=True)
+    keys = list(keys)
+    if keys:
+        token_cache.invalidate(*keys)
@@ -1,3 +1,259 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from accounts.backends import TokenAuthBackend, TokenCache, UserBackend, token_cache
+from locations.models import Country, State
+from reservations.models import RoomReservation
+from rooms.models import Room
+
+
+@override_settings(UPLOAD_VALIDATION_WORKERS=0)
+class ProfileUploadTest(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.user = get_user_model().objects.create_user(username="june", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content):
+        ticket = self.client.post(
+            "/api/uploads/",
+            {"kind": "profile", "content_type": "image/jpeg", "size": len(content)},
+        ).json()
+        path = ticket["url"].split("testserver", 1)[-1]
+        self.client.put(path, content, content_type="image/jpeg")
+        data = {"username": "june", "upload": ticket["ticket"]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/api/accounts/user/{self.user.id}/", data)
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        return ticket["key"]
+
+    def test_profile_image_by_ticket(self):
+        buffer = BytesIO()
+        Image.new("RGB", (10, 10)).save(buffer, "JPEG")
+        key = self.upload(buffer.getvalue())
+        self.assertEqual(self.user.image.name, key)
+
+    def test_invalid_upload_is_detached(self):
+        self.upload(b"\xff\xd8 truncated")
+        self.assertEqual(self.user.image.name, "")
+
+
+class TokenCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(username="june", password="pw")
+        self.key = Token.objects.get(user=self.user).key
+        self.backend = TokenAuthBackend()
+
+    def test_repeated_requests_skip_the_lookup(self):
+        with self.assertNumQueries(1):
+            self.backend.authenticate_credentials(self.key)
+        before = token_cache.stats()["local_hits"]
+        with self.assertNumQueries(0):
+            user, token = self.backend.authenticate_credentials(self.key)
+        self.assertEqual((user, token.key), (self.user, self.key))
+        self.assertEqual(token_cache.stats()["local_hits"], before + 1)
+
+    def shared_caches(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        return override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "shared": {"BACKEND": backend, "LOCATION": location},
+            }
+        )
+
+    def test_cache_holds_no_token_or_password(self):
+        with self.shared_caches():
+            tokens = TokenCache(alias="shared")
+            tokens.set(self.key, self.user)
+            shared = caches["shared"]
+            self.assertIsNone(shared.get(tokens.prefix + self.key))
+            values = shared.get(tokens.prefix + tokens.digest(self.key))
+            self.assertEqual(values, (self.user.id, "june", True, False, False))
+        self.backend.authenticate_credentials(self.key)
+        first, _ = self.backend.authenticate_credentials(self.key)
+        second, _ = self.backend.authenticate_credentials(self.key)
+        self.assertIsNot(first, second)
+        self.assertIn("password", first.get_deferred_fields())
+        self.assertTrue(first.check_password("pw"))
+
+    def test_revocation_reaches_other_processes(self):
+        with self.shared_caches():
+            here = TokenCache(alias="shared")
+            there = TokenCache(local_ttl=0, alias="shared")
+            here.set(self.key, self.user)
+            self.assertEqual(there.get(self.key), self.user)
+            here.invalidate(self.key)
+            self.assertIsNone(there.get(self.key))
+
+    def test_local_memory_is_not_shared_between_processes(self):
+        here, there = TokenCache(alias="default"), TokenCache(alias="default")
+        here.set(self.key, self.user)
+        self.assertEqual(here.get(self.key), self.user)
+        self.assertIsNone(there.get(self.key))
+
+    def test_deactivated_user_is_rejected(self):
+        self.backend.authenticate_credentials(self.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.backend.authenticate_credentials(self.key)
+
+    def test_deleted_token_is_rejected(self):
+        self.backend.authenticate_credentials(self.key)
+        Token.objects.filter(key=self.key).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.backend.authenticate_credentials(self.key)
+
+
+@override_settings(
+    PASSWORD_HASHERS=[
+        "accounts.hashers.TunedPBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ],
+    PASSWORD_HASH_ITERATIONS=1000,
+)
+class LoginTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="june", email="June@FBInb.com", password="pw"
+        )
+
+    def login(self, username, password="pw"):
+        return UserBackend().authenticate(None, username=username, password=password)
+
+    def test_username_or_email_in_one_query(self):
+        for username in ("june", "june@fbinb.com", "JUNE@FBINB.COM"):
+            with self.assertNumQueries(1):
+                self.assertEqual(self.login(username), self.user)
+        self.assertIsNone(self.login("june", "wrong"))
+        self.assertIsNone(self.login("nobody"))
+
+    def test_username_match_wins_over_email(self):
+        other = get_user_model().objects.create_user(
+            username="june@fbinb.com", password="other"
+        )
+        self.assertEqual(self.login("june@fbinb.com", "other"), other)
+
+    def test_username_match_wins_over_shared_emails(self):
+        User = get_user_model()
+        User.objects.create_user(username="june2", email="june@fbinb.com")
+        User.objects.create_user(username="june3", email="JUNE@fbinb.com")
+        other = User.objects.create_user(username="june@fbinb.com", password="other")
+        for _ in range(3):
+            self.assertEqual(self.login("june@fbinb.com", "other"), other)
+        self.assertEqual(self.login("JUNE@FBINB.COM"), self.user)
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        self.user.password = make_password("pw", hasher="md5")
+        self.user.save()
+        self.assertEqual(self.login("june"), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+
+class UserListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        for i in range(12):
+            User.objects.create_user(username=f"user{i}", password="pw")
+        cls.staff = User.objects.create_user(
+            username="FBI_I_staff", password="pw", is_staff=True
+        )
+        cls.admin = User.objects.create_superuser(
+            username="FBI_B_admin", email="admin@fbinb.com", password="pw"
+        )
+
+    def test_keyset_pages_visit_every_user_once(self):
+        seen, url, params = [], "/api/accounts/user/", {"page_size": 5}
+        while url:
+            page = self.client.get(url, params).json()
+            seen += [user["username"] for user in page["results"]]
+            url, params = page["next"], None
+        self.assertEqual(sorted(seen), sorted(f"user{i}" for i in range(12)))
+
+    def test_staff_and_admin_lists_check_the_requester(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        self.assertEqual(client.get("/api/accounts/staff/").status_code, 200)
+        self.assertEqual(client.get("/api/accounts/admin/").status_code, 401)
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/accounts/staff/").status_code, 401)
+        results = client.get("/api/accounts/admin/").json()["results"]
+        self.assertEqual([user["username"] for user in results], ["FBI_B_admin"])
+
+    def test_export_streams_json_lines_for_staff(self):
+        client = APIClient()
+        params = {"export": "jsonl"}
+        self.assertEqual(client.get("/api/accounts/user/", params).status_code, 401)
+        client.force_authenticate(self.staff)
+        response = client.get("/api/accounts/user/", params)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 12)
+        self.assertEqual(json.loads(lines[0])["username"], "user0")
+
+
+class UserDetailQueryTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="june", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.country = Country.objects.create(name="Korea")
+
+    def travel(self, trips, days_ago=0):
+        for i in range(trips):
+            state = State.objects.create(name=f"state {i}", country=self.country)
+            room = Room.objects.create(
+                host=self.user, title="room", mobile=0, state=state
+            )
+            start = date.today() - timedelta(days_ago + i)
+            end = start + timedelta(1)
+            RoomReservation.objects.create(
+                user=self.user, room=room, start_date=start, end_date=end
+            )
+
+    def get(self, **params):
+        return self.client.get(f"/api/accounts/user/{self.user.id}/", params)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.travel(1)
+        with self.assertNumQueries(3):
+            self.get()
+        self.travel(20)
+        with self.assertNumQueries(3):
+            response = self.get()
+        self.assertEqual(len(response.json()["reservations"]), 21)
+        self.assertEqual(len(response.json()["rooms"]), 21)
+
+    def test_history_pages_by_date_window(self):
+        self.travel(3)
+        self.travel(2, days_ago=400)
+        data = self.get().json()
+        self.assertEqual(len(data["reservations"]), 3)
+        previous = data["reservations_window"]["previous"]
+        data = self.client.get(previous).json()
+        self.assertEqual(len(data["reservations"]), 2)
+        self.assertIsNone(data["reservations_window"]["previous"])
@@ -1,4 +1,12 @@
-from config.utils import response_error_handler
+from datetime import date, timedelta
+
+from config.metrics import SerializerMetricsMixin
+from config.pagination import KeysetPagination
+from config.utils import (
+    EagerLoadingMixin,
+    JsonLinesExportMixin,
+    response_error_handler,
+)
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.request import Request
@@ -18,18 +26,41 @@ from accounts.serializers import (
     AdminSerializer,
 )
 from django.contrib.auth.models import Group
+from reservations.availability import parse_date
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 
 
-class UserListView(viewsets.generics.ListCreateAPIView):
+class UserKeysetPagination(KeysetPagination):
+    page_size = 50
+    max_page_size = 500
+    ordering = "id"
+
+
+USER_EXPORT_FIELDS = ("id", "username", "image", "description")
+
+
+class UserListView(
+    JsonLinesExportMixin,
+    SerializerMetricsMixin,
+    EagerLoadingMixin,
+    viewsets.generics.ListCreateAPIView,
+):
     """A function, able to get list of user and Create normal user
     
     Arguments:
         viewsets {[ListCreateAPIView]} -- [GET, POST handler]
+    QuerystringOptions:
+        page_size -- [default 50, data amount in page]
+        cursor -- [token from "next" link of previous page]
+        count -- ["true" adds cached total count]
+        export -- ["jsonl" streams every row as JSON lines, staff only]
+        fields -- [default all, comma separated fields to return, id always]
+        omit -- [default none, comma separated fields to leave out]
     Raises:
         ValidationError: [POST-HTTP_400_BAD_REQUEST]
+        PermissionError: [GET-HTTP_401_UNAUTHORIZED, export by non-staff]
     Returns:
         [GET-status] -- [GET-201-HTTP_201_CREATED]
         [POST-status] -- [GET-200-HTTP_200_OK]
@@ -37,6 +68,12 @@ class UserListView(viewsets.generics.ListCreateAPIView):
 
     queryset = get_user_model().objects.filter(is_staff=False)
     permission_classes = (AllowAny,)
+    pagination_class = UserKeysetPagination
+    export_fields = USER_EXPORT_FIELDS
+
+    @response_error_handler
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -49,11 +86,18 @@ class UserListView(viewsets.generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class UserDetailView(viewsets.generics.RetrieveUpdateAPIView):
+class UserDetailView(
+    SerializerMetricsMixin, viewsets.generics.RetrieveUpdateAPIView
+):
     """A function, able to get specific user data and update
     
     Arguments:
         viewsets {[RetirieveUpdateAPIView]} -- [GET, PUT handler]
+    QuerystringOptions:
+        reservations_until -- [default None, list reservations starting before, year-month-day]
+        reservations_days -- [default 365, days of reservation history per window]
+        fields -- [default all, comma separated fields to return, id always]
+        omit -- [default none, comma separated fields to leave out]
     Raises:
         PermissionError: [PUT-HTTP_401_UNAUTHORIZED]
         ValidationError: [PUT-HTTP_400_BAD_REQUEST]
@@ -64,6 +108,7 @@ class UserDetailView(viewsets.generics.RetrieveUpdateAPIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    history_days = 365
 
     def get_serializer_class(self):
         serializer_class = UserDetailSerializer
@@ -74,7 +119,29 @@ class UserDetailView(viewsets.generics.RetrieveUpdateAPIView):
     def get_queryset(self):
         pk = self.kwargs.get("pk", None)
         queryset = get_user_model().objects.filter(id=pk, is_staff=False)
-        return queryset
+        return UserDetailSerializer.setup_eager_loading(
+            queryset,
+            *self.reservation_window(),
+            fields=UserDetailSerializer.sparse_fields(self.request),
+        )
+
+    def reservation_window(self):
+        """``(since, until)`` of the reservation history to list.
+
+        Raises:
+            ValueError: [date format is not right]
+        """
+        if not hasattr(self, "_reservation_window"):
+            params = self.request.query_params
+            until = params.get("reservations_until")
+            until = parse_date(until) if until else None
+            try:
+                days = int(params.get("reservations_days", self.history_days))
+            except ValueError:
+                raise ValueError("reservations_days is not a number", "type in days")
+            since = (until or date.today()) - timedelta(days)
+            self._reservation_window = (since, until)
+        return self._reservation_window
 
     @response_error_handler
     def put(self, request, *args, **kwargs):
@@ -89,7 +156,7 @@ class UserDetailView(viewsets.generics.RetrieveUpdateAPIView):
         return super().get(request, *args, **kwargs)
 
     def validate(self, request):
-        condition_1 = request.user == self.get_queryset()[0]
+        condition_1 = request.user.id == self.kwargs.get("pk")
         condition_2 = request.user.is_staff or request.user.is_superuser
         if condition_1 or condition_2:
             return True
@@ -97,7 +164,9 @@ class UserDetailView(viewsets.generics.RetrieveUpdateAPIView):
             raise PermissionError("you are not user or staff", "do not do that")
 
 
-class AdminListCreateView(viewsets.generics.ListCreateAPIView):
+class AdminListCreateView(
+    JsonLinesExportMixin, viewsets.generics.ListCreateAPIView
+):
     """A function, able to create and list admin user list
     Arguments:
         viewsets {[ListCreateAPIView]} -- [GET, POST handler]
@@ -114,11 +183,12 @@ class AdminListCreateView(viewsets.generics.ListCreateAPIView):
 
     queryset = get_user_model().objects.filter(is_superuser=True)
     permission_classes = (IsAdminUser,)
+    pagination_class = UserKeysetPagination
+    export_fields = USER_EXPORT_FIELDS
 
     @response_error_handler
     def get(self, request, *args, **kwargs):
-        staffs = [_ for _ in self.get_queryset()]
-        if request.user in staffs:
+        if request.user.is_superuser:
             return super().get(request, *args, **kwargs)
         else:
             raise PermissionError("not staff or admin", "login as staff or admin first")
@@ -138,7 +208,9 @@ class AdminListCreateView(viewsets.generics.ListCreateAPIView):
         return serializer_class
 
 
-class StaffListCreateView(viewsets.generics.ListCreateAPIView):
+class StaffListCreateView(
+    JsonLinesExportMixin, viewsets.generics.ListCreateAPIView
+):
     """A function, able to create and list staff user list
     
     Arguments:
@@ -156,11 +228,13 @@ class StaffListCreateView(viewsets.generics.ListCreateAPIView):
 
     queryset = get_user_model().objects.filter(is_staff=True, is_superuser=False)
     permission_classes = (AllowAny,)
+    pagination_class = UserKeysetPagination
+    export_fields = USER_EXPORT_FIELDS
 
     @response_error_handler
     def get(self, request, *args, **kwargs):
-        staffs = [_ for _ in self.get_queryset()]
-        if request.user in staffs:
+        # same rows as the queryset: staff members who are not admins
+        if request.user.is_staff and not request.user.is_superuser:
             return super().get(request, *args, **kwargs)
         else:
             raise PermissionError("not staff or admin", "login as staff or admin first")
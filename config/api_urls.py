@@ -2,6 +2,7 @@ from accounts.urls import urlpatterns as accounts_router
 from locations.urls import urlpatterns as locations_router
 from rooms.urls import urlpatterns as rooms_router
 from reservations.urls import urlpatterns as reservations_router
+from config.uploads import UploadPutView, UploadTicketView
 from django.urls import include, path
 
 urlpatterns = [
@@ -9,4 +10,6 @@ urlpatterns = [
     path("rooms/", include(rooms_router), name="rooms"),
     path("locations/", include(locations_router), name="locations"),
     path("reservations/", include(reservations_router), name="reservations"),
+    path("uploads/", UploadTicketView.as_view()),
+    path("uploads/<str:ticket>/", UploadPutView.as_view()),
 ]
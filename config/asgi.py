@@ -0,0 +1,19 @@
+"""
+ASGI config for config project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Room list/detail and the locations endpoints are served through the async
+adapters of ``config.async_views``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('FBINB_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
@@ -0,0 +1,106 @@
+"""Async adapters for the read-heavy views, served by ``config.asgi``.
+
+A WSGI worker holds one request until its database and storage round-trips
+are done. Under ASGI, Django runs a plain sync view on a new thread per
+request, so concurrency is unbounded and every request opens its own
+database connection. ``to_async`` turns a sync view into a coroutine that
+runs it on a bounded thread pool instead: a process keeps up to
+``ASYNC_VIEW_WORKERS`` requests in flight, and each pool thread reuses its
+database connection (subject to ``CONN_MAX_AGE``), which caps connections
+per process.
+
+``serve`` and ``asyncify`` pick the adapter only when ``ASYNC_VIEWS`` is on,
+which ``config/asgi.py`` does; under WSGI the urls keep the sync views.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+from config.metrics import install_all
+
+_executor = None
+_executor_lock = Lock()
+
+
+def enabled():
+    return getattr(settings, "ASYNC_VIEWS", False)
+
+
+def workers():
+    return getattr(settings, "ASYNC_VIEW_WORKERS", 32)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers(), thread_name_prefix="views")
+        return _executor
+
+
+def _call(view, request, args, kwargs):
+    # the request_started/finished signals fire on the event loop thread,
+    # so connection upkeep for the pool thread happens here
+    close_old_connections()
+    install_all()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def to_async(view):
+    """Coroutine view running the sync ``view`` on the bounded pool."""
+    if iscoroutinefunction(view):
+        return view
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(), context.run, _call, view, request, args, kwargs
+        )
+
+    return async_view
+
+
+def serve(view):
+    return to_async(view) if enabled() else view
+
+
+def asyncify(patterns, force=False):
+    """Copy of url ``patterns`` with every view passed through ``serve``.
+
+    ``force`` adapts the views whatever ``ASYNC_VIEWS`` says.
+    """
+    adapt = to_async if force else serve
+    adapted = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                asyncify(pattern.url_patterns, force),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif isinstance(pattern, URLPattern):
+            pattern = URLPattern(
+                pattern.pattern,
+                adapt(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        adapted.append(pattern)
+    return adapted
@@ -0,0 +1,128 @@
+"""Response cache for anonymous reads, invalidated by version tags.
+
+A cached entry remembers the version of every tag it depends on (``room:1``,
+``term:<md5 of the term>``, ``rooms`` ...). Writers bump tag versions from
+model signals; an entry is served only while all of its tag versions are
+unchanged, so an edit invalidates exactly the pages that could show it.
+"""
+from hashlib import md5
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.request import Request
+
+TAG_PREFIX = "response-tag:"
+ENTRY_PREFIX = "response:"
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def is_process_local(cache):
+    """True for backends every worker process keeps to itself."""
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+def tag_versions(tags):
+    cache = get_cache()
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump(*tags):
+    """Invalidate every cached response depending on any of ``tags``."""
+    get_cache().set_many({TAG_PREFIX + tag: uuid4().hex for tag in tags}, None)
+
+
+def term_tags(terms, prefix=""):
+    # search terms are user input: hash them so keys stay short and safe
+    return [f"{prefix}term:{md5(term.encode()).hexdigest()}" for term in terms]
+
+
+class CachedResponseMixin:
+    """Serve anonymous GETs from the response cache, with ETag/304 support.
+
+    Views list the tags a response depends on in ``get_cache_tags``, which
+    receives the DRF request before the view runs: their versions are read
+    first, so a write landing while the response is built leaves the entry
+    stale rather than fresh. Hits replay the stored headers.
+    """
+
+    cache_timeout = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+
+    def get_cache_tags(self, request):
+        return ["rooms"]
+
+    def is_cacheable(self, request):
+        return request.method in ("GET", "HEAD") and not request.META.get(
+            "HTTP_AUTHORIZATION"
+        )
+
+    def get_cache_key(self, request):
+        query = urlencode(
+            sorted((k, v) for k, values in request.GET.lists() for v in values)
+        )
+        accept = request.META.get("HTTP_ACCEPT", "")
+        raw = f"{request.path}?{query}|{accept}".encode()
+        return ENTRY_PREFIX + md5(raw).hexdigest()
+
+    def cached_entry(self, key):
+        entry = get_cache().get(key)
+        if entry is None:
+            return None
+        versions = get_cache().get_many(list(entry["tags"]))
+        if versions != entry["tags"]:
+            return None
+        return entry
+
+    def replay(self, entry):
+        response = HttpResponse(entry["content"])
+        for name, value in entry["headers"].items():
+            response[name] = value
+        return response
+
+    def conditional(self, request, etag, response_factory):
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = response_factory()
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        entry = self.cached_entry(key)
+        if entry is not None:
+            return self.conditional(
+                request, entry["etag"], lambda: self.replay(entry)
+            )
+
+        tags = tag_versions(self.get_cache_tags(Request(request)))
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response.render()
+        etag = '"%s"' % md5(response.content).hexdigest()
+        entry = {
+            "content": response.content,
+            "headers": dict(response.items()),
+            "etag": etag,
+            "tags": tags,
+        }
+        get_cache().set(key, entry, self.cache_timeout)
+        return self.conditional(request, etag, lambda: response)
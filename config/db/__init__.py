@@ -0,0 +1,307 @@
+"""Persistent and pooled database connections.
+
+``config.db.postgresql`` and ``config.db.sqlite3`` are the stock backends
+with an optional per-process connection pool. Without ``POOL`` (or with
+``MAX_SIZE`` 0) they behave like the stock ones, so connection reuse is
+left to ``CONN_MAX_AGE`` and ``CONN_HEALTH_CHECKS``. With it, closing a
+connection hands it back to the pool, and connecting takes an idle one;
+set ``CONN_MAX_AGE`` to 0 so connections go back at the end of every
+request:
+
+    "POOL": {
+        "MAX_SIZE": 10,  # open connections per process
+        "TIMEOUT": 10,  # seconds to wait for one before OperationalError
+        "MAX_IDLE": 300,  # seconds before an idle connection is closed
+        "MAX_LIFETIME": 1800,  # seconds before a connection is replaced
+        "HEALTH_CHECK_AFTER": 10,  # idle seconds before a ping on checkout
+    }
+
+``stats`` sums the pools up for the ``/api/_metrics`` gauges.
+"""
+import os
+import weakref
+from threading import Condition, Lock
+from time import monotonic
+
+DEFAULTS = {
+    "MAX_SIZE": 0,
+    "TIMEOUT": 10,
+    "MAX_IDLE": 300,
+    "MAX_LIFETIME": 1800,
+    "HEALTH_CHECK_AFTER": 10,
+}
+COUNTS = ("created", "reused", "discarded", "waits", "timeouts")
+
+pools = {}
+_pools_lock = Lock()
+_inherited = []
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class Pool:
+    """Thread-safe pool of DB-API connections.
+
+    Idle connections are reused last in, first out, so the warmest one goes
+    out first and the coldest ones age out through ``max_idle``.
+    """
+
+    def __init__(
+        self,
+        max_size,
+        timeout=DEFAULTS["TIMEOUT"],
+        max_idle=DEFAULTS["MAX_IDLE"],
+        max_lifetime=DEFAULTS["MAX_LIFETIME"],
+        health_check_after=DEFAULTS["HEALTH_CHECK_AFTER"],
+    ):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self._cond = Condition()
+        # (connection, opened, released), most recently released last
+        self._idle = []
+        self._opened = {}
+        self.size = 0
+        self.waiting = 0
+        self.wait_ms = 0.0
+        self.closed = False
+        self.counts = dict.fromkeys(COUNTS, 0)
+
+    def acquire(self, connect):
+        """An idle connection, or a new one from ``connect()``.
+
+        Raises:
+            PoolTimeout: [every connection stayed in use for ``timeout``]
+        """
+        while True:
+            connection, idle_for = self._checkout()
+            if connection is None:
+                return self._open(connect)
+            if idle_for < self.health_check_after or is_alive(connection):
+                return connection
+            self._forget(connection)
+            close_quietly(connection)
+
+    def release(self, connection, reusable=True):
+        """Take ``connection`` back, rolled back, or close it."""
+        if reusable:
+            try:
+                connection.rollback()
+            except Exception:
+                reusable = False
+        now = monotonic()
+        with self._cond:
+            opened = self._opened.get(id(connection))
+            if (
+                reusable
+                and opened is not None
+                and not self.closed
+                and now - opened < self.max_lifetime
+            ):
+                self._idle.append((connection, opened, now))
+                self._cond.notify()
+                return
+        self._forget(connection)
+        close_quietly(connection)
+
+    def close(self):
+        """Close idle connections; the ones in use close on release."""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            for connection, _, _ in idle:
+                del self._opened[id(connection)]
+            self.size -= len(idle)
+            self._cond.notify_all()
+        for connection, _, _ in idle:
+            close_quietly(connection)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(
+                self.counts,
+                max_size=self.max_size,
+                size=self.size,
+                idle=len(self._idle),
+                in_use=self.size - len(self._idle),
+                waiting=self.waiting,
+                wait_ms=round(self.wait_ms, 3),
+            )
+        return stats
+
+    def _checkout(self):
+        """``(idle connection, idle seconds)``, or ``(None, 0)`` for a new one."""
+        started = monotonic()
+        stale = []
+        with self._cond:
+            if self.closed:
+                raise PoolTimeout("connection pool closed", "reconnect")
+            while self._idle and started - self._idle[0][2] > self.max_idle:
+                connection = self._idle.pop(0)[0]
+                self._forget(connection)
+                stale.append(connection)
+            if not self._idle and self.size >= self.max_size:
+                self.counts["waits"] += 1
+                self.waiting += 1
+                try:
+                    while not self._idle and self.size >= self.max_size:
+                        remaining = started + self.timeout - monotonic()
+                        if remaining <= 0:
+                            self.counts["timeouts"] += 1
+                            raise PoolTimeout(
+                                f"no database connection free in {self.timeout}s",
+                                "raise POOL MAX_SIZE or shorten transactions",
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self.wait_ms += (monotonic() - started) * 1000
+            if self._idle:
+                connection, _, released = self._idle.pop()
+                self.counts["reused"] += 1
+                result = connection, monotonic() - released
+            else:
+                self.size += 1
+                result = None, 0
+        for connection in stale:
+            close_quietly(connection)
+        return result
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self._cond:
+                self.size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opened[id(connection)] = monotonic()
+            self.counts["created"] += 1
+        return connection
+
+    def _forget(self, connection):
+        with self._cond:
+            if self._opened.pop(id(connection), None) is not None:
+                self.size -= 1
+                self.counts["discarded"] += 1
+                self._cond.notify()
+
+
+def is_alive(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+        connection.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def pool_for(alias, settings_dict):
+    """The pool of a ``DATABASES`` entry, or None when it has no ``POOL``."""
+    options = dict(DEFAULTS, **(settings_dict.get("POOL") or {}))
+    if not options["MAX_SIZE"]:
+        return None
+    key = (alias,) + tuple(
+        settings_dict.get(name) for name in ("ENGINE", "NAME", "HOST", "PORT", "USER")
+    )
+    with _pools_lock:
+        pool = pools.get(key)
+        if pool is None or pool.closed:
+            pool = pools[key] = Pool(
+                options["MAX_SIZE"],
+                options["TIMEOUT"],
+                options["MAX_IDLE"],
+                options["MAX_LIFETIME"],
+                options["HEALTH_CHECK_AFTER"],
+            )
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        closing = list(pools.values())
+        pools.clear()
+    for pool in closing:
+        pool.close()
+
+
+def stats():
+    with _pools_lock:
+        every = [pool.stats() for pool in pools.values()]
+    totals = dict.fromkeys(COUNTS + ("max_size", "size", "idle", "in_use"), 0)
+    totals.update(waiting=0, wait_ms=0.0)
+    for pool_stats in every:
+        for name in totals:
+            totals[name] += pool_stats[name]
+    totals["pools"] = len(every)
+    max_size = totals["max_size"]
+    totals["saturation"] = round(totals["in_use"] / max_size, 4) if max_size else 0.0
+    return totals
+
+
+def _forget_pools():
+    # a forked child must not use the parent's sockets, nor close them, which
+    # collecting the connections would do
+    global _pools_lock
+    _pools_lock = Lock()
+    _inherited.extend(pools.values())
+    pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pools)
+
+
+class PooledCreationMixin:
+    def _destroy_test_db(self, *args, **kwargs):
+        # idle pooled connections would keep the test database in use
+        close_pools()
+        return super()._destroy_test_db(*args, **kwargs)
+
+
+class PooledDatabaseMixin:
+    """Database wrapper taking its connection from the ``POOL`` of its entry."""
+
+    def get_pool(self):
+        return pool_for(self.alias, self.settings_dict)
+
+    def open_connection(self, conn_params):
+        """A new connection to the database, bypassing the pool."""
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return self.open_connection(conn_params)
+        try:
+            connection = pool.acquire(lambda: self.open_connection(conn_params))
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(" - ".join(e.args)) from e
+        # a thread may end without closing its connection; free the slot then
+        self._pool_finalizer = weakref.finalize(self, pool.release, connection, False)
+        return connection
+
+    def _close(self):
+        finalizer = getattr(self, "_pool_finalizer", None)
+        detached = finalizer.detach() if finalizer else None
+        if detached is None:
+            return super()._close()
+        _, release, _, _ = detached
+        with self.wrap_database_errors:
+            release(self.connection, reusable=not self.errors_occurred)
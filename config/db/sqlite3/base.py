@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3 import base, creation
+
+from config.db import PooledCreationMixin, PooledDatabaseMixin
+
+
+class DatabaseCreation(PooledCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
@@ -0,0 +1,408 @@
+"""Per-endpoint latency and query-count instrumentation.
+
+``MetricsMiddleware`` records, for every request and keyed by the resolved
+view and method: wall time, number and time of DB queries (through an
+execute wrapper on every connection) and response bytes. Views mixing in
+``SerializerMetricsMixin`` also report the time spent in
+``to_representation``; ``response_error_handler`` counts the exceptions it
+turns into responses.
+
+Values go into in-process ``Histogram``s with HDR-style log-linear buckets
+and are served as Prometheus text by ``MetricsView`` (``/api/_metrics``,
+staff only), along with gauges of the ``config.db`` connection pools and
+of replica lag. Every worker process keeps its own numbers.
+
+Queries slower than ``SLOW_QUERY_MS`` are logged to ``config.metrics.slow``
+with the project frames of the stack that issued them.
+"""
+import logging
+import os
+import traceback
+from bisect import bisect_left
+from contextvars import ContextVar
+from math import floor, log2
+from threading import Lock
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from config import db, routers
+
+PREFIX = "fbinb"
+QUANTILES = (0.5, 0.95, 0.99)
+UNRESOLVED = "unresolved"
+
+slow_log = logging.getLogger("config.metrics.slow")
+current_sample = ContextVar("current_sample", default=None)
+
+
+def slow_query_ms():
+    return getattr(settings, "SLOW_QUERY_MS", None)
+
+
+class Histogram:
+    """Log-linear histogram in the style of HdrHistogram.
+
+    Every power of two between ``lowest`` and ``highest`` is split into
+    ``sub_buckets`` linear steps, so any recorded value is known within
+    ``1 / sub_buckets`` of itself at a fixed memory cost.
+    """
+
+    _bounds = {}
+
+    def __init__(self, lowest=0.01, highest=3600000, sub_buckets=8):
+        self.bounds = self.bounds_of(lowest, highest, sub_buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def bounds_of(cls, lowest, highest, sub_buckets):
+        lowest, highest = float(lowest), float(highest)
+        key = (lowest, highest, sub_buckets)
+        if key not in cls._bounds:
+            bounds, exponent = [lowest], floor(log2(lowest))
+            while bounds[-1] < highest:
+                base = 2.0 ** exponent
+                steps = range(1, sub_buckets + 1)
+                bounds += [base * (1 + step / sub_buckets) for step in steps]
+                exponent += 1
+            cls._bounds[key] = [bound for bound in bounds if bound >= lowest]
+        return cls._bounds[key]
+
+    def record(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def cumulative(self):
+        """``(le, count)`` at every power of four, the Prometheus buckets."""
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if log2(bound) % 2 == 0:
+                yield bound, seen
+        yield float("inf"), self.count
+
+
+class Registry:
+    """Histograms and counters by name and labels, shared by all threads."""
+
+    HISTOGRAMS = {
+        # name: (help, lowest, highest)
+        "http_request_duration_ms": ("Wall time of requests", 0.01, 3600000),
+        "http_request_db_queries": ("DB queries per request", 1, 100000),
+        "http_request_db_duration_ms": ("DB time per request", 0.01, 3600000),
+        "http_request_serializer_duration_ms": ("Serializer time", 0.01, 3600000),
+        "http_response_bytes": ("Response body size", 1, 2 ** 32),
+    }
+    COUNTERS = {
+        "http_requests_total": "Requests by status code",
+        "http_errors_total": "Exceptions turned into error responses",
+        "db_slow_queries_total": "Queries slower than SLOW_QUERY_MS",
+    }
+
+    def __init__(self):
+        self._lock = Lock()
+        self.gauges = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.counters = {name: {} for name in self.COUNTERS}
+
+    def observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histograms = self.histograms[name]
+            if key not in histograms:
+                _, lowest, highest = self.HISTOGRAMS[name]
+                histograms[key] = Histogram(lowest, highest)
+            histograms[key].record(value)
+
+    def inc(self, name, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self.counters[name]
+            counters[key] = counters.get(key, 0) + amount
+
+    def register_gauges(self, name, collect):
+        """Export ``collect()``, a ``{metric: value}`` dict, on every scrape."""
+        with self._lock:
+            self.gauges[name] = collect
+
+    def summary(self, name, labels):
+        """``{"count", "p50", "p95", "p99", "max"}`` of one histogram."""
+        with self._lock:
+            histogram = self.histograms[name].get(tuple(sorted(labels.items())))
+            if histogram is None:
+                return None
+            summary = {"count": histogram.count, "max": histogram.max}
+            for q in QUANTILES:
+                summary[f"p{int(q * 100)}"] = histogram.quantile(q)
+        return summary
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help_text, _, _) in self.HISTOGRAMS.items():
+                metric = f"{PREFIX}_{name}"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for key, histogram in sorted(self.histograms[name].items()):
+                    for le, count in histogram.cumulative():
+                        bucket = key + (("le", format_value(le)),)
+                        lines.append(f"{metric}_bucket{format_labels(bucket)} {count}")
+                    labels = format_labels(key)
+                    lines.append(f"{metric}_sum{labels} {format_value(histogram.sum)}")
+                    lines.append(f"{metric}_count{labels} {histogram.count}")
+                lines += [f"# TYPE {metric}_quantile gauge"]
+                for key, histogram in sorted(self.histograms[name].items()):
+                    for q in QUANTILES:
+                        labels = format_labels(key + (("quantile", str(q)),))
+                        value = format_value(histogram.quantile(q))
+                        lines.append(f"{metric}_quantile{labels} {value}")
+            for name, help_text in self.COUNTERS.items():
+                metric = f"{PREFIX}_{name}"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append(f"{metric}{format_labels(key)} {value}")
+            gauges = list(self.gauges.items())
+        for prefix, collect in gauges:
+            for name, value in collect().items():
+                metric = f"{PREFIX}_{prefix}_{name}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+registry = Registry()
+registry.register_gauges("db_pool", db.stats)
+registry.register_gauges("db_replica", routers.stats)
+
+
+def view_label(view_func):
+    view = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+    view = view or view_func
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+def project_stack(limit=6):
+    """Last frames of the current stack that belong to this project."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(root)
+        and "site-packages" not in frame.filename
+        and not frame.filename.endswith(os.path.join("config", "metrics.py"))
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+class Sample:
+    """Numbers of the request in progress, on ``request.metrics``."""
+
+    def __init__(self):
+        self.view = UNRESOLVED
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serialized = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            threshold = slow_query_ms()
+            if threshold is not None and elapsed * 1000 >= threshold:
+                registry.inc("db_slow_queries_total", {"view": self.view})
+                slow_log.warning(
+                    "slow query %.1fms in %s: %s\n%s",
+                    elapsed * 1000,
+                    self.view,
+                    sql[:1000],
+                    project_stack(),
+                )
+
+
+def observe_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample.execute(execute, sql, params, many, context)
+
+
+def install(connection):
+    """Report the queries of ``connection`` to the request being served."""
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_query)
+
+
+def install_all():
+    for connection in connections.all():
+        install(connection)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection=None, **kwargs):
+    install(connection)
+
+
+class MetricsMiddleware:
+    """Record wall time, DB queries and response size of every request.
+
+    Works under WSGI and ASGI. The request's ``Sample`` lives in a context
+    variable, so queries are counted in whichever thread the view runs.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        install_all()
+        started, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, started)
+
+    async def __acall__(self, request):
+        started, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, started)
+
+    def start(self, request):
+        request.metrics = Sample()
+        return perf_counter(), current_sample.set(request.metrics)
+
+    def finish(self, request, response, started):
+        elapsed = perf_counter() - started
+        sample = request.metrics
+        labels = {"view": sample.view, "method": request.method}
+        registry.observe("http_request_duration_ms", labels, elapsed * 1000)
+        registry.observe("http_request_db_queries", labels, sample.queries)
+        registry.observe("http_request_db_duration_ms", labels, sample.db_time * 1000)
+        if sample.serialized:
+            registry.observe(
+                "http_request_serializer_duration_ms",
+                labels,
+                sample.serializer_time * 1000,
+            )
+        if not response.streaming:
+            registry.observe("http_response_bytes", labels, len(response.content))
+        registry.inc(
+            "http_requests_total", dict(labels, status=str(response.status_code))
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view = view_label(view_func)
+
+
+def record_error(args, error):
+    """Count an exception handled by ``response_error_handler``."""
+    view = args[0] if args else None
+    request = getattr(view, "request", None)
+    sample = getattr(request, "metrics", None)
+    labels = {
+        "view": sample.view if sample else view_label(type(view)),
+        "exception": type(error).__name__,
+    }
+    registry.inc("http_errors_total", labels)
+
+
+class SerializerMetricsMixin:
+    """Time the ``to_representation`` of the serializers a view builds.
+
+    Lazy querysets evaluated while serializing count as serializer time too;
+    their queries are also in the DB numbers.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        sample = getattr(self.request, "metrics", None)
+        if sample is None:
+            return serializer
+        represent = serializer.to_representation
+
+        def to_representation(instance):
+            started = perf_counter()
+            try:
+                return represent(instance)
+            finally:
+                sample.serializer_time += perf_counter() - started
+                sample.serialized = True
+
+        serializer.to_representation = to_representation
+        return serializer
+
+
+class MetricsView(APIView):
+    """A function, able to export request metrics in Prometheus text format
+
+    Arguments:
+        APIView {[APIView]} -- [GET handler, staff only]
+    Returns:
+        [status] -- [GET-HTTP_200_OK, text/plain; version=0.0.4]
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4"
+        )
@@ -0,0 +1,130 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db.models import F, Q
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset (seek) pagination.
+
+    Rows are ordered by ``(ordering field, id)`` and every page continues
+    after the ``(value, id)`` of the previous page's last row, so fetching a
+    page costs O(page_size) at any depth. ``count`` is only computed when
+    asked for with ``?count=true`` and is cached per filtered queryset.
+    """
+
+    page_size = 12
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    count_cache_timeout = 60
+    ordering = "-id"
+    ordering_query_param = "ordering"
+    tiebreak = "id"
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_query_param)
+        allowed = getattr(view, "ordering_fields", None) or []
+        if ordering and ordering.lstrip("-") in allowed:
+            return ordering
+        return self.ordering
+
+    def encode_cursor(self, value, pk):
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        token = json.dumps([value, pk]).encode()
+        return urlsafe_b64encode(token).decode()
+
+    def decode_cursor(self, token, field):
+        try:
+            value, pk = json.loads(urlsafe_b64decode(token.encode()))
+            if value is not None:
+                value = field.to_python(value)
+            return value, int(pk)
+        except Exception:
+            raise ValueError("cursor is not valid", "follow the next link of a page")
+
+    def seek(self, name, descending, value, pk):
+        """Rows strictly after ``(value, pk)``; NULLs sort first ascending."""
+        tiebreak = self.tiebreak
+        if descending:
+            if value is None:
+                return Q(**{f"{name}__isnull": True, f"{tiebreak}__lt": pk})
+            return (
+                Q(**{f"{name}__lt": value})
+                | Q(**{name: value, f"{tiebreak}__lt": pk})
+                | Q(**{f"{name}__isnull": True})
+            )
+        if value is None:
+            return Q(**{f"{name}__isnull": True, f"{tiebreak}__gt": pk}) | Q(
+                **{f"{name}__isnull": False}
+            )
+        return Q(**{f"{name}__gt": value}) | Q(**{name: value, f"{tiebreak}__gt": pk})
+
+    def get_count(self, queryset):
+        key = "keyset-count:" + md5(str(queryset.query).encode()).hexdigest()
+        return cache.get_or_set(key, queryset.count, self.count_cache_timeout)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request, view)
+        descending = ordering.startswith("-")
+        name = ordering.lstrip("-")
+        field = queryset.model._meta.get_field(name)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("true", "1"):
+            self.count = self.get_count(queryset.order_by())
+
+        if descending:
+            order = [F(name).desc(nulls_last=True), F(self.tiebreak).desc()]
+        else:
+            order = [F(name).asc(nulls_first=True), F(self.tiebreak).asc()]
+        queryset = queryset.annotate(keyset_value=F(name)).order_by(*order)
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            queryset = queryset.filter(
+                self.seek(name, descending, *self.decode_cursor(token, field))
+            )
+
+        rows = list(queryset[: self.page_size + 1])
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(
+                last.keyset_value, getattr(last, self.tiebreak)
+            )
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([("next", self.get_next_link())])
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["results"] = data
+        return Response(payload)
@@ -0,0 +1,205 @@
+"""Read-replica routing with read-your-writes pinning.
+
+``ReplicaRouter`` sends every write, and by default every read, to the
+primary. Views mixing in ``ReplicaReadMixin`` serve their safe methods from
+one of the ``REPLICA_DATABASES`` instead, unless:
+
+- the client wrote within ``REPLICA_PIN_SECONDS``: ``ReplicaPinMiddleware``
+  answers every successful unsafe request with a pin cookie, honoured by
+  whichever worker serves the next read, and pins the credential (token or
+  session) in the ``REPLICA_PIN_CACHE_ALIAS`` cache for clients dropping
+  cookies, so a guest sees the reservation they just made;
+- every replica lags more than ``REPLICA_MAX_LAG`` seconds or is
+  unreachable, rechecked every ``REPLICA_CHECK_INTERVAL`` seconds;
+- the read happens inside a transaction on the primary.
+
+Code that must read the primary whatever the view (availability checks
+while booking) passes ``using=router.db_for_write(...)`` or runs under
+``use_primary``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import md5
+from threading import Lock
+from time import monotonic
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_PREFIX = "replica-pin:"
+PIN_COOKIE = "replica_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# zero once the replica has replayed everything it received, so an idle
+# primary does not read as lag
+POSTGRESQL_LAG = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+read_alias = ContextVar("read_alias", default=None)
+_lags = {}
+_lags_lock = Lock()
+
+
+def replicas():
+    return getattr(settings, "REPLICA_DATABASES", [])
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+
+def max_lag():
+    return getattr(settings, "REPLICA_MAX_LAG", 2)
+
+
+def check_interval():
+    return getattr(settings, "REPLICA_CHECK_INTERVAL", 5)
+
+
+def get_cache():
+    return caches[getattr(settings, "REPLICA_PIN_CACHE_ALIAS", "default")]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+@contextmanager
+def use_primary():
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+def replica_lag(alias):
+    """Seconds ``alias`` is behind the primary, or None when unreachable."""
+    db = connections[alias]
+    if db.vendor != "postgresql":
+        return 0.0
+    try:
+        with db.cursor() as cursor:
+            cursor.execute(POSTGRESQL_LAG)
+            return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        return None
+
+
+def healthy_replicas():
+    now = monotonic()
+    # one thread measures at a time; the others route on the last values
+    if _lags_lock.acquire(blocking=False):
+        try:
+            for alias in replicas():
+                checked_at, _ = _lags.get(alias, (None, None))
+                if checked_at is None or now - checked_at >= check_interval():
+                    _lags[alias] = (now, replica_lag(alias))
+        finally:
+            _lags_lock.release()
+    healthy = []
+    for alias in replicas():
+        _, lag = _lags.get(alias, (None, None))
+        if lag is not None and lag <= max_lag():
+            healthy.append(alias)
+    return healthy
+
+
+def pick_replica():
+    healthy = healthy_replicas()
+    return random.choice(healthy) if healthy else None
+
+
+def stats():
+    stats = {}
+    for alias, (_, lag) in list(_lags.items()):
+        stats[f"{alias}_lag_seconds"] = -1 if lag is None else lag
+        stats[f"{alias}_healthy"] = int(lag is not None and lag <= max_lag())
+    return stats
+
+
+def client_key(request):
+    """Cache key of the request's credential, or None for anonymous ones."""
+    credential = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credential:
+        return None
+    return PIN_PREFIX + md5(credential.encode()).hexdigest()
+
+
+def pin(request, response):
+    if not replicas():
+        return
+    response.set_cookie(
+        PIN_COOKIE, "1", max_age=pin_seconds(), httponly=True, samesite="Lax"
+    )
+    key = client_key(request)
+    if key:
+        get_cache().set(key, 1, pin_seconds())
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    key = client_key(request)
+    return bool(key and get_cache().get(key))
+
+
+class ReplicaReadMixin:
+    """Serve safe methods from a healthy replica unless the client is pinned."""
+
+    def dispatch(self, request, *args, **kwargs):
+        alias = None
+        if request.method in SAFE_METHODS and replicas() and not is_pinned(request):
+            alias = pick_replica()
+        if alias is None:
+            return super().dispatch(request, *args, **kwargs)
+        token = read_alias.set(alias)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_alias.reset(token)
+
+
+class ReplicaPinMiddleware:
+    """Pin the client to the primary after every successful write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(request, response)
+        return response
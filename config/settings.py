@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",
+    "config.routers.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,16 +84,40 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# connections persist across requests and are pinged before reuse
+# (CONN_HEALTH_CHECKS, Django 4.1+). FBINB_DB_POOL_SIZE > 0 takes them from
+# a per-process pool instead (config.db), returned after every request.
+DB_POOL_SIZE = int(os.environ.get("FBINB_DB_POOL_SIZE", 0))
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "ENGINE": "config.db.postgresql",
         "NAME": "fbinb",
         "USER": "fbinb",
         "PASSWORD": get_secret("RDS_PASSWORD"),
         "HOST": "fbinb.cxzf4192gezj.ap-northeast-2.rds.amazonaws.com",
         "PORT": "5432",
+        "CONN_MAX_AGE": 0 if DB_POOL_SIZE else 60,
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {"MAX_SIZE": DB_POOL_SIZE, "TIMEOUT": 10},
     }
 }
+# reads of the views mixing in config.routers.ReplicaReadMixin go to the
+# replica when FBINB_DB_REPLICA_HOST is set; clients are pinned to the
+# primary for REPLICA_PIN_SECONDS after a write, and replicas lagging more
+# than REPLICA_MAX_LAG seconds are skipped. The pin rides on a cookie; for
+# clients dropping cookies it is also kept in REPLICA_PIN_CACHE_ALIAS, which
+# must be a cross-process cache (memcached/redis) with several workers
+DATABASES["replica"] = dict(
+    DATABASES["default"],
+    HOST=os.environ.get("FBINB_DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+    TEST={"MIRROR": "default"},
+)
+DATABASE_ROUTERS = ["config.routers.ReplicaRouter"]
+REPLICA_DATABASES = ["replica"] if os.environ.get("FBINB_DB_REPLICA_HOST") else []
+REPLICA_PIN_SECONDS = 5
+REPLICA_MAX_LAG = 2
+REPLICA_CHECK_INTERVAL = 5
+REPLICA_PIN_CACHE_ALIAS = "default"
 # DATABASES = {
 #     "default": {
 #         "ENGINE": "django.db.backends.sqlite3",
@@ -112,6 +138,14 @@ AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator"},
 ]
 
+# first hasher encodes, the rest only verify; stored hashes move to the first
+# on login. Tune the work factor with `manage.py benchmark_hasher`.
+PASSWORD_HASHERS = [
+    "accounts.hashers.TunedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+PASSWORD_HASH_ITERATIONS = None
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -148,6 +182,12 @@ AWS_LOCATION = ""
 STATIC_URL = "https://%s/%s/" % (AWS_S3_CUSTOM_DOMAIN, AWS_LOCATION)
 STATICFILES_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 DEFAULT_FILE_STORAGE = "config.storage_backends.MediaStorage"
+# threads resizing uploaded room images into thumbnail/card/full variants
+IMAGE_PIPELINE_WORKERS = 2
+# direct-to-storage uploads, see config.uploads
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+UPLOAD_TICKET_TTL = 900
+UPLOAD_VALIDATION_WORKERS = 2
 
 # all-auth
 AUTHENTICATION_BACKENDS = ["accounts.backends.UserBackend"]
@@ -179,3 +219,33 @@ SWAGGER_SETTINGS = {
 CORS_ORIGIN_ALLOW_ALL = True
 
 SITE_ID = 1
+
+# availability calendar: days of room bitmaps kept from today
+AVAILABILITY_CALENDAR_DAYS = 365
+
+# caches: local memory works offline, swap for memcached/redis when deployed
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    # "default": {
+    #     "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    #     "LOCATION": os.path.join(BASE_DIR, ".cache"),
+    # },
+}
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = 300
+# token -> user cache of accounts.backends.TokenAuthBackend; its shared tier
+# needs a cross-process alias (memcached/redis) and is skipped on local
+# memory, leaving each worker its own TOKEN_CACHE_LOCAL_TTL copies
+TOKEN_CACHE_ALIAS = "default"
+TOKEN_CACHE_SIZE = 2048
+TOKEN_CACHE_LOCAL_TTL = 30
+TOKEN_CACHE_SHARED_TTL = 300
+
+# request metrics at /api/_metrics; queries slower than this (ms) are logged
+# with their stack to "config.metrics.slow", None turns the log off
+SLOW_QUERY_MS = 200
+
+# config.asgi routes read endpoints to async adapters running the views on
+# a bounded thread pool (config.async_views); WSGI keeps the sync views
+ASYNC_VIEWS = os.environ.get("FBINB_ASYNC_VIEWS") == "1"
+ASYNC_VIEW_WORKERS = 32
@@ -0,0 +1,234 @@
+"""Direct-to-storage uploads with signed tickets.
+
+1. ``POST /api/uploads/`` returns a ticket and a URL to ``PUT`` the bytes
+   to: a presigned S3 URL when media lives on S3 (or an S3-compatible
+   stand-in through ``AWS_S3_ENDPOINT_URL``), otherwise ``UploadPutView``,
+   which streams the body into the filesystem storage.
+2. The client confirms by sending the ticket to the resource (``upload``
+   field of a room photo or a profile); ``claim`` checks it, marks it used
+   and returns the object key to store, so web workers never carry the
+   image bytes.
+3. ``validate_later`` re-checks size and type off the request thread once
+   the confirming transaction commits, deleting objects that fail.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from threading import Lock
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, transaction
+from PIL import Image
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+
+from accounts.models import UploadClaim
+from config.utils import response_error_handler
+
+SALT = "config.uploads"
+KINDS = {"room_photo": "rooms", "profile": "user_image/profile"}
+CONTENT_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+PIL_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP"}
+
+_executor = None
+_executor_lock = Lock()
+
+
+def max_size():
+    return getattr(settings, "UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+
+
+def ticket_ttl():
+    return getattr(settings, "UPLOAD_TICKET_TTL", 900)
+
+
+def workers():
+    return getattr(settings, "UPLOAD_VALIDATION_WORKERS", 2)
+
+
+def is_s3(storage):
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+
+def issue(user, kind, content_type, size):
+    """Sign an upload ticket for one new object key.
+
+    Raises:
+        ValueError: [unknown kind, content type not allowed or file too large]
+    """
+    if kind not in KINDS:
+        raise ValueError("unknown upload kind", f"use one of {list(KINDS)}")
+    if content_type not in CONTENT_TYPES:
+        raise ValueError("file type not allowed", f"use one of {list(CONTENT_TYPES)}")
+    if not 0 < size <= max_size():
+        raise ValueError("file too large", f"upload at most {max_size()} bytes")
+    today = date.today()
+    key = (
+        f"{KINDS[kind]}/{today:%Y/%m/%d}/"
+        f"{uuid4().hex}.{CONTENT_TYPES[content_type]}"
+    )
+    payload = {"key": key, "user": user.id, "kind": kind, "type": content_type}
+    return key, signing.dumps(payload, salt=SALT)
+
+
+def read_ticket(ticket):
+    try:
+        return signing.loads(ticket, salt=SALT, max_age=ticket_ttl())
+    except signing.BadSignature:
+        raise ValueError("upload ticket not valid or expired", "ask for a new ticket")
+
+
+def presign(storage, key, content_type):
+    """Presigned S3 PUT URL of ``key``, or None for non-S3 storages."""
+    if not is_s3(storage):
+        return None
+    client = storage.connection.meta.client
+    return client.generate_presigned_url(
+        "put_object",
+        Params={
+            "Bucket": storage.bucket_name,
+            "Key": storage._normalize_name(key),
+            "ContentType": content_type,
+        },
+        ExpiresIn=ticket_ttl(),
+    )
+
+
+def claim(ticket, user, kind):
+    """Object key of an uploaded ticket, once it is in storage; single use.
+
+    Raises:
+        ValueError: [ticket invalid, expired, someone else's, not uploaded
+            or already claimed]
+    """
+    payload = read_ticket(ticket)
+    if payload["user"] != user.id or payload["kind"] != kind:
+        raise ValueError("upload ticket not issued for this", "ask for a new ticket")
+    if not default_storage.exists(payload["key"]):
+        raise ValueError("file not uploaded yet", "PUT the file to the ticket url")
+    # the unique row is shared by every worker and rolls back with the
+    # request's transaction, so a failed attach leaves the ticket usable
+    try:
+        with transaction.atomic():
+            UploadClaim.objects.create(key=payload["key"], user_id=user.id)
+    except IntegrityError:
+        raise ValueError("ticket already used", "ask for a new ticket")
+    return payload["key"], payload["type"]
+
+
+def is_valid(key, content_type, storage=None):
+    storage = storage or default_storage
+    try:
+        if storage.size(key) > max_size():
+            return False
+        with storage.open(key) as stream:
+            image = Image.open(stream)
+            image.verify()
+        return image.format == PIL_FORMATS[content_type]
+    except Exception:
+        return False
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers(), thread_name_prefix="uploads")
+        return _executor
+
+
+def check(key, content_type, on_invalid):
+    if not is_valid(key, content_type):
+        default_storage.delete(key)
+        on_invalid()
+
+
+def _run(key, content_type, on_invalid):
+    close_old_connections()
+    try:
+        check(key, content_type, on_invalid)
+    finally:
+        close_old_connections()
+
+
+def validate_later(key, content_type, on_invalid):
+    """Validate an uploaded object after commit; ``on_invalid`` detaches it."""
+    if workers() == 0:
+        transaction.on_commit(lambda: check(key, content_type, on_invalid))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run, key, content_type, on_invalid)
+        )
+
+
+class UploadTicketView(generics.GenericAPIView):
+    """A function, able to issue a direct upload ticket
+
+    Arguments:
+        generics {[GenericAPIView]} -- [POST handler]
+        kind -- [room_photo or profile]
+        content_type -- [image/jpeg, image/png or image/webp]
+        size -- [bytes of the file]
+    Raises:
+        ValueError: [POST-HTTP_400_BAD_REQUEST]
+    Returns:
+        [status] -- [POST-HTTP_201_CREATED, ticket and url to PUT the file to]
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @response_error_handler
+    def post(self, request, *args, **kwargs):
+        try:
+            size = int(request.data.get("size", 0))
+        except (TypeError, ValueError):
+            raise ValueError("size is not a number", "send size in bytes")
+        content_type = request.data.get("content_type")
+        key, ticket = issue(request.user, request.data.get("kind"), content_type, size)
+        url = presign(default_storage, key, content_type)
+        if url is None:
+            url = request.build_absolute_uri(f"/api/uploads/{ticket}/")
+        data = {
+            "ticket": ticket,
+            "key": key,
+            "url": url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "expires_in": ticket_ttl(),
+        }
+        return Response(data=data, status=status.HTTP_201_CREATED)
+
+
+class UploadPutView(generics.GenericAPIView):
+    """A function, able to receive a ticketed upload into filesystem storage
+
+    Stands in for the presigned S3 URL when media is not on S3; the ticket
+    in the url authorizes the request.
+
+    Raises:
+        ValueError: [PUT-HTTP_400_BAD_REQUEST]
+    Returns:
+        [status] -- [PUT-HTTP_201_CREATED]
+    """
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    @response_error_handler
+    def put(self, request, *args, **kwargs):
+        payload = read_ticket(kwargs["ticket"])
+        if is_s3(default_storage):
+            raise ValueError("upload to storage directly", "use the presigned url")
+        if request.content_type != payload["type"]:
+            raise ValueError("content type does not match ticket", payload["type"])
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+        if not 0 < length <= max_size():
+            raise ValueError("file empty or too large", f"at most {max_size()} bytes")
+        if default_storage.exists(payload["key"]):
+            raise ValueError("ticket already used", "ask for a new ticket")
+        name = default_storage.save(payload["key"], File(request.stream))
+        return Response(data={"key": name}, status=status.HTTP_201_CREATED)
@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import urls
+from config.metrics import MetricsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api-doc/", include("config.yasg_urls")),
+    path("api/_metrics", MetricsView.as_view()),
     path("api/", include("config.api_urls")),
     # path("accounts/", include("rest_framework.urls")),
     path("api-auth/", include('rest_framework.urls')),
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='state',
+            name='country',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='states', to='locations.country'),
+        ),
+    ]
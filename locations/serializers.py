@@ -1,14 +1,17 @@
 from locations.models import Country, State
 from rest_framework import serializers
+from config.fields import FastListSerializer, SparseFieldsetMixin
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Country
+        list_serializer_class = FastListSerializer
         fields = ["id", "name"]
 
 
-class StateSerializer(serializers.ModelSerializer):
+class StateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = State
+        list_serializer_class = FastListSerializer
         fields = ["id", "name", "country"]
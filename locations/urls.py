@@ -1,4 +1,5 @@
 from django.urls import include, path
+from config.async_views import asyncify
 from rest_framework import routers
 from locations import views
 
@@ -7,4 +8,4 @@ locations_router.register("country", views.CountryViewSet)
 locations_router.register("state", views.StateViewSet)
 app_name = "locations"
 
-urlpatterns = [path("", include(locations_router.urls))]
+urlpatterns = [path("", include(asyncify(locations_router.urls)))]
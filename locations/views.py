@@ -1,13 +1,15 @@
 from rest_framework import viewsets
+from config.routers import ReplicaReadMixin
+from config.utils import EagerLoadingMixin
 from locations.models import Country, State
 from locations.serializers import CountrySerializer, StateSerializer
 
 
-class StateViewSet(viewsets.ModelViewSet):
+class StateViewSet(ReplicaReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = State.objects.all()
     serializer_class = StateSerializer
 
 
-class CountryViewSet(viewsets.ModelViewSet):
+class CountryViewSet(ReplicaReadMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Country.objects.all()
     serializer_class = CountrySerializer
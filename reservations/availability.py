@@ -0,0 +1,241 @@
+"""Availability engine for room reservations.
+
+Every stay is a half-open interval ``[start_date, end_date)``: the guest
+checks in on ``start_date`` and leaves on ``end_date``, so a booking ending
+on the 10th does not collide with one starting on the 10th.
+
+On PostgreSQL the non-overlap rule is enforced by the GiST exclusion
+constraint of ``RoomReservation`` over ``daterange(start_date, end_date)``;
+the same index serves the anti-join used by ``available_rooms``. Backends
+without range types (SQLite in tests) fall back to ``IntervalTree`` and
+``ReservationIndex``, a pure-Python interval index answering the same
+questions in memory.
+"""
+from bisect import bisect_right, insort
+from datetime import date, datetime
+from itertools import count
+
+from django.db.models import Exists, OuterRef, Q
+
+from reservations.models import RoomReservation
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), DATE_FORMAT).date()
+    except ValueError:
+        raise ValueError(
+            "date format you passed, is not right format", "type in year-month-day"
+        )
+
+
+def parse_stay(start_date, end_date):
+    """Parse a requested stay into ``(start, end)`` dates.
+
+    Raises:
+        ValueError: [unparsable date or end date not after start date]
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    if start >= end:
+        raise ValueError(
+            "start day could not be later than end date", "retype form data"
+        )
+    return start, end
+
+
+def overlapping(start, end, prefix=""):
+    """Q matching active reservations intersecting ``[start, end)``."""
+    return Q(
+        **{
+            f"{prefix}is_active": True,
+            f"{prefix}start_date__lt": end,
+            f"{prefix}end_date__gt": start,
+        }
+    )
+
+
+def stay_rule(start, end):
+    """Q matching rooms whose min/max stay allows ``[start, end)``."""
+    nights = (end - start).days
+    return Q(min_stay__lte=nights) & (Q(max_stay=0) | Q(max_stay__gte=nights))
+
+
+def booked(start, end):
+    """Correlated subquery of bookings clashing with ``[start, end)``."""
+    return RoomReservation.objects.filter(
+        overlapping(start, end), room=OuterRef("pk")
+    )
+
+
+def available_rooms(queryset, start, end):
+    """Narrow a Room queryset to rooms free and stayable for ``[start, end)``.
+
+    The clash test is a single ``NOT EXISTS`` anti-join, which PostgreSQL
+    answers from the exclusion constraint's GiST index.
+    """
+    return queryset.filter(~Exists(booked(start, end))).filter(stay_rule(start, end))
+
+
+def overlapping_ids(rows):
+    """Ids of stays overlapping an earlier booking of their room.
+
+    ``rows`` are ``(id, room_id, start, end)`` of active stays ordered by
+    room and id; the first booking keeps its dates.
+    """
+    clashes, room, starts, ends = [], None, [], []
+    for pk, room_id, start, end in rows:
+        if room_id != room:
+            room, starts, ends = room_id, [], []
+        # the kept stays of a room do not overlap, so sorted by start they
+        # are sorted by end too
+        i = bisect_right(starts, start)
+        if (i and ends[i - 1] > start) or (i < len(starts) and starts[i] < end):
+            clashes.append(pk)
+            continue
+        insort(starts, start)
+        insort(ends, end)
+    return clashes
+
+
+def is_room_available(room_id, start, end, using=None):
+    reservations = RoomReservation.objects.using(using)
+    return not reservations.filter(overlapping(start, end), room_id=room_id).exists()
+
+
+class IntervalTree:
+    """Centered interval tree over half-open ``[start, end)`` intervals.
+
+    Every node keeps the intervals containing its center sorted by start and
+    by end, so a stabbing query touches only the nodes on one root-to-leaf
+    path plus the matches it returns.
+    """
+
+    class _Node:
+        __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+        def __init__(self, center):
+            self.center = center
+            self.by_start = []
+            self.by_end = []
+            self.left = None
+            self.right = None
+
+    def __init__(self, intervals=()):
+        self._size = 0
+        self._seq = count()
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._root = self._build(items)
+
+    def __len__(self):
+        return self._size
+
+    def _entry(self, start, end, value):
+        if not start < end:
+            raise ValueError("empty interval", f"{start} is not before {end}")
+        return start, end, next(self._seq), value
+
+    def _place(self, node, entry):
+        insort(node.by_start, entry)
+        insort(node.by_end, (entry[1], entry[0], entry[2], entry[3]))
+        self._size += 1
+
+    def _build(self, items):
+        if not items:
+            return None
+        center = items[len(items) // 2][0]
+        node = self._Node(center)
+        left, right = [], []
+        for start, end, value in items:
+            if end <= center:
+                left.append((start, end, value))
+            elif start > center:
+                right.append((start, end, value))
+            else:
+                self._place(node, self._entry(start, end, value))
+        node.left = self._build(left)
+        node.right = self._build(right)
+        return node
+
+    def add(self, start, end, value=None):
+        entry = self._entry(start, end, value)
+        if self._root is None:
+            self._root = self._Node(start)
+        node = self._root
+        while True:
+            if end <= node.center:
+                if node.left is None:
+                    node.left = self._Node(start)
+                node = node.left
+            elif start > node.center:
+                if node.right is None:
+                    node.right = self._Node(start)
+                node = node.right
+            else:
+                self._place(node, entry)
+                return
+
+    def overlap(self, start, end):
+        """Return values of every stored interval intersecting ``[start, end)``."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if end <= node.center:
+                for s, _, _, value in node.by_start:
+                    if s >= end:
+                        break
+                    found.append(value)
+                stack.append(node.left)
+            elif start > node.center:
+                for e, _, _, value in reversed(node.by_end):
+                    if e <= start:
+                        break
+                    found.append(value)
+                stack.append(node.right)
+            else:
+                found.extend(entry[3] for entry in node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+
+class ReservationIndex:
+    """In-memory availability index: one ``IntervalTree`` per room."""
+
+    def __init__(self):
+        self._trees = {}
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        index = cls()
+        rows = queryset.filter(is_active=True).values_list(
+            "room_id", "start_date", "end_date", "id"
+        )
+        by_room = {}
+        for room_id, start, end, pk in rows.iterator():
+            by_room.setdefault(room_id, []).append((start, end, pk))
+        for room_id, intervals in by_room.items():
+            index._trees[room_id] = IntervalTree(intervals)
+        return index
+
+    def add(self, room_id, start, end, value=None):
+        self._trees.setdefault(room_id, IntervalTree()).add(start, end, value)
+
+    def conflicts(self, room_id, start, end):
+        tree = self._trees.get(room_id)
+        return tree.overlap(start, end) if tree else []
+
+    def is_free(self, room_id, start, end):
+        return not self.conflicts(room_id, start, end)
+
+    def free_rooms(self, room_ids, start, end):
+        return [room_id for room_id in room_ids if self.is_free(room_id, start, end)]
+
@@ -0,0 +1,80 @@
+"""Atomic reservation creation.
+
+``book`` checks and inserts inside one transaction on the primary database
+holding the room row lock, so concurrent bookings of a room are serialized
+and the second one sees the first. On PostgreSQL the exclusion constraint
+of ``RoomReservation`` backs this up for writers that bypass the lock.
+Serialization failures, deadlocks and lock timeouts are retried with
+jittered exponential backoff.
+"""
+from random import random
+from time import sleep
+
+from django.db import IntegrityError, OperationalError, router, transaction
+
+from reservations.availability import is_room_available
+from reservations.models import RoomReservation
+from rooms.models import Room
+
+MAX_ATTEMPTS = 5
+BACKOFF = 0.02
+# serialization_failure, deadlock_detected, lock_not_available
+RETRYABLE_SQLSTATES = {"40001", "40P01", "55P03"}
+EXCLUSION_VIOLATION = "23P01"
+
+
+def sqlstate(error):
+    cause = error.__cause__
+    return getattr(cause, "pgcode", None) or getattr(cause, "sqlstate", None)
+
+
+def is_retryable(error):
+    code = sqlstate(error)
+    if code:
+        return code in RETRYABLE_SQLSTATES
+    # SQLite reports write conflicts as "database (table) is locked"
+    return "locked" in str(error)
+
+
+def is_stayable(room, start, end):
+    nights = (end - start).days
+    return room.min_stay <= nights and (not room.max_stay or nights <= room.max_stay)
+
+
+def _book(user, room_id, start, end):
+    # availability is checked on the primary, never on a lagging replica
+    using = router.db_for_write(RoomReservation)
+    with transaction.atomic(using=using):
+        rooms = Room.objects.using(using).select_for_update()
+        room = rooms.filter(id=room_id).first()
+        if room is None:
+            raise ValueError("room does not exist", "check room id")
+        if not is_stayable(room, start, end):
+            raise ValueError(
+                "room not reservable for this length of stay", "check min_stay, max_stay"
+            )
+        if not is_room_available(room_id, start, end, using=using):
+            raise ValueError("Date already reservated!", "check for another date.")
+        return RoomReservation.objects.using(using).create(
+            user=user, room=room, start_date=start, end_date=end
+        )
+
+
+def book(user, room_id, start, end, attempts=MAX_ATTEMPTS, backoff=BACKOFF):
+    """Reserve ``[start, end)`` of a room for ``user``.
+
+    Raises:
+        ValueError: [room missing, stay length not allowed or dates taken]
+        OperationalError: [still conflicting after ``attempts`` tries]
+    """
+    for attempt in range(attempts):
+        try:
+            return _book(user, room_id, start, end)
+        except IntegrityError as e:
+            if sqlstate(e) != EXCLUSION_VIOLATION:
+                raise
+            raise ValueError("Date already reservated!", "check for another date.")
+        except OperationalError as e:
+            if attempt + 1 == attempts or not is_retryable(e):
+                raise
+            sleep(backoff * 2 ** attempt * (0.5 + random()))
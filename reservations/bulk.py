@@ -0,0 +1,228 @@
+"""Bulk reservation import and export (CSV or JSON lines).
+
+Imports are read lazily and handled in batches: each batch locks its rooms,
+loads their overlapping reservations into a ``ReservationIndex``, checks
+every row against it (and against the rows accepted before it) and is
+inserted with one ``bulk_create``, its rooms' calendars and rating sums
+updated in the same transaction. Rows that fail are reported with their
+line number instead of aborting the import. Rows with ``is_reviewed`` set
+carry their ``*_score`` columns.
+
+Exports stream rows through ``iterator(chunk_size=...)``, which uses a
+server-side cursor on PostgreSQL, so memory stays flat at any table size.
+"""
+import codecs
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from config.cache import bump, term_tags
+from reservations import calendar, ratings
+from reservations.availability import ReservationIndex, parse_stay
+from reservations.booking import is_stayable
+from reservations.models import RoomReservation
+from rooms.documents import search_terms
+from rooms.models import Room
+
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+CHUNK_SIZE = 2000
+SCORE_COLUMNS = tuple(f"{name}_score" for name in ratings.SCORES)
+COLUMNS = (
+    "id",
+    "room_id",
+    "user",
+    "start_date",
+    "end_date",
+    "is_active",
+    "is_reviewed",
+    *SCORE_COLUMNS,
+)
+EXPORT_FIELDS = (
+    "id",
+    "room_id",
+    "user__username",
+    "start_date",
+    "end_date",
+    "is_active",
+    "is_reviewed",
+    *SCORE_COLUMNS,
+)
+
+
+def guess_format(name, default="jsonl"):
+    extension = (name or "").rsplit(".", 1)[-1].lower()
+    return extension if extension in FORMATS else default
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line, row)`` from a text or binary stream of CSV/JSONL."""
+    if fmt not in FORMATS:
+        raise ValueError("unknown format", f"use one of {', '.join(FORMATS)}")
+    if not isinstance(stream.read(0), str):
+        stream = codecs.getreader("utf-8")(stream)
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else {}
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_flag(value, default):
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes")
+
+
+def parse_row(row):
+    try:
+        room_id = int(row["room_id"])
+        username = row["user"]
+        start_date, end_date = row["start_date"], row["end_date"]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(
+            "row is not a reservation", "give room_id, user, start_date, end_date"
+        )
+    start, end = parse_stay(start_date, end_date)
+    review = None
+    if parse_flag(row.get("is_reviewed"), False):
+        try:
+            review = {name: float(row.get(name) or 0) for name in SCORE_COLUMNS}
+        except (TypeError, ValueError):
+            raise ValueError("scores must be numbers", "retype the review scores")
+    is_active = parse_flag(row.get("is_active"), True)
+    return room_id, username, start, end, is_active, review
+
+
+def invalidate_dates(room_ids):
+    """Drop cached date-filtered responses of bulk-written rooms."""
+    terms = search_terms(room_ids)
+    bump(
+        "dates",
+        *[f"room:{room_id}" for room_id in room_ids],
+        *term_tags(terms, prefix="dates:"),
+    )
+
+
+def import_batch(batch):
+    """Validate and insert one batch; return ``(created, conflicts)``."""
+    conflicts, parsed = [], []
+    for line, row in batch:
+        try:
+            parsed.append((line, parse_row(row)))
+        except ValueError as e:
+            conflicts.append({"line": line, "error": e.args[0]})
+    if not parsed:
+        return 0, conflicts
+
+    usernames = {row[1] for _, row in parsed}
+    users = dict(
+        get_user_model()
+        .objects.filter(username__in=usernames)
+        .values_list("username", "id")
+    )
+    first = min(row[2] for _, row in parsed)
+    last = max(row[3] for _, row in parsed)
+    with transaction.atomic():
+        rooms = Room.objects.select_for_update().order_by("id")
+        rooms = rooms.filter(id__in={row[0] for _, row in parsed})
+        rooms = {room.id: room for room in rooms.only("id", "min_stay", "max_stay")}
+        index = ReservationIndex.from_queryset(
+            RoomReservation.objects.filter(
+                room_id__in=rooms, start_date__lt=last, end_date__gt=first
+            )
+        )
+        accepted = []
+        for line, (room_id, username, start, end, is_active, review) in parsed:
+            error = None
+            if room_id not in rooms:
+                error = "room does not exist"
+            elif username not in users:
+                error = "user does not exist"
+            elif is_active and not is_stayable(rooms[room_id], start, end):
+                error = "room not reservable for this length of stay"
+            elif is_active and not index.is_free(room_id, start, end):
+                error = "Date already reservated!"
+            if error:
+                conflicts.append({"line": line, "error": error})
+                continue
+            if is_active:
+                index.add(room_id, start, end, line)
+            accepted.append(
+                RoomReservation(
+                    room_id=room_id,
+                    user_id=users[username],
+                    start_date=start,
+                    end_date=end,
+                    is_active=is_active,
+                    is_reviewed=review is not None,
+                    **(review or {}),
+                )
+            )
+        RoomReservation.objects.bulk_create(accepted)
+        ratings.record_reviews(accepted)
+        touched = sorted({reservation.room_id for reservation in accepted})
+        # bulk_create skips the calendar signals: rebuild under the room locks
+        for room_id in touched:
+            calendar.build(room_id)
+        transaction.on_commit(lambda: invalidate_dates(touched))
+    return len(accepted), conflicts
+
+
+def import_reservations(stream, fmt, batch_size=BATCH_SIZE):
+    """Import reservations; return ``{"created": n, "conflicts": [...]}``."""
+    created, conflicts = 0, []
+    for batch in batches(read_rows(stream, fmt), batch_size):
+        count, errors = import_batch(batch)
+        created += count
+        conflicts += errors
+    return {"created": created, "conflicts": conflicts}
+
+
+class Echo:
+    """File-like object handing each written line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Lazily render the reservations of ``queryset`` as CSV or JSON lines."""
+    if fmt not in FORMATS:
+        raise ValueError("unknown format", f"use one of {', '.join(FORMATS)}")
+    rows = queryset.order_by("id").values_list(*EXPORT_FIELDS)
+    return _render(rows.iterator(chunk_size=chunk_size), fmt)
+
+
+def _render(rows, fmt):
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(COLUMNS, row)), default=str) + "\n"
@@ -0,0 +1,157 @@
+"""Per-room availability bitmaps.
+
+``RoomCalendar.days`` packs one bit per day for the next
+``AVAILABILITY_CALENDAR_DAYS`` days starting at ``origin`` (little-endian,
+bit set = booked). Reservations keep it current through the signals in
+``reservations.signals``; ``manage.py rebuild_calendars`` re-bases every
+calendar on today and should run daily.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BinaryField, Exists, Q
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from reservations.availability import (
+    available_rooms,
+    booked,
+    overlapping,
+    stay_rule,
+)
+from reservations.models import RoomCalendar, RoomReservation
+
+
+def horizon():
+    return getattr(settings, "AVAILABILITY_CALENDAR_DAYS", 365)
+
+
+def span(start, end):
+    return (1 << (end - start).days) - 1
+
+
+def decode(days):
+    return int.from_bytes(bytes(days or b""), "little")
+
+
+def encode(bits):
+    return bits.to_bytes((horizon() + 7) // 8, "little")
+
+
+def window_mask(origin, start, end):
+    """Bit mask of ``[start, end)`` relative to ``origin``; None if off-window."""
+    offset = (start - origin).days
+    if offset < 0 or (end - origin).days > horizon():
+        return None
+    return span(start, end) << offset
+
+
+def clip(origin, start, end):
+    """Clip ``[start, end)`` to the calendar window, or None if disjoint."""
+    last = origin + timedelta(horizon())
+    start, end = max(start, origin), min(end, last)
+    return (start, end) if start < end else None
+
+
+def build(room_id, origin=None):
+    origin = origin or timezone.now().date()
+    last = origin + timedelta(horizon())
+    bits = 0
+    stays = RoomReservation.objects.filter(
+        overlapping(origin, last), room_id=room_id
+    ).values_list("start_date", "end_date")
+    for start, end in stays:
+        start, end = clip(origin, start, end)
+        bits |= window_mask(origin, start, end)
+    calendar, _ = RoomCalendar.objects.update_or_create(
+        room_id=room_id, defaults={"origin": origin, "days": encode(bits)}
+    )
+    return calendar
+
+
+def mark(room_id, start, end, booked):
+    """Set (``booked=True``) or clear the days ``[start, end)`` of a room."""
+    today = timezone.now().date()
+    with transaction.atomic():
+        calendar = (
+            RoomCalendar.objects.select_for_update().filter(room_id=room_id).first()
+        )
+        if calendar is None or calendar.origin != today:
+            # missing or stale window: rebuilding already reflects this change
+            return build(room_id, today)
+        window = clip(calendar.origin, start, end)
+        if window is None:
+            return calendar
+        mask = window_mask(calendar.origin, *window)
+        bits = decode(calendar.days)
+        bits = bits | mask if booked else bits & ~mask
+        calendar.days = encode(bits)
+        calendar.save(update_fields=["days"])
+        return calendar
+
+
+def runs(calendar):
+    """Booked stretches of a calendar as ``[check_in, check_out]`` pairs."""
+    bits = decode(calendar.days)
+    result = []
+    day = 0
+    while bits:
+        if bits & 1:
+            first = day
+            while bits & 1:
+                bits >>= 1
+                day += 1
+            result.append(
+                [calendar.origin + timedelta(first), calendar.origin + timedelta(day)]
+            )
+        else:
+            skip = (bits & -bits).bit_length() - 1
+            bits >>= skip
+            day += skip
+    return result
+
+
+def clear_slices(origin, start, end):
+    """``(offset, length, values)`` byte slices clear over ``[start, end)``.
+
+    Whole bytes of the range must be zero; a partly covered first or last
+    byte may hold any value with the covered bits clear.
+    """
+    first, last = (start - origin).days, (end - origin).days
+    slices = []
+    byte = first // 8
+    while byte * 8 < last:
+        low, high = max(first - byte * 8, 0), min(last - byte * 8, 8)
+        if low == 0 and high == 8:
+            length = (last - byte * 8) // 8
+            slices.append((byte, length, [bytes(length)]))
+            byte += length
+            continue
+        mask = (1 << high) - (1 << low)
+        values = [bytes([value]) for value in range(256) if not value & mask]
+        slices.append((byte, 1, values))
+        byte += 1
+    return slices
+
+
+def filter_available(queryset, start, end):
+    """Narrow a Room queryset to rooms reservable for ``[start, end)``.
+
+    Rooms with a calendar based on today are tested on the bitmap in SQL, by
+    comparing the slices of ``days`` covering the range; rooms without one
+    fall back to the ``NOT EXISTS`` anti-join. Ranges outside the window go
+    straight to the availability engine.
+    """
+    today = timezone.now().date()
+    if window_mask(today, start, end) is None:
+        return available_rooms(queryset, start, end)
+    clear = Q(calendar__origin=today)
+    for offset, length, values in clear_slices(today, start, end):
+        name = f"calendar_days_{offset}"
+        days = Substr("calendar__days", offset + 1, length, output_field=BinaryField())
+        queryset = queryset.alias(**{name: days})
+        clear &= Q(**{f"{name}__in": values})
+    uncovered = Q(calendar__isnull=True) | ~Q(calendar__origin=today)
+    uncovered &= ~Exists(booked(start, end))
+    return queryset.filter(clear | uncovered).filter(stay_rule(start, end))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from reservations.bulk import CHUNK_SIZE, FORMATS, export_lines, guess_format
+from reservations.models import RoomReservation
+
+
+class Command(BaseCommand):
+    help = "Stream reservations as CSV or JSON lines to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--room", type=int, action="append", dest="room_ids")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["output"])
+        queryset = RoomReservation.objects.all()
+        if options["room_ids"]:
+            queryset = queryset.filter(room_id__in=options["room_ids"])
+        lines = export_lines(queryset, fmt, options["chunk_size"])
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as stream:
+            stream.writelines(lines)
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations.bulk import BATCH_SIZE, FORMATS, guess_format, import_reservations
+
+
+class Command(BaseCommand):
+    help = "Import reservations from a CSV or JSON lines file ('-' for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or guess_format(path)
+        if path == "-":
+            report = import_reservations(sys.stdin, fmt, options["batch_size"])
+        else:
+            try:
+                stream = open(path, encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(e)
+            with stream:
+                report = import_reservations(stream, fmt, options["batch_size"])
+        for conflict in report["conflicts"]:
+            self.stderr.write(f"line {conflict['line']}: {conflict['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"imported {report['created']} reservations, "
+                f"{len(report['conflicts'])} conflicts"
+            )
+        )
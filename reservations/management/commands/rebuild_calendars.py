@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reservations import calendar
+from rooms.models import Room
+
+
+class Command(BaseCommand):
+    help = "Rebuild room availability bitmaps, re-based on today."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_ids", nargs="*", type=int)
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        rooms = Room.objects.order_by("id").values_list("id", flat=True)
+        if options["room_ids"]:
+            rooms = rooms.filter(id__in=options["room_ids"])
+        total = 0
+        for room_id in rooms.iterator():
+            calendar.build(room_id, today)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {total} calendars"))
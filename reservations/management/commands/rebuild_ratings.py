@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reservations.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild room rating sums and totals from reviewed reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_ids", nargs="*", type=int)
+
+    def handle(self, *args, **options):
+        total = rebuild_ratings(options["room_ids"])
+        self.stdout.write(self.style.SUCCESS(f"rebuilt ratings of {total} rooms"))
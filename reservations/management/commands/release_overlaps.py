@@ -0,0 +1,50 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservations import calendar
+from reservations.availability import overlapping_ids
+from reservations.bulk import invalidate_dates
+from reservations.models import RoomReservation
+
+logger = logging.getLogger("reservations.overlaps")
+
+
+class Command(BaseCommand):
+    help = (
+        "List active reservations overlapping an earlier booking of their room, "
+        "which block reservations migration 0004; --deactivate releases them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deactivate",
+            action="store_true",
+            help="deactivate the later booking of every clash",
+        )
+
+    def handle(self, *args, **options):
+        active = RoomReservation.objects.filter(is_active=True)
+        rows = active.order_by("room_id", "id").values_list(
+            "id", "room_id", "start_date", "end_date"
+        )
+        clashes = overlapping_ids(rows.iterator())
+        if not clashes:
+            self.stdout.write(self.style.SUCCESS("no overlapping reservations"))
+            return
+        if not options["deactivate"]:
+            self.stdout.write(f"overlapping reservations: {clashes}")
+            return
+        with transaction.atomic():
+            released = RoomReservation.objects.filter(id__in=clashes)
+            room_ids = sorted(set(released.values_list("room_id", flat=True)))
+            released.update(is_active=False)
+            # queryset updates skip the calendar signals
+            for room_id in room_ids:
+                calendar.build(room_id)
+            transaction.on_commit(lambda: invalidate_dates(room_ids))
+        logger.warning("deactivated overlapping reservations %s", clashes)
+        self.stdout.write(
+            self.style.SUCCESS(f"deactivated {len(clashes)} reservations: {clashes}")
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rooms', '0008_resync_models'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('description', models.TextField(null=True)),
+                ('accuracy_score', models.FloatField(default=0)),
+                ('location_score', models.FloatField(default=0)),
+                ('communication_score', models.FloatField(default=0)),
+                ('checkin_score', models.FloatField(default=0)),
+                ('clean_score', models.FloatField(default=0)),
+                ('value_score', models.FloatField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='rooms.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0001_initial'),
+        ('rooms', '0008_resync_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomCalendar',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendar', serialize=False, to='rooms.room')),
+                ('origin', models.DateField()),
+                ('days', models.BinaryField(default=b'')),
+            ],
+        ),
+    ]
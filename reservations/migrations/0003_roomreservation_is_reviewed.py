@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+def mark_reviews(apps, schema_editor):
+    """Reviewing was the only way to deactivate a stay; give it its dates back."""
+    RoomReservation = apps.get_model("reservations", "RoomReservation")
+    reviews = RoomReservation.objects.using(schema_editor.connection.alias)
+    reviews.filter(is_active=False).update(is_reviewed=True, is_active=True)
+
+
+def unmark_reviews(apps, schema_editor):
+    RoomReservation = apps.get_model("reservations", "RoomReservation")
+    reviews = RoomReservation.objects.using(schema_editor.connection.alias)
+    reviews.filter(is_reviewed=True).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_roomcalendar'),
+        # the rating sums are computed from the deactivated reviews first
+        ('rooms', '0010_room_rating_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomreservation',
+            name='is_reviewed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_reviews, unmark_reviews),
+    ]
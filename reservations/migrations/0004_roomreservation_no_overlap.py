@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.contrib.postgres.fields.ranges
+import reservations.models
+from django.db import migrations, models
+
+from reservations.availability import overlapping_ids
+
+CONSTRAINT = "reservations_roomreservation_no_overlap"
+
+
+def check_overlaps(apps, schema_editor):
+    """Refuse to add the constraint while active stays overlap.
+
+    The old validation let some through. Which booking keeps the dates is
+    for staff to decide: ``manage.py release_overlaps`` lists the clashes
+    and ``--deactivate`` releases the later bookings.
+    """
+    RoomReservation = apps.get_model("reservations", "RoomReservation")
+    rows = (
+        RoomReservation.objects.using(schema_editor.connection.alias)
+        .filter(is_active=True)
+        .order_by("room_id", "id")
+        .values_list("id", "room_id", "start_date", "end_date")
+    )
+    clashes = overlapping_ids(rows.iterator())
+    if clashes:
+        raise ValueError(
+            f"active reservations {clashes} overlap earlier bookings",
+            "resolve them (manage.py release_overlaps) and migrate again",
+        )
+
+
+def prepare_constraint(apps, schema_editor):
+    """Install ``btree_gist`` and drop the constraint of the old hook.
+
+    The post_migrate hook this migration replaces may have added it already.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = apps.get_model("reservations", "RoomReservation")._meta.db_table
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE {schema_editor.quote_name(table)} "
+        f"DROP CONSTRAINT IF EXISTS {schema_editor.quote_name(CONSTRAINT)}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_roomreservation_is_reviewed'),
+    ]
+
+    operations = [
+        migrations.RunPython(prepare_constraint, migrations.RunPython.noop),
+        migrations.RunPython(check_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='roomreservation',
+            constraint=reservations.models.PostgresExclusionConstraint(condition=models.Q(('is_active', True)), expressions=[('room', '='), (reservations.models.DateRange('start_date', 'end_date', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&')], name='reservations_roomreservation_no_overlap'),
+        ),
+    ]
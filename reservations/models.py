@@ -1,8 +1,44 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models import Func, Q
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import (
+    DateRangeField,
+    RangeBoundary,
+    RangeOperators,
+)
 from rooms.models import Room
 from datetime import datetime
 
+
+class DateRange(Func):
+    function = "DATERANGE"
+    output_field = DateRangeField()
+
+
+class PostgresExclusionConstraint(ExclusionConstraint):
+    """``ExclusionConstraint`` left out on databases without range types."""
+
+    def constraint_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return None
+        return super().constraint_sql(model, schema_editor)
+
+    def create_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return None
+        return super().create_sql(model, schema_editor)
+
+    def remove_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return None
+        return super().remove_sql(model, schema_editor)
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        if connections[using].vendor == "postgresql":
+            super().validate(model, instance, exclude, using)
+
+
 class RoomReservation(models.Model):
     user = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="reservations"
@@ -19,5 +55,32 @@ class RoomReservation(models.Model):
     checkin_score = models.FloatField(default=0)
     clean_score = models.FloatField(default=0)
     value_score = models.FloatField(default=0)
+    # holds its dates; reviewing a stay does not release them
     is_active = models.BooleanField(default=True)
+    is_reviewed = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # stays are half-open, so back-to-back bookings do not overlap
+            PostgresExclusionConstraint(
+                name="reservations_roomreservation_no_overlap",
+                expressions=[
+                    ("room", RangeOperators.EQUAL),
+                    (
+                        DateRange("start_date", "end_date", RangeBoundary()),
+                        RangeOperators.OVERLAPS,
+                    ),
+                ],
+                condition=Q(is_active=True),
+            )
+        ]
 
+
+class RoomCalendar(models.Model):
+    """Booked-day bitmap of a room; bit ``i`` stands for ``origin + i days``."""
+
+    room = models.OneToOneField(
+        Room, on_delete=models.CASCADE, primary_key=True, related_name="calendar"
+    )
+    origin = models.DateField()
+    days = models.BinaryField(default=b"")
@@ -0,0 +1,100 @@
+"""Incremental room ratings.
+
+``Room`` keeps a running sum per score dimension and the number of reviewed
+reservations, so a review is O(1) whatever the room's history. Reviewing
+sets ``is_reviewed`` and leaves ``is_active``, so the stay keeps its dates.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from reservations.models import RoomReservation
+from rooms.documents import sync_documents
+from rooms.models import Room
+from rooms.signals import invalidate_rooms
+
+SCORES = ("accuracy", "location", "communication", "checkin", "clean", "value")
+SUMS = tuple(f"{name}_sum" for name in SCORES)
+
+
+def scores(reservation):
+    return [getattr(reservation, f"{name}_score") for name in SCORES]
+
+
+def total(sums, count):
+    if not count:
+        return 0
+    return round(sum(sums) / (len(SUMS) * count), 2)
+
+
+def refresh_total(room_id):
+    row = Room.objects.filter(id=room_id).values_list(*SUMS, "review_count").first()
+    Room.objects.filter(id=room_id).update(total_rating=total(row[:-1], row[-1]))
+    transaction.on_commit(lambda: sync_room(room_id))
+
+
+def sync_room(room_id):
+    # queryset updates skip Room signals: refresh search document and cache
+    sync_documents([room_id])
+    invalidate_rooms([room_id])
+
+
+def record_review(before, after):
+    """Fold a review into the room sums; ``before`` is the pre-review row.
+
+    Must run in the transaction saving the review.
+    """
+    new = scores(after)
+    reviewed = before.is_reviewed
+    old = scores(before) if reviewed else [0] * len(SCORES)
+    changes = {
+        field: F(field) + (value - previous)
+        for field, value, previous in zip(SUMS, new, old)
+    }
+    if not reviewed:
+        changes["review_count"] = F("review_count") + 1
+    Room.objects.filter(id=after.room_id).update(**changes)
+    refresh_total(after.room_id)
+
+
+def record_reviews(reservations):
+    """Fold bulk-inserted reservations already carrying a review into the sums.
+
+    Must run in the transaction inserting them.
+    """
+    deltas = {}
+    for reservation in reservations:
+        if not reservation.is_reviewed:
+            continue
+        delta = deltas.setdefault(reservation.room_id, [0] * (len(SCORES) + 1))
+        for position, value in enumerate([*scores(reservation), 1]):
+            delta[position] += value
+    for room_id, delta in deltas.items():
+        changes = {field: F(field) + value for field, value in zip(SUMS, delta)}
+        changes["review_count"] = F("review_count") + delta[-1]
+        Room.objects.filter(id=room_id).update(**changes)
+        refresh_total(room_id)
+
+
+def rebuild_ratings(room_ids=None):
+    """Recompute sums, counts and totals from reviewed reservations."""
+    rooms = Room.objects.order_by("id")
+    if room_ids:
+        rooms = rooms.filter(id__in=room_ids)
+    aggregates = {field: Sum(f"{name}_score") for field, name in zip(SUMS, SCORES)}
+    reviewed = (
+        RoomReservation.objects.filter(is_reviewed=True, room__in=rooms)
+        .values("room_id")
+        .annotate(review_count=Count("id"), **aggregates)
+    )
+    found = {row["room_id"]: row for row in reviewed.iterator()}
+    updated = 0
+    for room_id in rooms.values_list("id", flat=True).iterator():
+        row = found.get(room_id, {})
+        values = {field: row.get(field) or 0 for field in (*SUMS, "review_count")}
+        values["total_rating"] = total(
+            [values[field] for field in SUMS], values["review_count"]
+        )
+        Room.objects.filter(id=room_id).update(**values)
+        sync_room(room_id)
+        updated += 1
+    return updated
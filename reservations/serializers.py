@@ -1,6 +1,6 @@
 from rest_framework import serializers
+from reservations.booking import book
 from reservations.models import RoomReservation
-from rooms.models import Room
 
 class ReservationDetailSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
@@ -19,21 +19,30 @@ class ReservationCreateSerializer(serializers.ModelSerializer):
         fields = ["start_date", "end_date"]
 
     def create(self, validated_data):
-        validated_data["user"] = self.context.get("view").request.user
-        validated_data["room"] = Room.objects.get(
-            id=self.context.get("view").kwargs.get("pk")
+        view = self.context.get("view")
+        return book(
+            view.request.user,
+            view.kwargs.get("pk"),
+            validated_data["start_date"],
+            validated_data["end_date"],
         )
-        return super().create(validated_data)
 
 
 class ReservationUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = RoomReservation
-        exclude = ["start_date", "end_date", "id", "room", "user", "is_active"]
+        exclude = [
+            "start_date",
+            "end_date",
+            "id",
+            "room",
+            "user",
+            "is_active",
+            "is_reviewed",
+        ]
 
     def update(self, instance, validated_data):
-        instance.is_active=False
-        instance.save()
+        validated_data["is_reviewed"] = True
         return super().update(instance, validated_data)
 
 
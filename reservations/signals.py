@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from config.cache import bump, term_tags
+from reservations import calendar
+from reservations.models import RoomReservation
+from rooms.documents import search_terms
+from rooms.models import Room
+
+# columns the calendar follows; a row loaded without them is rebuilt on save
+TRACKED_FIELDS = {"room_id", "start_date", "end_date", "is_active"}
+UNKNOWN = object()
+
+
+@receiver(post_save, sender=Room)
+def create_room_calendar(sender, instance=None, created=False, **kwargs):
+    if created:
+        calendar.build(instance.id)
+
+
+def reserved_days(instance):
+    if instance.is_active:
+        return instance.room_id, instance.start_date, instance.end_date
+    return None
+
+
+@receiver(post_init, sender=RoomReservation)
+def remember_reserved_days(sender, instance=None, **kwargs):
+    # snapshot what the row held when loaded, so saving needs no SELECT
+    if instance.pk is None:
+        instance._reserved_days = None
+    elif TRACKED_FIELDS & instance.get_deferred_fields():
+        instance._reserved_days = UNKNOWN
+    else:
+        instance._reserved_days = reserved_days(instance)
+
+
+@receiver(post_save, sender=RoomReservation)
+def update_room_calendar(sender, instance=None, **kwargs):
+    previous = getattr(instance, "_reserved_days", None)
+    current = instance._reserved_days = reserved_days(instance)
+    if previous is UNKNOWN:
+        calendar.build(instance.room_id)
+        return
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous:
+            calendar.mark(*previous, booked=False)
+        if current:
+            calendar.mark(*current, booked=True)
+
+
+@receiver(post_delete, sender=RoomReservation)
+def release_room_calendar(sender, instance=None, **kwargs):
+    if instance.is_active:
+        calendar.mark(
+            instance.room_id, instance.start_date, instance.end_date, booked=False
+        )
+
+
+@receiver(post_save, sender=RoomReservation)
+@receiver(post_delete, sender=RoomReservation)
+def invalidate_availability_responses(sender, instance=None, **kwargs):
+    terms = search_terms([instance.room_id])
+    bump(f"room:{instance.room_id}", "dates", *term_tags(terms, prefix="dates:"))
@@ -1,3 +1,460 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from random import Random
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from locations.models import Country, State
+from reservations.availability import (
+    IntervalTree,
+    ReservationIndex,
+    available_rooms,
+    is_room_available,
+    parse_stay,
+)
+from reservations import calendar, ratings
+from reservations.booking import book
+from reservations.bulk import import_reservations
+from reservations.models import RoomCalendar, RoomReservation
+from rooms.models import Room
+
+
+def make_room(host, state, **kwargs):
+    fields = {"title": "room", "mobile": 0, "state": state, "host": host}
+    fields.update(kwargs)
+    return Room.objects.create(**fields)
+
+
+class IntervalTreeTest(TestCase):
+    def test_matches_brute_force(self):
+        rand = Random(7)
+        origin = date(2019, 1, 1)
+        intervals = []
+        for i in range(300):
+            start = origin + timedelta(rand.randrange(365))
+            intervals.append((start, start + timedelta(rand.randrange(1, 20)), i))
+        tree = IntervalTree(intervals[:150])
+        for start, end, value in intervals[150:]:
+            tree.add(start, end, value)
+        self.assertEqual(len(tree), 300)
+        for _ in range(200):
+            start = origin + timedelta(rand.randrange(-10, 375))
+            end = start + timedelta(rand.randrange(1, 30))
+            expected = {v for s, e, v in intervals if s < end and e > start}
+            self.assertEqual(set(tree.overlap(start, end)), expected)
+
+    def test_half_open_bounds(self):
+        tree = IntervalTree([(date(2019, 7, 1), date(2019, 7, 10), "a")])
+        self.assertEqual(tree.overlap(date(2019, 7, 10), date(2019, 7, 12)), [])
+        self.assertEqual(tree.overlap(date(2019, 6, 25), date(2019, 7, 1)), [])
+        self.assertEqual(tree.overlap(date(2019, 7, 3), date(2019, 7, 4)), ["a"])
+
+
+class AvailabilityTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="host", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.rooms = [make_room(user, state, min_stay=1) for _ in range(4)]
+        stays = [
+            (0, date(2019, 8, 1), date(2019, 8, 5)),
+            (1, date(2019, 8, 3), date(2019, 8, 4)),
+            (2, date(2019, 7, 25), date(2019, 8, 20)),
+            (3, date(2019, 8, 10), date(2019, 8, 12)),
+        ]
+        for room, start, end in stays:
+            RoomReservation.objects.create(
+                user=user, room=self.rooms[room], start_date=start, end_date=end
+            )
+
+    def test_anti_join_matches_index(self):
+        start, end = parse_stay("2019-08-02", "2019-08-06")
+        free = available_rooms(Room.objects.all(), start, end)
+        index = ReservationIndex.from_queryset(RoomReservation.objects.all())
+        expected = index.free_rooms([room.id for room in self.rooms], start, end)
+        self.assertEqual(sorted(free.values_list("id", flat=True)), sorted(expected))
+        self.assertEqual(list(free), [self.rooms[3]])
+
+    def test_booking_inside_window_is_a_clash(self):
+        start, end = parse_stay("2019-08-02", "2019-08-08")
+        free = available_rooms(Room.objects.filter(id=self.rooms[1].id), start, end)
+        self.assertFalse(free.exists())
+
+    def test_inactive_reservation_frees_room(self):
+        RoomReservation.objects.filter(room=self.rooms[2]).update(is_active=False)
+        start, end = parse_stay("2019-08-02", "2019-08-06")
+        free = available_rooms(Room.objects.all(), start, end)
+        self.assertIn(self.rooms[2], free)
+
+    def test_rejects_empty_stay(self):
+        with self.assertRaises(ValueError):
+            parse_stay("2019-08-02", "2019-08-02")
+
+
+class RoomCalendarTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="host", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = make_room(self.user, state, min_stay=1)
+        self.today = timezone.now().date()
+
+    def days(self, first, last):
+        return self.today + timedelta(first), self.today + timedelta(last)
+
+    def test_calendar_follows_reservation_lifecycle(self):
+        start, end = self.days(3, 6)
+        reservation = RoomReservation.objects.create(
+            user=self.user, room=self.room, start_date=start, end_date=end
+        )
+        self.assertEqual(
+            calendar.runs(RoomCalendar.objects.get(room=self.room)), [[start, end]]
+        )
+
+        reservation.start_date, reservation.end_date = self.days(10, 12)
+        reservation.save()
+        self.assertEqual(
+            calendar.runs(RoomCalendar.objects.get(room=self.room)),
+            [list(self.days(10, 12))],
+        )
+
+        reservation.is_active = False
+        reservation.save()
+        self.assertEqual(calendar.runs(RoomCalendar.objects.get(room=self.room)), [])
+
+    def test_saving_reads_no_reservation_row(self):
+        start, end = self.days(3, 6)
+        RoomReservation.objects.create(
+            user=self.user, room=self.room, start_date=start, end_date=end
+        )
+        reservation = RoomReservation.objects.get(room=self.room)
+        reservation.start_date, reservation.end_date = self.days(4, 8)
+        with CaptureQueriesContext(connection) as queries:
+            reservation.save()
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith("SELECT")
+                and "reservations_roomreservation" in query["sql"]
+            ]
+        )
+        self.assertEqual(
+            calendar.runs(RoomCalendar.objects.get(room=self.room)),
+            [list(self.days(4, 8))],
+        )
+
+    def test_filter_matches_anti_join(self):
+        stale = make_room(self.user, self.room.state, min_stay=1)
+        missing = make_room(self.user, self.room.state, min_stay=1)
+        for room, (first, last) in [
+            (self.room, (2, 5)),
+            (self.room, (9, 20)),
+            (stale, (6, 17)),
+            (missing, (1, 8)),
+        ]:
+            start, end = self.days(first, last)
+            RoomReservation.objects.create(
+                user=self.user, room=room, start_date=start, end_date=end
+            )
+        RoomCalendar.objects.filter(room=stale).update(
+            origin=self.today - timedelta(1)
+        )
+        RoomCalendar.objects.filter(room=missing).delete()
+        for first in range(0, 22):
+            for last in range(first + 1, 26):
+                start, end = self.days(first, last)
+                with self.assertNumQueries(1):
+                    rooms = list(
+                        calendar.filter_available(Room.objects.all(), start, end)
+                    )
+                self.assertEqual(
+                    rooms, list(available_rooms(Room.objects.all(), start, end))
+                )
+
+
+class RatingTest(TestCase):
+    def setUp(self):
+        host = get_user_model().objects.create_user(username="host", password="pw")
+        self.guest = get_user_model().objects.create_user(
+            username="guest", password="pw"
+        )
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = make_room(host, state)
+        self.client = APIClient()
+        self.client.force_authenticate(self.guest)
+
+    def stay(self, days_ago):
+        start = timezone.now().date() - timedelta(days_ago)
+        end = start + timedelta(1)
+        return RoomReservation.objects.create(
+            user=self.guest, room=self.room, start_date=start, end_date=end
+        )
+
+    def review(self, reservation, score):
+        fields = [f"{name}_score" for name in ratings.SCORES]
+        data = dict.fromkeys(fields, score)
+        data["description"] = "nice"
+        response = self.client.put(f"/api/reservations/rooms/{reservation.id}/", data)
+        self.assertEqual(response.status_code, 202)
+
+    def test_reviews_update_running_sums(self):
+        first, second = self.stay(10), self.stay(5)
+        self.stay(3)  # not reviewed, must not drag the average down
+        self.review(first, 4)
+        self.review(second, 2)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.review_count, 2)
+        self.assertEqual(self.room.total_rating, 3)
+
+        self.review(second, 5)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.review_count, 2)
+        self.assertEqual(self.room.total_rating, 4.5)
+
+    def test_review_during_stay_keeps_remaining_nights(self):
+        start = timezone.now().date() - timedelta(1)
+        reservation = RoomReservation.objects.create(
+            user=self.guest,
+            room=self.room,
+            start_date=start,
+            end_date=start + timedelta(4),
+        )
+        self.review(reservation, 5)
+        reservation.refresh_from_db()
+        self.assertTrue(reservation.is_reviewed)
+        tomorrow = start + timedelta(2)
+        self.assertFalse(
+            is_room_available(self.room.id, tomorrow, tomorrow + timedelta(1))
+        )
+
+    def test_rebuild_matches_incremental(self):
+        self.review(self.stay(10), 3)
+        self.review(self.stay(5), 4)
+        Room.objects.filter(id=self.room.id).update(review_count=0, total_rating=0)
+        ratings.rebuild_ratings([self.room.id])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.review_count, 2)
+        self.assertEqual(self.room.total_rating, 3.5)
+
+
+class BookingTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="host", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = make_room(self.user, state, min_stay=2, max_stay=5)
+
+    def test_rejects_clashes_and_stay_length(self):
+        book(self.user, self.room.id, date(2019, 8, 1), date(2019, 8, 4))
+        for start, end in [
+            (date(2019, 8, 3), date(2019, 8, 6)),  # overlaps
+            (date(2019, 8, 4), date(2019, 8, 5)),  # shorter than min_stay
+            (date(2019, 8, 4), date(2019, 8, 12)),  # longer than max_stay
+        ]:
+            with self.assertRaises(ValueError):
+                book(self.user, self.room.id, start, end)
+        book(self.user, self.room.id, date(2019, 8, 4), date(2019, 8, 6))
+        self.assertEqual(RoomReservation.objects.count(), 2)
+
+    def test_api_reports_clash(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f"/api/rooms/{self.room.id}"
+        data = {"start_date": "2019-08-01", "end_date": "2019-08-04"}
+        self.assertEqual(client.post(url, data).status_code, 201)
+        self.assertEqual(client.post(url, data).status_code, 400)
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Hundreds of simultaneous bookings: exactly one wins per date range."""
+
+    guests = 200
+    workers = 20
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="host", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = make_room(self.user, state, min_stay=1)
+
+    def attempt(self, stay):
+        try:
+            book(self.user, self.room.id, *stay, backoff=0.01, attempts=50)
+            return True
+        except ValueError:
+            return False
+        finally:
+            connection.close()
+
+    def test_one_winner_per_range(self):
+        origin = date(2019, 8, 1)
+        ranges = [
+            (origin + timedelta(i * 3), origin + timedelta(i * 3 + 3)) for i in range(4)
+        ]
+        stays = [ranges[i % len(ranges)] for i in range(self.guests)]
+        with ThreadPoolExecutor(self.workers) as pool:
+            won = list(pool.map(self.attempt, stays))
+
+        self.assertEqual(sum(won), len(ranges))
+        booked = RoomReservation.objects.values_list("start_date", "end_date")
+        self.assertEqual(sorted(booked), ranges)
+
+
+class BulkTest(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@fbinb.com", password="pw"
+        )
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = make_room(self.admin, state, min_stay=1)
+        start = timezone.now().date() + timedelta(10)
+        end = start + timedelta(3)
+        RoomReservation.objects.create(
+            user=self.admin, room=self.room, start_date=start, end_date=end
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_import_reports_conflicts_per_row(self):
+        day = timezone.now().date()
+        rows = [
+            "room_id,user,start_date,end_date",
+            f"{self.room.id},admin,{day + timedelta(1)},{day + timedelta(3)}",
+            f"{self.room.id},admin,{day + timedelta(2)},{day + timedelta(4)}",
+            f"{self.room.id},admin,{day + timedelta(11)},{day + timedelta(12)}",
+            f"{self.room.id},nobody,{day + timedelta(20)},{day + timedelta(21)}",
+            f"0,admin,{day + timedelta(20)},{day + timedelta(21)}",
+            f"{self.room.id},admin,2019-13-01,2019-13-02",
+            f"{self.room.id},admin,{day + timedelta(3)},{day + timedelta(5)}",
+        ]
+        upload = SimpleUploadedFile("stays.csv", "\n".join(rows).encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/reservations/bulk/", {"file": upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            [conflict["line"] for conflict in response.data["conflicts"]],
+            [7, 3, 4, 5, 6],
+        )
+        self.assertEqual(
+            calendar.runs(RoomCalendar.objects.get(room=self.room))[0],
+            [day + timedelta(1), day + timedelta(5)],
+        )
+
+    def test_import_updates_calendars_in_its_transaction(self):
+        start = timezone.now().date() + timedelta(20)
+        end = start + timedelta(2)
+        rows = f"room_id,user,start_date,end_date\n{self.room.id},admin,{start},{end}"
+        import_reservations(StringIO(rows), "csv")
+        self.assertIn(
+            [start, end], calendar.runs(RoomCalendar.objects.get(room=self.room))
+        )
+        self.assertFalse(calendar.filter_available(Room.objects.all(), start, end))
+
+    def test_imported_reviews_update_room_ratings(self):
+        day = timezone.now().date() - timedelta(30)
+        header = "room_id,user,start_date,end_date,is_reviewed,value_score,clean_score"
+        rows = [
+            header,
+            f"{self.room.id},admin,{day},{day + timedelta(2)},true,5,4",
+            f"{self.room.id},admin,{day + timedelta(2)},{day + timedelta(4)},1,3,2",
+            f"{self.room.id},admin,{day + timedelta(4)},{day + timedelta(6)},,5,5",
+        ]
+        import_reservations(StringIO("\n".join(rows)), "csv")
+        room = Room.objects.get(id=self.room.id)
+        self.assertEqual((room.review_count, room.value_sum, room.clean_sum), (2, 8, 6))
+        self.assertEqual(room.total_rating, round(14 / 12, 2))
+        ratings.rebuild_ratings([self.room.id])
+        rebuilt = Room.objects.get(id=self.room.id)
+        self.assertEqual(
+            [getattr(rebuilt, field) for field in (*ratings.SUMS, "review_count")],
+            [getattr(room, field) for field in (*ratings.SUMS, "review_count")],
+        )
+
+    def test_export_round_trips(self):
+        out = StringIO()
+        call_command("export_reservations", format="jsonl", stdout=out)
+        RoomReservation.objects.all().delete()
+        self.assertEqual(
+            import_reservations(StringIO(out.getvalue()), "jsonl")["created"], 1
+        )
+        response = self.client.get("/api/reservations/bulk/", {"export": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0].split(",")[:7],
+            [
+                "id",
+                "room_id",
+                "user",
+                "start_date",
+                "end_date",
+                "is_active",
+                "is_reviewed",
+            ],
+        )
+        self.assertEqual(len(lines), 2)
+
+
+class OverlapMigrationTest(TransactionTestCase):
+    """Overlapping stays must be resolved before the exclusion constraint."""
+
+    rooms = ("rooms", "0013_remove_room_images")
+    before = [("reservations", "0003_roomreservation_is_reviewed"), rooms]
+    after = [("reservations", "0004_roomreservation_no_overlap"), rooms]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_clashes_block_the_migration_until_released(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model("accounts", "User").objects.create(username="guest")
+        room = apps.get_model("rooms", "Room").objects.create(
+            host=user, title="room", mobile=0
+        )
+        reservations = apps.get_model("reservations", "RoomReservation").objects
+        stays = [(1, 5), (5, 7), (4, 6), (8, 9), (0, 9)]
+        ids = [
+            reservations.create(
+                user=user,
+                room=room,
+                start_date=date(2019, 8, 1) + timedelta(first),
+                end_date=date(2019, 8, 1) + timedelta(last),
+            ).id
+            for first, last in stays
+        ]
+        with self.assertRaises(ValueError) as raised:
+            self.migrate(self.after)
+        self.assertIn(str([ids[2], ids[4]]), raised.exception.args[0])
+        self.assertTrue(reservations.get(id=ids[2]).is_active)
+
+        out = StringIO()
+        with self.assertLogs("reservations.overlaps", "WARNING"):
+            call_command("release_overlaps", deactivate=True, stdout=out)
+        apps = self.migrate(self.after)
+        reservations = apps.get_model("reservations", "RoomReservation").objects
+        active = reservations.order_by("id").values_list("is_active", flat=True)
+        self.assertEqual(list(active), [True, True, False, True, False])
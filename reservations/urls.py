@@ -1,5 +1,8 @@
 from django.urls import include, path
-from reservations.views import ReservationDetailUpdateView
+from reservations.views import ReservationBulkView, ReservationDetailUpdateView
 
 app_name = "reservations"
-urlpatterns = [path("rooms/<int:pk>/", ReservationDetailUpdateView.as_view())]
+urlpatterns = [
+    path("rooms/<int:pk>/", ReservationDetailUpdateView.as_view()),
+    path("bulk/", ReservationBulkView.as_view()),
+]
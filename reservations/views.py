@@ -1,14 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from django.db.models import Q, Avg
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import generics
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from config.metrics import SerializerMetricsMixin
 from config.utils import response_error_handler
 
+from reservations.bulk import export_lines, guess_format, import_reservations
 from reservations.models import RoomReservation
-from rooms.models import Room
+from reservations.ratings import record_review
+from reservations.availability import available_rooms, parse_stay
 
 from reservations.serializers import (
     ReservationUpdateSerializer,
@@ -18,39 +22,20 @@ from reservations.serializers import (
 
 
 def reservation_validation(queryset, start_date, end_date):
-    if start_date and end_date:
-        try:
-            # date reservatable validation
-            formatter = lambda el: int(el) if el[0] is not "0" else int(el[1:])
-            start_time = datetime(*[v for v in map(formatter, start_date.split("-"))])
-            end_time = datetime(*[v for v in map(formatter, end_date.split("-"))])
+    """Narrow a Room queryset to rooms reservable for ``[start_date, end_date)``.
 
-        except Exception:
-            raise ValueError(
-                "date format you passed, is not right format", "type in year-month-day"
-            )
-        if start_time > end_time:
-            raise ValueError(
-                "start day could not be later than end date", "retype form data"
-            )
-        condition_date_1_1 = Q(reservations__start_date__lte=start_time)
-        condition_date_1_2 = Q(reservations__end_date__gte=start_time)
-        condition_date_2_1 = Q(reservations__start_date__lte=end_time)
-        condition_date_2_2 = Q(reservations__end_date__gte=end_time)
-        queryset = queryset.filter(~(condition_date_1_1 & condition_date_1_2)).filter(
-            ~(condition_date_2_1 & condition_date_2_2)
-        )
-        if not queryset:
-            return queryset
-
-        # stayable day validation
-        stay = end_time - start_time + timedelta(1)
-        min_stay = Q(min_stay__lte=stay.days)
-        max_stay = Q(max_stay__gte=stay.days)
-        queryset = queryset.filter(min_stay & max_stay)
+    Raises:
+        ValueError: [date format or order is not right]
+    """
+    if start_date and end_date:
+        start, end = parse_stay(start_date, end_date)
+        queryset = available_rooms(queryset, start, end)
     return queryset
 
-class ReservationDetailUpdateView(generics.RetrieveUpdateAPIView):
+
+class ReservationDetailUpdateView(
+    SerializerMetricsMixin, generics.RetrieveUpdateAPIView
+):
     """A function, able to get, update detail of reservation.
     
     Arguments:
@@ -97,21 +82,10 @@ class ReservationDetailUpdateView(generics.RetrieveUpdateAPIView):
             raise ValueError(
                 "start date not passed", "evaluate your reservation after first-day"
             )
-        super().put(request, *args, **kwargs)
-        room_id = int(self.get_queryset()[0].room_id)
-        reservations = RoomReservation.objects.filter(room=room_id).aggregate(
-            Avg("accuracy_score"),
-            Avg("location_score"),
-            Avg("communication_score"),
-            Avg("checkin_score"),
-            Avg("clean_score"),
-            Avg("value_score"),
-        )
-        total = 0
-        for key, val in reservations.items():
-            total += val
-        total = round(total / 7, 2)
-        Room.objects.filter(id=room_id).update(total_rating=total)
+        with transaction.atomic():
+            before = self.get_queryset().select_for_update().get()
+            super().put(request, *args, **kwargs)
+            record_review(before, self.get_queryset().get())
         return Response(data=None, status=status.HTTP_202_ACCEPTED)
 
 
@@ -122,7 +96,8 @@ class ReservationCreateView(generics.CreateAPIView):
         generics {[CreateAPIView]} -- [POST handler]
     
     Raises:
-        ValueError: [POST-HTTP_404_NOT_FOUND]
+        ValueError: [POST-HTTP_400_BAD_REQUEST]
+        OperationalError: [POST-HTTP_423_LOCKED]
         ValidationError: [POST-HTTP_400_BAD_REQUEST]
     
     Returns:
@@ -135,10 +110,47 @@ class ReservationCreateView(generics.CreateAPIView):
 
     @response_error_handler
     def post(self, request, *args, **kwargs):
-        start_date, end_date = request.data["start_date"], request.data["end_date"]
-        room = Room.objects.filter(id=self.kwargs.get("pk"))
-        
-        if reservation_validation(room, start_date, end_date):
-            return super().post(request, *args, **kwargs)
-        raise ValueError("Date already reservated!", "check for another date.")
+        parse_stay(request.data["start_date"], request.data["end_date"])
+        return super().post(request, *args, **kwargs)
+
+
+class ReservationBulkView(generics.GenericAPIView):
+    """A function, able to import and export reservations in bulk.
+
+    Arguments:
+        generics {[GenericAPIView]} -- [GET, POST handler]
+
+    Raises:
+        ValueError: [GET-HTTP_400_BAD_REQUEST]
+        ValueError: [POST-HTTP_400_BAD_REQUEST]
+
+    Returns:
+        [status] -- [GET-HTTP_200_OK, streamed CSV or JSON lines]
+        [status] -- [POST-HTTP_201_CREATED, created count and per-row conflicts]
+    """
+
+    permission_classes = (IsAdminUser,)
+    queryset = RoomReservation.objects.all()
+    content_types = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
 
+    @response_error_handler
+    def get(self, request, *args, **kwargs):
+        fmt = request.query_params.get("export", "jsonl")
+        queryset = self.get_queryset()
+        room_ids = request.query_params.getlist("room")
+        if room_ids:
+            queryset = queryset.filter(room_id__in=room_ids)
+        response = StreamingHttpResponse(
+            export_lines(queryset, fmt), content_type=self.content_types.get(fmt)
+        )
+        response["Content-Disposition"] = f'attachment; filename="reservations.{fmt}"'
+        return response
+
+    @response_error_handler
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValueError("no file uploaded", "send a CSV or JSONL file as 'file'")
+        fmt = guess_format(upload.name, request.data.get("format", "jsonl"))
+        report = import_reservations(upload, fmt)
+        return Response(data=report, status=status.HTTP_201_CREATED)
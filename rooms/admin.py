@@ -1,7 +1,8 @@
 from django.contrib import admin
-from rooms.models import Room, Facility
+from rooms.models import Room, Facility, RoomPhoto
 
 # Register your models here.
 
 admin.site.register(Room)
 admin.site.register(Facility)
+admin.site.register(RoomPhoto)
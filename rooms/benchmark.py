@@ -0,0 +1,570 @@
+"""Latency and query-count benchmark of the room and reservation endpoints.
+
+Scenarios go through the Django test client against the configured
+database: ``RoomListView`` over the whole filter matrix, ``RoomDetailView``,
+booking through ``ReservationCreateView`` and the review ``put`` of
+``ReservationDetailUpdateView``. Requests carry a token, so they bypass the
+anonymous response cache (``anonymous=True`` measures the cached path).
+Writing scenarios run in a transaction that is rolled back afterwards.
+
+``run`` returns a JSON-able report with p50/p95/p99 latency and query
+counts per scenario; ``compare`` lists the regressions against a stored
+report.
+
+``throughput`` serves the same read requests in one process three ways,
+under a simulated per-query database latency: one at a time like a sync
+WSGI worker, then concurrently through an ASGI handler with the plain sync
+views and with the pooled async adapters of ``config.async_views``.
+
+``connection_cost`` serves a cheap endpoint through a WSGI handler, which
+closes connections after each request like a server does, with a simulated
+connect latency: connecting per request, with persistent connections and
+through a ``config.db`` pool.
+
+``serialization`` times the list serializers on a page of rows, through
+DRF's stock ``ListSerializer`` and the compiled ``FastListSerializer``.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import partial
+from itertools import combinations, product
+from random import Random
+from time import perf_counter, sleep
+from types import ModuleType
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+from django.test import Client, RequestFactory, override_settings
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+
+from config import async_views
+from accounts.serializers import UserListSerializer
+from config.metrics import Histogram
+from locations.models import State
+from locations.serializers import StateSerializer
+from reservations.models import RoomReservation
+from rooms.models import Room, RoomSearchDocument
+from rooms.serializers import RoomListSerializer
+from rooms.seed import WORDS
+
+REPEAT = 20
+ORDERINGS = ("price", "created_at", "updated_at", "total_rating")
+PAGINATIONS = ("page", "cursor")
+FILTERS = ("price", "dates", "capacity")
+PAGE_SIZE = 12
+# p95 may grow by this fraction (plus SLACK_MS for tiny values) over baseline
+TOLERANCE = 0.25
+SLACK_MS = 2.0
+TERMS = 20
+
+
+class Scenario:
+    """Latency and query-count samples of one named scenario."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = Histogram(lowest=1, highest=100000)
+        self.errors = 0
+
+    def report(self):
+        return {
+            "requests": self.latency.count,
+            "errors": self.errors,
+            "p50_ms": round(self.latency.quantile(0.5), 3),
+            "p95_ms": round(self.latency.quantile(0.95), 3),
+            "p99_ms": round(self.latency.quantile(0.99), 3),
+            "max_ms": round(self.latency.max, 3),
+            "queries_p50": self.queries.quantile(0.5),
+            "queries_max": self.queries.max,
+        }
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class Benchmark:
+    def __init__(self, repeat=REPEAT, random_seed=0, anonymous=False, only=()):
+        self.repeat = repeat
+        self.rng = Random(random_seed)
+        self.anonymous = anonymous
+        self.only = tuple(only)
+        self.scenarios = {}
+        self.client = Client()
+        self.today = timezone.now().date()
+
+    def wanted(self, name):
+        return not self.only or name.startswith(self.only)
+
+    def headers(self, user_id):
+        token, _ = Token.objects.get_or_create(user_id=user_id)
+        return {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+
+    def measure(self, name, send):
+        scenario = self.scenarios.setdefault(name, Scenario())
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = perf_counter()
+            response = send()
+            elapsed = perf_counter() - started
+        scenario.latency.record(elapsed * 1000)
+        scenario.queries.record(queries[0])
+        if response.status_code >= 400:
+            scenario.errors += 1
+        return response
+
+    def get(self, url, params, headers):
+        return self.client.get(url, params, **headers)
+
+    def stay(self, earliest=1, latest=300):
+        start = self.today + timedelta(self.rng.randint(earliest, latest))
+        return start, start + timedelta(self.rng.randint(2, 5))
+
+    def list_params(self, ordering, pagination, filters, term):
+        params = {"search": term, "ordering": ordering, "page_size": PAGE_SIZE}
+        params.update({"page": 1} if pagination == "page" else {"pagination": "cursor"})
+        if "price" in filters:
+            params.update(min_price=50, max_price=self.rng.randint(150, 400))
+        if "dates" in filters:
+            params.update(zip(("start_date", "end_date"), map(str, self.stay())))
+        if "capacity" in filters:
+            params["capacity"] = self.rng.randint(2, 6)
+        return params
+
+    def run_lists(self, headers):
+        terms = list(
+            RoomSearchDocument.objects.values_list("state_name", flat=True)
+            .distinct()
+            .order_by("state_name")[:TERMS]
+        )
+        if not terms:
+            return
+        subsets = [
+            subset
+            for size in range(len(FILTERS) + 1)
+            for subset in combinations(FILTERS, size)
+        ]
+        for ordering, pagination, filters in product(ORDERINGS, PAGINATIONS, subsets):
+            name = f"list:{ordering}:{pagination}:{'+'.join(filters) or 'none'}"
+            if not self.wanted(name):
+                continue
+            for _ in range(self.repeat):
+                params = self.list_params(
+                    ordering, pagination, filters, self.rng.choice(terms)
+                )
+                self.measure(name, lambda: self.get("/api/rooms/", params, headers))
+        if self.wanted("list:text"):
+            for _ in range(self.repeat):
+                params = {
+                    "q": " ".join(self.rng.sample(WORDS, 2)),
+                    "ordering": "price",
+                    "page": 1,
+                    "page_size": PAGE_SIZE,
+                }
+                self.measure(
+                    "list:text", lambda: self.get("/api/rooms/", params, headers)
+                )
+
+    def run_detail(self, room_ids, headers):
+        if not self.wanted("detail"):
+            return
+        for _ in range(self.repeat):
+            url = f"/api/rooms/{self.rng.choice(room_ids)}/"
+            self.measure("detail", lambda: self.get(url, {}, headers))
+
+    def run_booking(self, room_ids, headers):
+        if not self.wanted("booking"):
+            return
+        with rolled_back():
+            for _ in range(self.repeat):
+                # past the seeded stays, so most attempts can succeed
+                start, end = self.stay(400, 700)
+                url = f"/api/rooms/{self.rng.choice(room_ids)}"
+                data = {"start_date": str(start), "end_date": str(end)}
+                self.measure("booking", lambda: self.client.post(url, data, **headers))
+
+    def run_review(self):
+        if not self.wanted("review"):
+            return
+        past = list(
+            RoomReservation.objects.filter(end_date__lt=self.today)
+            .order_by("id")
+            .values_list("id", "user_id")[: self.repeat]
+        )
+        with rolled_back():
+            for reservation_id, user_id in past:
+                url = f"/api/reservations/rooms/{reservation_id}/"
+                data = {"description": "benchmark"}
+                data.update(
+                    (f"{name}_score", self.rng.randint(1, 5))
+                    for name in ("accuracy", "location", "communication")
+                )
+                headers = self.headers(user_id)
+                self.measure(
+                    "review",
+                    lambda: self.client.put(
+                        url, data, content_type="application/json", **headers
+                    ),
+                )
+
+    def run(self):
+        room_ids = list(Room.objects.order_by("id").values_list("id", flat=True))
+        if not room_ids:
+            raise ValueError("no rooms to benchmark", "seed a dataset first")
+        guest = self.headers(get_user_model().objects.order_by("id").first().id)
+        reads = {} if self.anonymous else guest
+        self.run_lists(reads)
+        self.run_detail(room_ids, reads)
+        self.run_booking(room_ids, guest)
+        self.run_review()
+        return {
+            "database": connection.vendor,
+            "dataset": {
+                "rooms": len(room_ids),
+                "reservations": RoomReservation.objects.count(),
+            },
+            "repeat": self.repeat,
+            "anonymous": self.anonymous,
+            "scenarios": {
+                name: scenario.report()
+                for name, scenario in sorted(self.scenarios.items())
+            },
+        }
+
+
+def run(repeat=REPEAT, random_seed=0, anonymous=False, only=()):
+    return Benchmark(repeat, random_seed, anonymous, only).run()
+
+
+def compare(report, baseline, tolerance=TOLERANCE, slack_ms=SLACK_MS):
+    """Regressions of ``report`` against ``baseline``, as readable lines.
+
+    A scenario regresses when its p95 grows past the tolerance, when it
+    issues more queries or when it fails more often.
+    """
+    regressions = []
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        limit = before["p95_ms"] * (1 + tolerance) + slack_ms
+        if current["p95_ms"] > limit:
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']}ms over {round(limit, 3)}ms"
+            )
+        if current["queries_max"] > before["queries_max"]:
+            regressions.append(
+                f"{name}: {current['queries_max']} queries, "
+                f"was {before['queries_max']}"
+            )
+        if current["errors"] > before["errors"]:
+            regressions.append(
+                f"{name}: {current['errors']} errors, was {before['errors']}"
+            )
+    return regressions
+
+
+simulated_latency = ContextVar("simulated_latency", default=0.0)
+
+
+def delay_query(execute, sql, params, many, context):
+    latency = simulated_latency.get()
+    if latency:
+        sleep(latency)
+    return execute(sql, params, many, context)
+
+
+opened = [0]
+
+
+def install_delay(sender, connection=None, **kwargs):
+    opened[0] += 1
+    if delay_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(delay_query)
+
+
+@contextmanager
+def delayed_queries():
+    """Count connections and delay their queries, for the duration only."""
+    connection_created.connect(install_delay)
+    for db in connections.all():
+        install_delay(None, db)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install_delay)
+        for db in connections.all():
+            if delay_query in db.execute_wrappers:
+                db.execute_wrappers.remove(delay_query)
+
+
+def read_urlconf(adapt):
+    """Room list/detail and locations routes, views passed through ``adapt``."""
+    from locations.urls import locations_router
+    from rooms.views import RoomDetailView, RoomListView
+
+    urlconf = ModuleType("rooms.benchmark.urls")
+    urlconf.urlpatterns = adapt(
+        [
+            path("api/rooms/", RoomListView.as_view()),
+            path("api/rooms/<int:pk>/", RoomDetailView.as_view()),
+            path("api/locations/", include(locations_router.urls)),
+        ]
+    )
+    return urlconf
+
+
+def read_urls(rng, count):
+    terms = list(
+        RoomSearchDocument.objects.values_list("state_name", flat=True)
+        .distinct()
+        .order_by("state_name")[:TERMS]
+    )
+    room_ids = list(Room.objects.values_list("id", flat=True)[:1000])
+    if not (terms and room_ids):
+        raise ValueError("no rooms to benchmark", "seed a dataset first")
+    kinds = [
+        lambda: f"/api/rooms/?search={rng.choice(terms)}&ordering=price"
+        f"&page=1&page_size={PAGE_SIZE}",
+        lambda: f"/api/rooms/{rng.choice(room_ids)}/",
+        lambda: "/api/locations/state/",
+    ]
+    return [kinds[index % len(kinds)]() for index in range(count)]
+
+
+async def asgi_get(application, url, authorization):
+    """Status code of a GET through the ASGI ``application``."""
+    path_info, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path_info,
+        "raw_path": path_info.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", authorization.encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    body = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = []
+
+    async def receive():
+        if body:
+            return body.pop()
+        # no disconnect: wait until the handler stops listening
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def serial(urls, authorization, latency):
+    """Requests one after another, as a single-threaded WSGI worker serves."""
+    client = Client(HTTP_AUTHORIZATION=authorization)
+    token = simulated_latency.set(latency)
+    try:
+        return sum(client.get(url).status_code >= 400 for url in urls)
+    finally:
+        simulated_latency.reset(token)
+
+
+async def concurrent(application, urls, concurrency, authorization, latency):
+    simulated_latency.set(latency)
+    pending = iter(urls)
+    errors = []
+
+    async def client():
+        for url in pending:
+            if await asgi_get(application, url, authorization) >= 400:
+                errors.append(url)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return len(errors)
+
+
+def throughput(requests=300, concurrency=32, latency_ms=5.0, random_seed=0):
+    """Requests per second of the WSGI, ASGI sync and ASGI pooled read paths.
+
+    ``latency_ms`` is added to every query to stand in for a remote
+    database; ``db_connections`` counts the connections each mode opened.
+    """
+    urls = read_urls(Random(random_seed), requests)
+    user_id = get_user_model().objects.order_by("id").values_list("id", flat=True)[0]
+    token, _ = Token.objects.get_or_create(user_id=user_id)
+    authorization = f"Token {token.key}"
+    latency = latency_ms / 1000
+    report = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "db_latency_ms": latency_ms,
+        "async_workers": async_views.workers(),
+    }
+
+    def asgi():
+        application = ASGIHandler()
+        return asyncio.run(
+            concurrent(application, urls, concurrency, authorization, latency)
+        )
+
+    modes = {
+        "wsgi": (list, lambda: serial(urls, authorization, latency)),
+        "asgi_sync": (list, asgi),
+        "asgi_async": (partial(async_views.asyncify, force=True), asgi),
+    }
+    for mode, (adapt, send) in modes.items():
+        with override_settings(ROOT_URLCONF=read_urlconf(adapt)), delayed_queries():
+            before, started = opened[0], perf_counter()
+            errors = send()
+            elapsed = perf_counter() - started
+        report[mode] = {
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(requests / elapsed, 1),
+            "errors": errors,
+            "db_connections": opened[0] - before,
+        }
+    wsgi = report["wsgi"]["requests_per_second"]
+    for mode in ("asgi_sync", "asgi_async"):
+        report[mode]["speedup"] = round(report[mode]["requests_per_second"] / wsgi, 2)
+    return report
+
+
+CONNECTION_MODES = {
+    "per_request": {"CONN_MAX_AGE": 0, "POOL": None},
+    "persistent": {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True, "POOL": None},
+    "pooled": {"CONN_MAX_AGE": 0},
+}
+POOLED_ENGINES = {"postgresql": "config.db.postgresql", "sqlite": "config.db.sqlite3"}
+CHEAP_URL = "/api/locations/state/"
+
+
+def wsgi_get(application, url):
+    """Status code of a GET through the WSGI ``application``."""
+    path_info, _, query = url.partition("?")
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path_info, "QUERY_STRING": query}
+    setup_testing_defaults(environ)
+    status = []
+    response = application(environ, lambda line, headers: status.append(line))
+    # closing fires request_finished, which closes or keeps the connections
+    response.close()
+    return int(status[0].split()[0])
+
+
+def slow_wrapper(mode, connect_latency, pool_size, connects):
+    """Default database wrapper of ``mode``, ``connect_latency`` s to connect."""
+    db = connections[DEFAULT_DB_ALIAS]
+    if db.vendor not in POOLED_ENGINES:
+        raise ValueError(f"no pooled backend for {db.vendor}", "use PostgreSQL")
+    engine = POOLED_ENGINES[db.vendor]
+
+    class DatabaseWrapper(load_backend(engine).DatabaseWrapper):
+        def open_connection(self, conn_params):
+            connects.append(mode)
+            sleep(connect_latency)
+            return super().open_connection(conn_params)
+
+    settings_dict = dict(db.settings_dict, ENGINE=engine, POOL={"MAX_SIZE": pool_size})
+    settings_dict.update(CONNECTION_MODES[mode])
+    return DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+
+
+def connection_cost(requests=200, connect_ms=20.0, pool_size=4):
+    """Latency of a cheap endpoint per ``CONNECTION_MODES`` entry.
+
+    ``connect_ms`` is added to every new connection to stand in for a
+    remote database; ``db_connections`` counts the ones each mode opened.
+    """
+    application = WSGIHandler()
+    original = connections[DEFAULT_DB_ALIAS]
+    report = {"requests": requests, "url": CHEAP_URL, "connect_ms": connect_ms}
+    for mode in CONNECTION_MODES:
+        connects, latency, errors = [], Histogram(), 0
+        db = slow_wrapper(mode, connect_ms / 1000, pool_size, connects)
+        connections[DEFAULT_DB_ALIAS] = db
+        try:
+            for _ in range(requests):
+                started = perf_counter()
+                errors += wsgi_get(application, CHEAP_URL) >= 400
+                latency.record((perf_counter() - started) * 1000)
+            pool = db.get_pool()
+            db.close()
+        finally:
+            connections[DEFAULT_DB_ALIAS] = original
+        report[mode] = {
+            "errors": errors,
+            "db_connections": len(connects),
+            "p50_ms": round(latency.quantile(0.5), 3),
+            "p95_ms": round(latency.quantile(0.95), 3),
+            "mean_ms": round(latency.sum / latency.count, 3),
+        }
+        if pool is not None:
+            report[mode]["pool"] = pool.stats()
+            pool.close()
+    return report
+
+
+def time_page(make_serializer, repeat):
+    """Milliseconds per ``.data`` of a fresh serializer, best of ``repeat``."""
+    best = float("inf")
+    for _ in range(repeat):
+        serializer = make_serializer()
+        started = perf_counter()
+        serializer.data
+        best = min(best, perf_counter() - started)
+    return best * 1000
+
+
+def serialization(rows=100, repeat=REPEAT):
+    """Serializer time of a list page, stock DRF against the compiled path."""
+    context = {"request": Request(RequestFactory().get("/"))}
+    cases = {
+        "rooms": (RoomListSerializer, Room.objects.all()),
+        "users": (UserListSerializer, get_user_model().objects.all()),
+        "states": (StateSerializer, State.objects.all()),
+    }
+    report = {"rows": rows, "repeat": repeat}
+    for name, (serializer_class, queryset) in cases.items():
+        page = list(serializer_class.setup_eager_loading(queryset)[:rows])
+        stock = time_page(
+            lambda: ListSerializer(page, child=serializer_class(), context=context),
+            repeat,
+        )
+        fast = time_page(
+            lambda: serializer_class(page, many=True, context=context), repeat
+        )
+        report[name] = {
+            "rows": len(page),
+            "drf_ms": round(stock, 3),
+            "compiled_ms": round(fast, 3),
+            "speedup": round(stock / fast, 2) if fast else None,
+        }
+    return report
@@ -0,0 +1,110 @@
+"""Maintenance of ``RoomSearchDocument`` rows.
+
+Documents are written by the signals in ``rooms.signals`` and can be
+rebuilt from scratch with ``manage.py rebuild_search_documents``.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from rooms.models import Room, RoomSearchDocument
+
+SOURCE_COLUMNS = {
+    "state_name": "state__name",
+    "country_name": "state__country__name",
+    "host_username": "host__username",
+    "price": "price",
+    "capacity": "capacity",
+    "total_rating": "total_rating",
+    "min_stay": "min_stay",
+    "max_stay": "max_stay",
+    "active": "active",
+}
+TEXT_COLUMNS = ("title", "description", "address")
+LOWERED = ("state_name", "country_name", "host_username")
+VERSION_KEY = "rooms:search-documents:version"
+CHANGES_KEY = "rooms:search-documents:changes:"
+CHANGES_TTL = 3600
+MAX_CHANGES = 1000
+
+
+def version():
+    return cache.get_or_set(VERSION_KEY, 0, None)
+
+
+def touch(room_ids):
+    """Log the rooms whose documents changed under a new version.
+
+    In-process indexes read the log to reload only those documents.
+    """
+    cache.add(VERSION_KEY, 0, None)
+    current = cache.incr(VERSION_KEY)
+    cache.set(f"{CHANGES_KEY}{current}", list(room_ids), CHANGES_TTL)
+
+
+def changes(since, until):
+    """Rooms changed after version ``since`` up to ``until``.
+
+    None when the log cannot tell: versions too far apart, or entries
+    expired or not written yet.
+    """
+    if not since < until <= since + MAX_CHANGES:
+        return None
+    keys = [f"{CHANGES_KEY}{number}" for number in range(since + 1, until + 1)]
+    logged = cache.get_many(keys)
+    if len(logged) != len(keys):
+        return None
+    return set().union(*logged.values())
+
+
+def normalize(value):
+    return (value or "").lower()
+
+
+def build_documents(rooms):
+    """Yield unsaved documents for a Room queryset in one joined query."""
+    columns = ["id", *SOURCE_COLUMNS.values(), *TEXT_COLUMNS]
+    for row in rooms.order_by().values_list(*columns).iterator():
+        values = dict(zip(SOURCE_COLUMNS, row[1:]))
+        text = row[1 + len(SOURCE_COLUMNS) :]
+        places = (values["state_name"], values["country_name"])
+        values["body"] = " ".join(part for part in (*text, *places) if part)
+        for name in LOWERED:
+            values[name] = normalize(values[name])
+        yield RoomSearchDocument(room_id=row[0], **values)
+
+
+def sync_documents(room_ids):
+    room_ids = list(room_ids)
+    documents = list(build_documents(Room.objects.filter(id__in=room_ids)))
+    with transaction.atomic():
+        RoomSearchDocument.objects.filter(room_id__in=room_ids).delete()
+        RoomSearchDocument.objects.bulk_create(documents)
+    touch(room_ids)
+    return len(documents)
+
+
+def rebuild_documents(batch_size=1000):
+    total, last = 0, 0
+    room_ids = Room.objects.order_by("id").values_list("id", flat=True)
+    while True:
+        batch = list(room_ids.filter(id__gt=last)[:batch_size])
+        if not batch:
+            return total
+        total += sync_documents(batch)
+        last = batch[-1]
+
+
+def search_terms(room_ids):
+    """Every ``search`` term that matches one of the rooms.
+
+    That is the state and country names and every prefix of the host
+    username, as stored on the documents.
+    """
+    terms = set()
+    rows = RoomSearchDocument.objects.filter(room_id__in=room_ids).values_list(
+        "state_name", "country_name", "host_username"
+    )
+    for state_name, country_name, host_username in rows:
+        terms.update(filter(None, (state_name, country_name)))
+        terms.update(host_username[:i] for i in range(1, len(host_username) + 1))
+    return terms
@@ -1,13 +1,37 @@
 from django.db.models import Q
 from rest_framework import filters
-from reservations.views import reservation_validation
+from reservations.availability import parse_stay
+from reservations.calendar import filter_available
+from rooms import search
+
+# filters read the narrow RoomSearchDocument row instead of Room and its joins
+DOCUMENT = "search_document__"
+
+
+class DocumentSearchFilter(filters.SearchFilter):
+    """``search`` matched against the lower-cased columns of the search document.
+
+    Every term must equal the state or country name or prefix the host
+    username, the same contract as ``=state__name``, ``=state__country__name``
+    and ``^host__username`` on ``SearchFilter``, without the joins.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for term in self.get_search_terms(request):
+            term = term.lower()
+            queryset = queryset.filter(
+                Q(**{f"{DOCUMENT}state_name": term})
+                | Q(**{f"{DOCUMENT}country_name": term})
+                | Q(**{f"{DOCUMENT}host_username__startswith": term})
+            )
+        return queryset
 
 
 class CapacityFilterBackend(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
         capacity = request.query_params.get("capacity", None)
         if capacity:
-            queryset = queryset.filter(capacity__gte=capacity)
+            queryset = queryset.filter(**{f"{DOCUMENT}capacity__gte": capacity})
         return queryset
 
 
@@ -16,7 +40,8 @@ class DateFilterBackend(filters.BaseFilterBackend):
         start_date = request.query_params.get("start_date", None)
         end_date = request.query_params.get("end_date", None)
         if start_date and end_date:
-            queryset = reservation_validation(queryset, start_date, end_date)
+            start, end = parse_stay(start_date, end_date)
+            queryset = filter_available(queryset, start, end)
         return queryset
 
 
@@ -24,9 +49,23 @@ class PriceFilterBackend(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
         min_price = request.query_params.get("min_price", 0)
         max_price = request.query_params.get("max_price", None)
-        condition_min = Q(price__gte=min_price)
+        condition_min = Q(**{f"{DOCUMENT}price__gte": min_price})
         if not max_price:
             return queryset.filter(condition_min)
-        condition_max = Q(price__lte=max_price)
+        condition_max = Q(**{f"{DOCUMENT}price__lte": max_price})
         return queryset.filter(condition_min & condition_max)
 
+
+class FullTextSearchBackend(filters.BaseFilterBackend):
+    """``q`` free text over title, description, address, state and country.
+
+    Must run after ordering: results come back by relevance, with the
+    requested ordering as tiebreak.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return queryset
+        queryset = search.search(queryset, text)
+        return queryset.order_by("-search_rank", *queryset.query.order_by)
@@ -0,0 +1,166 @@
+"""Resized JPEG and WebP derivatives of room photos.
+
+Every photo gets ``thumbnail``/``card``/``full`` variants, stored next to
+the original as ``<name>.<variant>.jpg`` and ``<name>.<variant>.webp``.
+``RoomPhoto.variants`` is a JSON manifest of the processed original and the
+width of each variant, which serializers turn into ``srcset`` strings
+without touching storage.
+
+Processing runs on a small thread pool after the saving transaction
+commits, so uploads return without waiting for Pillow.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from rooms.models import RoomPhoto
+
+VARIANTS = (("thumbnail", 320), ("card", 720), ("full", 1600))
+FORMATS = (
+    ("jpeg", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    ("webp", "webp", {"quality": 80, "method": 4}),
+)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def workers():
+    return getattr(settings, "IMAGE_PIPELINE_WORKERS", 2)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers(), thread_name_prefix="images")
+        return _executor
+
+
+def manifest(photo):
+    try:
+        return json.loads(photo.variants or "{}")
+    except ValueError:
+        return {}
+
+
+def is_stale(photo):
+    """True when the current file of a photo has no derivatives yet."""
+    return bool(photo.image.name) and manifest(photo).get("source") != photo.image.name
+
+
+def variant_name(source, variant, extension):
+    root = source.rsplit(".", 1)[0]
+    return f"{root}.{variant}.{extension}"
+
+
+def flatten(image, background=(255, 255, 255)):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        canvas = Image.new("RGB", image.size, background)
+        canvas.paste(image, mask=image.split()[-1])
+        return canvas
+    return image.convert("RGB")
+
+
+def render(image, width, fmt, options):
+    resized = image.copy()
+    resized.thumbnail((width, width * 4), Image.LANCZOS)
+    if fmt == "jpeg":
+        resized = flatten(resized)
+    elif resized.mode not in ("RGB", "RGBA"):
+        resized = resized.convert("RGBA")
+    buffer = BytesIO()
+    resized.save(buffer, fmt.upper(), **options)
+    return resized.width, buffer.getvalue()
+
+
+def generate(file):
+    """Write every variant of an image file.
+
+    Returns ``(widths, size)``: the width of each variant and the size of
+    the upright original.
+    """
+    storage, source = file.storage, file.name
+    with storage.open(source) as stream:
+        image = ImageOps.exif_transpose(Image.open(stream))
+        image.load()
+    widths = {}
+    for variant, width in VARIANTS:
+        for fmt, extension, options in FORMATS:
+            widths[variant], content = render(image, width, fmt, options)
+            name = variant_name(source, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(content))
+    return widths, image.size
+
+
+def process_photo(photo_id, force=False):
+    """Generate the derivatives of a photo and record them in its manifest."""
+    photo = RoomPhoto.objects.filter(id=photo_id).first()
+    if photo is None or not (force or is_stale(photo)):
+        return False
+    try:
+        widths, (width, height) = generate(photo.image)
+    except (OSError, Image.DecompressionBombError):
+        # unreadable or missing original: leave it unprocessed
+        return False
+    entry = json.dumps({"source": photo.image.name, "widths": widths})
+    # the manifest only applies while the photo still has the same file
+    RoomPhoto.objects.filter(id=photo_id, image=photo.image.name).update(
+        variants=entry, width=width, height=height
+    )
+    # the cover shows on list pages too; signals import this module
+    from rooms.signals import invalidate_rooms
+
+    invalidate_rooms([photo.room_id])
+    return True
+
+
+def _run(photo_id):
+    close_old_connections()
+    try:
+        return process_photo(photo_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(photo_id):
+    """Process a photo once the current transaction commits."""
+    if workers() == 0:
+        transaction.on_commit(lambda: process_photo(photo_id))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run, photo_id))
+
+
+def candidates(widths):
+    """Variants of distinct widths; small originals repeat the same width."""
+    seen = set()
+    for variant, _ in VARIANTS:
+        width = widths.get(variant)
+        if width and width not in seen:
+            seen.add(width)
+            yield variant, width
+
+
+def srcset(photo):
+    """``{"jpeg": srcset, "webp": srcset}`` of a processed photo, else None."""
+    entry = manifest(photo)
+    if not entry or photo.image.name != entry["source"]:
+        return None
+    url = photo.image.storage.url
+    variants = list(candidates(entry["widths"]))
+    return {
+        fmt: ", ".join(
+            f"{url(variant_name(photo.image.name, variant, extension))} {width}w"
+            for variant, width in variants
+        )
+        for fmt, extension, _ in FORMATS
+    }
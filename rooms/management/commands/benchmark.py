@@ -0,0 +1,109 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.benchmark import (
+    REPEAT,
+    SLACK_MS,
+    TOLERANCE,
+    compare,
+    connection_cost,
+    run,
+    serialization,
+    throughput,
+)
+from rooms.seed import SIZES, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark room search, detail, booking and review endpoints; print "
+        "p50/p95/p99 latency and query counts as JSON and fail on regressions "
+        "against --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", action="store_true", help="insert a synthetic dataset first"
+        )
+        for name, default in SIZES.items():
+            parser.add_argument(f"--{name}", type=int, default=default)
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=REPEAT)
+        parser.add_argument(
+            "--anonymous", action="store_true", help="read through the response cache"
+        )
+        parser.add_argument(
+            "--only", action="append", default=[], help="scenario name prefix"
+        )
+        parser.add_argument("--output", help="also write the report to this file")
+        parser.add_argument("--baseline", help="report to compare against")
+        parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+        parser.add_argument("--slack-ms", type=float, default=SLACK_MS)
+        parser.add_argument(
+            "--throughput",
+            action="store_true",
+            help="compare sync and async read throughput through ASGI instead",
+        )
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--db-latency-ms", type=float, default=5.0)
+        parser.add_argument(
+            "--connections",
+            action="store_true",
+            help="compare per-request, persistent and pooled connections instead",
+        )
+        parser.add_argument("--connect-ms", type=float, default=20.0)
+        parser.add_argument("--pool-size", type=int, default=4)
+        parser.add_argument(
+            "--serializers",
+            action="store_true",
+            help="compare stock and compiled list serialization instead",
+        )
+        parser.add_argument("--rows", type=int, default=100)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"baseline not readable: {e}")
+        try:
+            if options["seed"]:
+                sizes = {name: options[name] for name in SIZES}
+                seed(random_seed=options["random_seed"], **sizes)
+            if options["serializers"]:
+                report = serialization(options["rows"], options["repeat"])
+            elif options["connections"]:
+                report = connection_cost(
+                    options["requests"], options["connect_ms"], options["pool_size"]
+                )
+            elif options["throughput"]:
+                report = throughput(
+                    options["requests"],
+                    options["concurrency"],
+                    options["db_latency_ms"],
+                    options["random_seed"],
+                )
+            else:
+                report = run(
+                    options["repeat"],
+                    options["random_seed"],
+                    options["anonymous"],
+                    options["only"],
+                )
+        except ValueError as e:
+            raise CommandError(" - ".join(e.args))
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                stream.write(text + "\n")
+        self.stdout.write(text)
+        if baseline is not None and "scenarios" in report:
+            regressions = compare(
+                report, baseline, options["tolerance"], options["slack_ms"]
+            )
+            if regressions:
+                raise CommandError("regressions:\n" + "\n".join(regressions))
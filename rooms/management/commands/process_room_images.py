@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from rooms.images import process_photo
+from rooms.models import RoomPhoto
+
+
+def process(photo_id, force):
+    try:
+        return process_photo(photo_id, force=force)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Backfill resized JPEG/WebP variants of room photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_ids", nargs="*", type=int)
+        parser.add_argument("--force", action="store_true")
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        photos = RoomPhoto.objects.order_by("id")
+        if options["room_ids"]:
+            photos = photos.filter(room_id__in=options["room_ids"])
+        photo_ids = list(photos.values_list("id", flat=True))
+        work = partial(process, force=options["force"])
+        with ThreadPoolExecutor(max(options["workers"], 1)) as pool:
+            processed = sum(pool.map(work, photo_ids))
+        self.stdout.write(self.style.SUCCESS(f"processed {processed} photos"))
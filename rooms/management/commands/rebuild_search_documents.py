@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from rooms.documents import rebuild_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized room search documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_documents(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {total} search documents"))
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_alter_state_country'),
+        ('rooms', '0007_auto_20190717_0858'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Facility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='roomreview',
+            name='booking',
+        ),
+        migrations.RemoveField(
+            model_name='roomreview',
+            name='room',
+        ),
+        migrations.RemoveField(
+            model_name='roomreview',
+            name='writer',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='accuracy_rating',
+        ),
+        migrations.RenameField(
+            model_name='room',
+            old_name='bed_type',
+            new_name='bath_type',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='checkin_rating',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='clean_rating',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='communication_rating',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='location_rating',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='value_rating',
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='image_1',
+            field=models.ImageField(blank=True, null=True, upload_to='rooms/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='image_2',
+            field=models.ImageField(blank=True, null=True, upload_to='rooms/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='image_3',
+            field=models.ImageField(blank=True, null=True, upload_to='rooms/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='image_4',
+            field=models.ImageField(blank=True, null=True, upload_to='rooms/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='room',
+            name='state',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rooms', to='locations.state'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='facilities',
+            field=models.ManyToManyField(related_name='rooms', to='rooms.facility'),
+        ),
+        migrations.DeleteModel(
+            name='Reservation',
+        ),
+        migrations.DeleteModel(
+            name='RoomReview',
+        ),
+    ]
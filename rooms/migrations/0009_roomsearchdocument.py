@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SOURCE_COLUMNS = {
+    "state_name": "state__name",
+    "country_name": "state__country__name",
+    "host_username": "host__username",
+    "price": "price",
+    "capacity": "capacity",
+    "total_rating": "total_rating",
+    "min_stay": "min_stay",
+    "max_stay": "max_stay",
+    "active": "active",
+}
+TEXT_COLUMNS = ("title", "description", "address")
+LOWERED = ("state_name", "country_name", "host_username")
+
+
+def build_documents(apps, schema_editor):
+    """The documents ``rooms.documents.rebuild_documents`` would write."""
+    Room = apps.get_model("rooms", "Room")
+    RoomSearchDocument = apps.get_model("rooms", "RoomSearchDocument")
+    using = schema_editor.connection.alias
+    columns = ["id", *SOURCE_COLUMNS.values(), *TEXT_COLUMNS]
+    rows = Room.objects.using(using).order_by("id").values_list(*columns)
+    documents = []
+    for row in rows.iterator():
+        values = dict(zip(SOURCE_COLUMNS, row[1:]))
+        text = row[1 + len(SOURCE_COLUMNS) :]
+        places = (values["state_name"], values["country_name"])
+        values["body"] = " ".join(part for part in (*text, *places) if part)
+        for name in LOWERED:
+            values[name] = (values[name] or "").lower()
+        documents.append(RoomSearchDocument(room_id=row[0], **values))
+        if len(documents) == 1000:
+            RoomSearchDocument.objects.using(using).bulk_create(documents)
+            documents = []
+    RoomSearchDocument.objects.using(using).bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0008_resync_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomSearchDocument',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='rooms.room')),
+                ('state_name', models.CharField(blank=True, max_length=30)),
+                ('country_name', models.CharField(blank=True, max_length=30)),
+                ('host_username', models.CharField(max_length=150)),
+                ('price', models.PositiveIntegerField(blank=True, null=True)),
+                ('capacity', models.SmallIntegerField(default=6)),
+                ('total_rating', models.FloatField(default=0)),
+                ('min_stay', models.SmallIntegerField(default=1)),
+                ('max_stay', models.SmallIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+                ('body', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state_name', 'price'], name='roomdoc_state_price'), models.Index(fields=['country_name', 'price'], name='roomdoc_country_price'), models.Index(fields=['host_username'], name='roomdoc_host_prefix', opclasses=['varchar_pattern_ops']), models.Index(fields=['active', 'capacity', 'price'], name='roomdoc_capacity_price')],
+            },
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+SCORES = ("accuracy", "location", "communication", "checkin", "clean", "value")
+
+
+def sum_ratings(apps, schema_editor):
+    """The sums ``reservations.ratings.rebuild_ratings`` would write."""
+    Room = apps.get_model("rooms", "Room")
+    RoomReservation = apps.get_model("reservations", "RoomReservation")
+    using = schema_editor.connection.alias
+    aggregates = {f"{name}_sum": Sum(f"{name}_score") for name in SCORES}
+    # a review deactivates the reservation it rates
+    reviewed = (
+        RoomReservation.objects.using(using)
+        .filter(is_active=False)
+        .values("room_id")
+        .annotate(review_count=Count("id"), **aggregates)
+    )
+    for row in reviewed.iterator():
+        room_id = row.pop("room_id")
+        sums = [row[f"{name}_sum"] or 0 for name in SCORES]
+        row["total_rating"] = round(sum(sums) / (len(SCORES) * row["review_count"]), 2)
+        Room.objects.using(using).filter(id=room_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0001_initial'),
+        ('rooms', '0009_roomsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='accuracy_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='location_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='communication_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='checkin_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='clean_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='value_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(sum_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0010_room_rating_sums'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomPhoto',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='rooms/%Y/%m/%d/')),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('photo_type', models.SmallIntegerField(choices=[(1, 'Inside of the room'), (2, 'View of the room'), (3, 'External appearance of the room'), (4, 'Around the room'), (5, 'Other')], default=5)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('variants', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='rooms.room')),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+                'indexes': [models.Index(fields=['room', 'order'], name='roomphoto_room_order')],
+            },
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='cover',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='rooms.roomphoto'),
+        ),
+    ]
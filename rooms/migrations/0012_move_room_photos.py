@@ -0,0 +1,71 @@
+from django.db import migrations
+
+LEGACY_COLUMNS = ("image", "image_1", "image_2", "image_3", "image_4")
+BATCH_SIZE = 1000
+
+
+def move_photos(apps, schema_editor):
+    """Turn the legacy image columns into ``RoomPhoto`` rows and covers.
+
+    Run ``process_room_images`` afterwards for the resized variants.
+    """
+    Room = apps.get_model("rooms", "Room")
+    RoomPhoto = apps.get_model("rooms", "RoomPhoto")
+    using = schema_editor.connection.alias
+    rooms = Room.objects.using(using).order_by("id")
+    photos = RoomPhoto.objects.using(using)
+    last = 0
+    while True:
+        rows = list(
+            rooms.filter(id__gt=last).values_list("id", *LEGACY_COLUMNS)[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last = rows[-1][0]
+        moved = set(
+            photos.filter(room_id__in=[row[0] for row in rows]).values_list(
+                "room_id", flat=True
+            )
+        )
+        photos.bulk_create(
+            RoomPhoto(room_id=row[0], image=name, order=order)
+            for row in rows
+            if row[0] not in moved
+            for order, name in enumerate(name for name in row[1:] if name)
+        )
+        covers = {}
+        for photo_id, room_id in (
+            photos.filter(room_id__in=[row[0] for row in rows])
+            .order_by("order", "id")
+            .values_list("id", "room_id")
+        ):
+            covers.setdefault(room_id, photo_id)
+        for room_id, photo_id in covers.items():
+            rooms.filter(id=room_id).update(cover_id=photo_id)
+
+
+def restore_images(apps, schema_editor):
+    Room = apps.get_model("rooms", "Room")
+    RoomPhoto = apps.get_model("rooms", "RoomPhoto")
+    using = schema_editor.connection.alias
+    rooms = Room.objects.using(using)
+    images = {}
+    for room_id, name in (
+        RoomPhoto.objects.using(using)
+        .order_by("room_id", "order", "id")
+        .values_list("room_id", "image")
+    ):
+        images.setdefault(room_id, []).append(name)
+    for room_id, names in images.items():
+        rooms.filter(id=room_id).update(**dict(zip(LEGACY_COLUMNS, names)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_roomphoto'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_photos, restore_images),
+    ]
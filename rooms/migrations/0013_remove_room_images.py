@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0012_move_room_photos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='room',
+            name='image',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='image_1',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='image_2',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='image_3',
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='image_4',
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TABLE = "rooms_roomsearchdocument"
+
+
+class PostgresTrigramExtension(TrigramExtension):
+    """``pg_trgm``, left out on databases without extensions."""
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class PostgresRunSQL(migrations.RunSQL):
+    """``RunSQL`` left out on databases without GIN indexes."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    """GIN indexes behind ``rooms.search`` on PostgreSQL.
+
+    ``IF NOT EXISTS`` keeps the indexes the old post_migrate hook added.
+    """
+
+    dependencies = [
+        ('rooms', '0013_remove_room_images'),
+    ]
+
+    operations = [
+        PostgresTrigramExtension(),
+        PostgresRunSQL(
+            f"CREATE INDEX IF NOT EXISTS roomdoc_body_fts ON {TABLE} "
+            "USING gin (to_tsvector('simple', body))",
+            "DROP INDEX IF EXISTS roomdoc_body_fts",
+        ),
+        PostgresRunSQL(
+            f"CREATE INDEX IF NOT EXISTS roomdoc_body_trgm ON {TABLE} "
+            "USING gin (body gin_trgm_ops)",
+            "DROP INDEX IF EXISTS roomdoc_body_trgm",
+        ),
+    ]
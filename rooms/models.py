@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.db import models
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
+from django.utils.translation import get_language, gettext
 from locations.models import State
 
 
@@ -40,7 +42,7 @@ PHOTO_TYPES = [
     (2, "View of the room"),
     (3, "External appearance of the room"),
     (4, "Around the room"),
-    (4, "Other"),
+    (5, "Other"),
 ]
 
 BOOKING_STATUS = [
@@ -65,6 +67,59 @@ MESSAGE_STATUS = [
 ]
 
 
+class ChoiceLabels:
+    """Label of every value of a choices list, looked up in O(1).
+
+    ``get_FOO_display`` rebuilds a dict of the field's choices on every call;
+    these tables are built once. They hold the labels as the API renders
+    them: DRF's ``ChoiceField`` turns a label spelling one of the values
+    back into that value, so the numeric labels of ``n_tuple`` stay numbers.
+    With ``USE_I18N`` the string labels are translated once per language.
+    """
+
+    def __init__(self, choices):
+        self.choices = tuple(choices)
+        self.labels = self.render(dict(self.choices))
+        self._localized = {}
+
+    def __deepcopy__(self, memo):
+        # serializers deep-copy their fields' arguments; share the table
+        return self
+
+    def render(self, labels):
+        values = {str(value): value for value in labels}
+        return {
+            value: values.get(str(label), label) for value, label in labels.items()
+        }
+
+    def localized(self):
+        """Labels in the active language."""
+        if not settings.USE_I18N:
+            return self.labels
+        language = get_language()
+        labels = self._localized.get(language)
+        if labels is None:
+            labels = self._localized[language] = self.render(
+                {
+                    value: gettext(label) if isinstance(label, str) else label
+                    for value, label in self.choices
+                }
+            )
+        return labels
+
+    def label(self, value):
+        return self.localized().get(value, value)
+
+
+def choice_labels(model):
+    """``ChoiceLabels`` of the fields of ``model`` that have choices."""
+    return {
+        field.name: ChoiceLabels(field.choices)
+        for field in model._meta.fields
+        if field.choices
+    }
+
+
 class Facility(models.Model):
     name = models.CharField(max_length=250)
 
@@ -84,11 +139,15 @@ class Room(models.Model):
     )
     postal_code = models.CharField(max_length=15, blank=True, null=True)
     mobile = models.IntegerField(blank=False, null=False)
-    image = models.ImageField(upload_to=f"rooms/%Y/%m/%d/", blank=True, null=True)
-    image_1 = models.ImageField(upload_to=f"rooms/%Y/%m/%d/", blank=True, null=True)
-    image_2 = models.ImageField(upload_to=f"rooms/%Y/%m/%d/", blank=True, null=True)
-    image_3 = models.ImageField(upload_to=f"rooms/%Y/%m/%d/", blank=True, null=True)
-    image_4 = models.ImageField(upload_to=f"rooms/%Y/%m/%d/", blank=True, null=True)
+    # first of the room's photos, kept by rooms.signals
+    cover = models.ForeignKey(
+        "RoomPhoto",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     price = models.PositiveIntegerField(blank=True, null=True)
     capacity = models.SmallIntegerField(choices=NO_OF_BEDS, default=6)
     room_type = models.SmallIntegerField(choices=ROOM_TYPES, default=1)
@@ -101,6 +160,14 @@ class Room(models.Model):
     max_stay = models.SmallIntegerField(choices=MAX_STAY, default=0)
     description = models.TextField(blank=True, null=True)
     total_rating = models.FloatField(default=0)
+    # running review sums, kept by reservations.ratings
+    accuracy_sum = models.FloatField(default=0)
+    location_sum = models.FloatField(default=0)
+    communication_sum = models.FloatField(default=0)
+    checkin_sum = models.FloatField(default=0)
+    clean_sum = models.FloatField(default=0)
+    value_sum = models.FloatField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -112,3 +179,61 @@ class Room(models.Model):
     def __str__(self):
         return f"{self.state.name} / {self.slug} / {self.host}"
 
+
+class RoomPhoto(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="photos")
+    image = models.ImageField(upload_to=f"rooms/%Y/%m/%d/")
+    # filled on upload and by rooms.images; width_field/height_field would
+    # re-open the file from storage whenever a row without them is loaded
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    photo_type = models.SmallIntegerField(choices=PHOTO_TYPES, default=5)
+    order = models.PositiveSmallIntegerField(default=0)
+    # JSON manifest of resized derivatives, kept by rooms.images
+    variants = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["order", "id"]
+        indexes = [models.Index(fields=["room", "order"], name="roomphoto_room_order")]
+
+
+class RoomSearchDocument(models.Model):
+    """Narrow, denormalized copy of the columns room search filters on.
+
+    Text columns are stored lower-cased so search can use plain equality and
+    prefix lookups that the composite indexes below can serve. ``body`` holds
+    the free text searched by ``rooms.search``.
+    """
+
+    room = models.OneToOneField(
+        Room, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    state_name = models.CharField(max_length=30, blank=True)
+    country_name = models.CharField(max_length=30, blank=True)
+    host_username = models.CharField(max_length=150)
+    price = models.PositiveIntegerField(blank=True, null=True)
+    capacity = models.SmallIntegerField(default=6)
+    total_rating = models.FloatField(default=0)
+    min_stay = models.SmallIntegerField(default=1)
+    max_stay = models.SmallIntegerField(default=0)
+    active = models.BooleanField(default=True)
+    body = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state_name", "price"], name="roomdoc_state_price"),
+            models.Index(fields=["country_name", "price"], name="roomdoc_country_price"),
+            models.Index(
+                fields=["host_username"],
+                name="roomdoc_host_prefix",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["active", "capacity", "price"], name="roomdoc_capacity_price"
+            ),
+        ]
+
+
+ROOM_LABELS = choice_labels(Room)
+PHOTO_LABELS = choice_labels(RoomPhoto)
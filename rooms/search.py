@@ -0,0 +1,198 @@
+"""Ranked full-text and fuzzy search over room search documents.
+
+PostgreSQL matches ``RoomSearchDocument.body`` with ``tsvector`` (GIN
+index) or trigram word similarity (``pg_trgm`` GIN index) and ranks inside
+the same query as the other filters. Other backends use ``InvertedIndex``,
+an in-process index that reloads the documents logged as changed by
+``rooms.documents.touch`` and ranks only rooms passing the other filters.
+"""
+import re
+from collections import Counter, defaultdict
+from math import log
+from threading import Lock
+
+from django.db import connections
+from django.db.models import BooleanField, Case, F, FloatField, Func, Q, Value, When
+
+from rooms import documents
+from rooms.models import RoomSearchDocument
+
+BODY = "search_document__body"
+TOKEN = re.compile(r"\w+", re.UNICODE)
+MAX_CANDIDATES = 500
+FUZZY_THRESHOLD = 0.4
+
+
+def tokenize(text):
+    return TOKEN.findall((text or "").lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b)
+
+
+class TsVector(Func):
+    function = "to_tsvector"
+    template = "%(function)s('simple', %(expressions)s)"
+
+
+class TsQuery(Func):
+    function = "plainto_tsquery"
+    template = "%(function)s('simple', %(expressions)s)"
+
+
+class TsMatch(Func):
+    arg_joiner = " @@ "
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+
+class TsRank(Func):
+    function = "ts_rank"
+    output_field = FloatField()
+
+
+class WordSimilarity(Func):
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+class WordSimilar(Func):
+    arg_joiner = " <%% "
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, text):
+        vector, query = TsVector(F(BODY)), TsQuery(Value(text))
+        matched = TsMatch(vector, query)
+        fuzzy = WordSimilar(Value(text), F(BODY))
+        queryset = queryset.annotate(
+            search_rank=TsRank(vector, query) + WordSimilarity(Value(text), F(BODY))
+        )
+        return queryset.filter(Q(matched) | Q(fuzzy))
+
+
+class InvertedIndex:
+    """Token -> {room_id: term frequency} over document bodies.
+
+    Query tokens missing from the vocabulary match vocabulary tokens by
+    trigram similarity; scores are tf-idf weighted by that similarity.
+    """
+
+    def __init__(self, rows=()):
+        self.postings = defaultdict(dict)
+        self.tokens = {}
+        for room_id, body in rows:
+            self.add(room_id, body)
+
+    @property
+    def size(self):
+        return len(self.tokens)
+
+    def add(self, room_id, body):
+        self.remove(room_id)
+        counts = Counter(tokenize(body))
+        self.tokens[room_id] = list(counts)
+        for token, frequency in counts.items():
+            self.postings[token][room_id] = frequency
+
+    def remove(self, room_id):
+        for token in self.tokens.pop(room_id, ()):
+            postings = self.postings[token]
+            del postings[room_id]
+            if not postings:
+                del self.postings[token]
+
+    def expand(self, token):
+        if token in self.postings:
+            return [(token, 1.0)]
+        candidates = []
+        for word in self.postings:
+            score = similarity(token, word)
+            if score >= FUZZY_THRESHOLD:
+                candidates.append((word, score))
+        return candidates
+
+    def search(self, text, limit=MAX_CANDIDATES, within=None):
+        """Best ``limit`` ``(room_id, score)`` pairs, among ``within`` if given."""
+        scores = Counter()
+        for token in set(tokenize(text)):
+            for word, weight in self.expand(token):
+                postings = self.postings[word]
+                idf = log(1 + self.size / len(postings))
+                for room_id, frequency in postings.items():
+                    if within is None or room_id in within:
+                        scores[room_id] += weight * idf * (1 + log(frequency))
+        return scores.most_common(limit)
+
+
+class InvertedIndexSearchBackend:
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._index = None
+
+    def index(self):
+        version = documents.version()
+        with self._lock:
+            if self._index is not None and self._version != version:
+                changed = documents.changes(self._version, version)
+                if changed is None:
+                    self._index = None
+                else:
+                    self.reload(changed)
+                    self._version = version
+            if self._index is None:
+                rows = RoomSearchDocument.objects.values_list("room_id", "body")
+                self._index = InvertedIndex(rows.iterator())
+                self._version = version
+            return self._index
+
+    def reload(self, room_ids):
+        rows = RoomSearchDocument.objects.filter(room_id__in=room_ids)
+        bodies = dict(rows.values_list("room_id", "body"))
+        for room_id in room_ids:
+            if room_id in bodies:
+                self._index.add(room_id, bodies[room_id])
+            else:
+                self._index.remove(room_id)
+
+    def search(self, queryset, text):
+        # rank only rooms passing the other filters, so the cut keeps them
+        within = set(queryset.order_by().values_list("id", flat=True))
+        ranked = self.index().search(text, MAX_CANDIDATES, within)
+        if not ranked:
+            return queryset.none().annotate(search_rank=Value(0.0))
+        rank = Case(
+            *[When(id=room_id, then=Value(score)) for room_id, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        ids = [room_id for room_id, _ in ranked]
+        return queryset.filter(id__in=ids).annotate(search_rank=rank)
+
+
+_backends = {}
+
+
+def get_backend(using="default"):
+    vendor = connections[using].vendor
+    if vendor not in _backends:
+        if vendor == "postgresql":
+            _backends[vendor] = PostgresSearchBackend()
+        else:
+            _backends[vendor] = InvertedIndexSearchBackend()
+    return _backends[vendor]
+
+
+def search(queryset, text):
+    """Filter a Room queryset to matches of ``text``, annotated ``search_rank``."""
+    return get_backend(queryset.db).search(queryset, text)
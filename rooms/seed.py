@@ -0,0 +1,277 @@
+"""Synthetic, reproducible data for load tests, benchmarks and development.
+
+``seed`` bulk-inserts countries, states, hosts, guests, rooms with
+facilities and reservations with review scores. Rows get explicit ids, so
+related rows are built without reading ids back, and the id sequences are
+moved past them at the end.
+
+Rooms are generated in chunks, each from its own ``Random`` seeded with
+``random_seed`` and the chunk number, so the data does not depend on the
+number of workers; chunks are spread over ``workers`` processes. Bulk
+inserts skip model signals, so every chunk also writes what they would
+have kept: search documents, availability calendars and rating sums.
+
+States and hosts are drawn from Zipf-like distributions (``skew``), giving
+a few crowded states and heavy hosts to exercise caches and indexes.
+"""
+import multiprocessing
+from datetime import timedelta
+from functools import lru_cache
+from itertools import accumulate
+from random import Random
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from config.cache import bump
+from locations.models import Country, State
+from reservations import calendar
+from reservations.models import RoomCalendar, RoomReservation
+from reservations.ratings import SCORES, SUMS, total
+from rooms.documents import sync_documents
+from rooms.models import ROOM_TYPES, Facility, Room
+
+SIZES = {
+    "countries": 5,
+    "states": 50,
+    "hosts": 200,
+    "guests": 800,
+    "rooms": 1000,
+    "reservations": 20000,
+}
+BATCH_SIZE = 2000
+SKEW = 1.1
+PASSWORD = "fbinb-seed"
+FACILITIES = ("Wifi", "Kitchen", "Parking", "Washer", "Air conditioning", "Pool")
+WORDS = (
+    "cozy sunny quiet modern garden ocean view studio loft family central "
+    "station river terrace hanok"
+).split()
+# reservations start this many days back, so some are past and reviewable
+HISTORY_DAYS = 180
+REVIEW_RATE = 0.5
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def spread(total_count, parts):
+    """Split ``total_count`` into ``parts`` near-equal integers."""
+    share, extra = divmod(total_count, parts)
+    return [share + (index < extra) for index in range(parts)]
+
+
+@lru_cache(maxsize=8)
+def zipf_weights(size, skew):
+    """Cumulative weights of ranks ``1..size``, proportional to rank ** -skew."""
+    return list(accumulate(rank ** -skew for rank in range(1, size + 1)))
+
+
+def draw(rng, ids, skew, k):
+    """``k`` ids of the ``(first, count)`` range, low ids the most likely."""
+    first, size = ids
+    ranks = rng.choices(range(size), cum_weights=zipf_weights(size, skew), k=k)
+    return [first + rank for rank in ranks]
+
+
+def seed_places(rng, countries, states, skew):
+    first = next_id(Country)
+    Country.objects.bulk_create(
+        Country(id=first + i, name=f"country-{first + i}") for i in range(countries)
+    )
+    country_ids = draw(rng, (first, countries), skew, states)
+    first = next_id(State)
+    State.objects.bulk_create(
+        State(id=first + i, name=f"state-{first + i}", country_id=country_ids[i])
+        for i in range(states)
+    )
+    return first, states
+
+
+def seed_users(count, batch_size):
+    User = get_user_model()
+    first = next_id(User)
+    # one hash for all: hashing per user would dominate the run
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (
+            User(
+                id=first + i,
+                username=f"seed{first + i}",
+                email=f"seed{first + i}@example.com",
+                password=password,
+            )
+            for i in range(count)
+        ),
+        batch_size=batch_size,
+    )
+    return first, count
+
+
+def stays(rng, room_id, count, guests, today):
+    """``count`` back-to-back reservations of a room, with review scores."""
+    first, size = guests
+    start = today - timedelta(rng.randint(0, HISTORY_DAYS))
+    for _ in range(count):
+        start += timedelta(rng.randint(0, 5))
+        end = start + timedelta(rng.randint(1, 7))
+        reservation = RoomReservation(
+            room_id=room_id,
+            user_id=first + rng.randrange(size),
+            start_date=start,
+            end_date=end,
+        )
+        if end <= today and rng.random() < REVIEW_RATE:
+            reservation.is_reviewed = True
+            for name in SCORES:
+                setattr(reservation, f"{name}_score", rng.randint(1, 5))
+        yield reservation
+        start = end
+
+
+def rate(room, reservations):
+    for reservation in reservations:
+        if not reservation.is_reviewed:
+            continue
+        room.review_count += 1
+        for field, name in zip(SUMS, SCORES):
+            score = getattr(reservation, f"{name}_score")
+            setattr(room, field, getattr(room, field) + score)
+    sums = [getattr(room, field) for field in SUMS]
+    room.total_rating = total(sums, room.review_count)
+
+
+def booked_days(room_id, reservations, today):
+    """The calendar ``calendar.build`` would write, from in-memory stays."""
+    bits = 0
+    for reservation in reservations:
+        if not reservation.is_active:
+            continue
+        window = calendar.clip(today, reservation.start_date, reservation.end_date)
+        if window:
+            bits |= calendar.window_mask(today, *window)
+    return RoomCalendar(room_id=room_id, origin=today, days=calendar.encode(bits))
+
+
+def plan_chunks(first, rooms, reservations, batch_size):
+    """``(first room id, reservations per room)`` of every chunk."""
+    counts = spread(reservations, rooms) if rooms else []
+    return [
+        (first + offset, counts[offset : offset + batch_size])
+        for offset in range(0, rooms, batch_size)
+    ]
+
+
+def seed_chunk(plan, index):
+    """Write one chunk of rooms and everything hanging off them."""
+    rng = Random(f"{plan['random_seed']}:{index}")
+    first, counts = plan["chunks"][index]
+    today, skew = plan["today"], plan["skew"]
+    states = draw(rng, plan["states"], skew, len(counts))
+    hosts = draw(rng, plan["hosts"], skew, len(counts))
+    Through = Room.facilities.through
+    rooms, booked, links, calendars = [], [], [], []
+    for offset, count in enumerate(counts):
+        room_id = first + offset
+        room = Room(
+            id=room_id,
+            host_id=hosts[offset],
+            title=f"{' '.join(rng.sample(WORDS, 2))} room {room_id}",
+            description=" ".join(rng.sample(WORDS, 6)),
+            address=f"{rng.randint(1, 999)} {rng.choice(WORDS)} street",
+            state_id=states[offset],
+            mobile=0,
+            price=rng.randint(20, 500),
+            capacity=rng.randint(1, 10),
+            room_type=rng.choice(ROOM_TYPES)[0],
+        )
+        room_stays = list(stays(rng, room_id, count, plan["guests"], today))
+        rate(room, room_stays)
+        rooms.append(room)
+        booked += room_stays
+        calendars.append(booked_days(room_id, room_stays, today))
+        links += [
+            Through(room_id=room_id, facility_id=facility_id)
+            for facility_id in rng.sample(plan["facilities"], rng.randint(0, 3))
+        ]
+    batch_size = plan["batch_size"]
+    with transaction.atomic():
+        Room.objects.bulk_create(rooms, batch_size=batch_size)
+        Through.objects.bulk_create(links, batch_size=batch_size)
+        RoomReservation.objects.bulk_create(booked, batch_size=batch_size)
+        RoomCalendar.objects.bulk_create(calendars, batch_size=batch_size)
+    sync_documents(range(first, first + len(counts)))
+    return len(rooms), len(booked)
+
+
+def _run_chunk(job):
+    try:
+        return seed_chunk(*job)
+    finally:
+        connections.close_all()
+
+
+def reset_sequences(models):
+    """Move id sequences past the explicit ids (PostgreSQL, Oracle)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def seed(
+    random_seed=0, batch_size=BATCH_SIZE, workers=1, skew=SKEW, progress=None, **sizes
+):
+    """Insert a dataset of ``SIZES`` (overridden by ``sizes``).
+
+    ``progress(rooms, reservations)`` is called as chunks finish. SQLite
+    takes one writer at a time, so it always runs in this process.
+
+    Returns the sizes seeded.
+    """
+    sizes = dict(SIZES, **sizes)
+    if sizes["rooms"] and not (sizes["hosts"] and sizes["states"]):
+        raise ValueError("rooms need hosts and states", "seed at least one of each")
+    if sizes["reservations"] and not (sizes["rooms"] and sizes["guests"]):
+        raise ValueError("reservations need rooms and guests", "seed some of both")
+    if sizes["states"] and not sizes["countries"]:
+        raise ValueError("states need countries", "seed at least one country")
+    rng = Random(random_seed)
+    plan = {
+        "random_seed": random_seed,
+        "batch_size": batch_size,
+        "skew": skew,
+        "today": timezone.now().date(),
+        "states": seed_places(rng, sizes["countries"], sizes["states"], skew),
+        "hosts": seed_users(sizes["hosts"], batch_size),
+        "guests": seed_users(sizes["guests"], batch_size),
+        "facilities": [
+            Facility.objects.get_or_create(name=name)[0].id for name in FACILITIES
+        ],
+        "chunks": plan_chunks(
+            next_id(Room), sizes["rooms"], sizes["reservations"], batch_size
+        ),
+    }
+    jobs = [(plan, index) for index in range(len(plan["chunks"]))]
+    if workers > 1 and len(jobs) > 1 and connection.vendor != "sqlite":
+        # forked workers must not share the parent's connections
+        connections.close_all()
+        # spawned (not forked) workers have to set Django up themselves
+        with multiprocessing.Pool(workers, initializer=django.setup) as pool:
+            for rooms, reservations in pool.imap_unordered(_run_chunk, jobs):
+                if progress:
+                    progress(rooms, reservations)
+    else:
+        for job in jobs:
+            rooms, reservations = seed_chunk(*job)
+            if progress:
+                progress(rooms, reservations)
+    reset_sequences([Country, State, get_user_model(), Room])
+    bump("rooms", "dates")
+    return sizes
@@ -1,39 +1,119 @@
 from rest_framework import serializers
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.utils.text import slugify
 from rooms import models as Room
+from config import uploads
+from config.fields import FastListSerializer, SparseFieldsetMixin
+from rooms import images
+from reservations.models import RoomReservation
 
 
-class RoomListSerializer(serializers.ModelSerializer):
-    host = serializers.SerializerMethodField()
-    room_type = serializers.ChoiceField(
-        source="get_room_type_display", choices=Room.ROOM_TYPES
-    )
-    space = serializers.ChoiceField(
-        source="get_space_display", choices=Room.SPACE_TYPES
-    )
-    bath_type = serializers.ChoiceField(
-        source="get_bath_type_display", choices=Room.BATHROOM_TYPES
+class ChoiceLabelField(serializers.ChoiceField):
+    """Choice rendered as its label, read from a ``rooms.models`` table.
+
+    Renders what ``ChoiceField(source="get_FOO_display")`` did, without
+    rebuilding the choices on every row.
+    """
+
+    def __init__(self, labels, **kwargs):
+        self.table = labels
+        self.labels = None
+        super().__init__(choices=labels.choices, **kwargs)
+
+    def to_representation(self, value):
+        if self.labels is None:
+            # a serializer lives for one request, so one language
+            self.labels = self.table.localized()
+        return self.labels.get(value, value)
+
+
+class RoomPhotoSerializer(serializers.ModelSerializer):
+    photo_type = ChoiceLabelField(Room.PHOTO_LABELS["photo_type"])
+    srcset = serializers.SerializerMethodField()
+
+    def get_srcset(self, obj):
+        return images.srcset(obj)
+
+    @staticmethod
+    def columns(prefix=""):
+        fields = ["image", "width", "height", "photo_type", "order", "variants"]
+        return [prefix + field for field in fields]
+
+    class Meta:
+        model = Room.RoomPhoto
+        fields = ["id", "image", "width", "height", "photo_type", "order", "srcset"]
+
+
+class RoomPhotoCreateSerializer(serializers.ModelSerializer):
+    photo_type = serializers.ChoiceField(
+        choices=Room.PHOTO_TYPES, default=5, help_text=f"{Room.PHOTO_TYPES}"
     )
-    room_type = serializers.ChoiceField(
-        source="get_room_type_display", choices=Room.ROOM_TYPES
+    image = serializers.ImageField(required=False)
+    upload = serializers.CharField(
+        write_only=True, required=False, help_text="ticket of a direct upload"
     )
 
+    class Meta:
+        model = Room.RoomPhoto
+        fields = ["image", "upload", "photo_type", "order"]
+
+    def validate(self, attrs):
+        if ("image" in attrs) == ("upload" in attrs):
+            raise serializers.ValidationError("send either image or upload")
+        return attrs
+
+    def create(self, validated_data):
+        view = self.context.get("view")
+        validated_data["room_id"] = view.kwargs.get("pk")
+        ticket = validated_data.pop("upload", None)
+        if ticket:
+            key, content_type = uploads.claim(ticket, view.request.user, "room_photo")
+            validated_data["image"] = key
+            photo = super().create(validated_data)
+            delete = Room.RoomPhoto.objects.filter(id=photo.id, image=key).delete
+            uploads.validate_later(key, content_type, delete)
+            return photo
+        # the upload was already opened by Pillow during validation
+        image = getattr(validated_data["image"], "image", None)
+        if image is not None:
+            validated_data["width"], validated_data["height"] = image.size
+        return super().create(validated_data)
+
+
+class RoomListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    host = serializers.SerializerMethodField()
+    room_type = ChoiceLabelField(Room.ROOM_LABELS["room_type"])
+    space = ChoiceLabelField(Room.ROOM_LABELS["space"])
+    bath_type = ChoiceLabelField(Room.ROOM_LABELS["bath_type"])
+    cover = RoomPhotoSerializer(read_only=True)
+
 
     def get_host(self, obj):
         return obj.host.username
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        fields = fields or RoomListSerializer.Meta.fields
+        columns = [field for field in fields if field not in ("host", "id", "cover")]
+        related = []
+        if "host" in fields:
+            related.append("host")
+            columns.append("host__username")
+        if "cover" in fields:
+            related.append("cover")
+            columns += RoomPhotoSerializer.columns("cover__")
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
     class Meta:
         model = Room.Room
+        list_serializer_class = FastListSerializer
         fields = [
             "id",
             "host",
             "title",
-            "image",
-            "image_1",
-            "image_2",
-            "image_3",
-            "image_4",
+            "cover",
             "price",
             "description",
             "room_type",
@@ -67,7 +147,20 @@ class RoomCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Room.Room
-        exclude = ["slug", "id", "created_at", "total_rating", "updated_at"]
+        exclude = [
+            "slug",
+            "id",
+            "created_at",
+            "total_rating",
+            "updated_at",
+            "accuracy_sum",
+            "location_sum",
+            "communication_sum",
+            "checkin_sum",
+            "clean_sum",
+            "value_sum",
+            "review_count",
+        ]
 
     def create(self, validated_data):
         title = validated_data.get("title")
@@ -81,37 +174,23 @@ class FacilityField(serializers.ModelSerializer):
         fields = ["name"]
 
 
-class RoomDetailSerializer(serializers.ModelSerializer):
+class RoomDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     host = serializers.SerializerMethodField()
-    capacity = serializers.ChoiceField(
-        source="get_capacity_display", choices=Room.NO_OF_BEDS
-    )
-    room_type = serializers.ChoiceField(
-        source="get_room_type_display", choices=Room.ROOM_TYPES
-    )
-    space = serializers.ChoiceField(
-        source="get_space_display", choices=Room.SPACE_TYPES
-    )
-    bedroom = serializers.ChoiceField(
-        source="get_bedroom_display", choices=Room.NO_OF_ROOMS
-    )
-    bath_type = serializers.ChoiceField(
-        source="get_bath_type_display", choices=Room.BATHROOM_TYPES
-    )
-    bathroom = serializers.ChoiceField(
-        source="get_bathroom_display", choices=Room.NO_OF_ROOMS
-    )
-    cancellation = serializers.ChoiceField(
-        source="get_cancellation_display", choices=Room.CANCELATION_RULES
-    )
-    min_stay = serializers.ChoiceField(
-        source="get_min_stay_display", choices=Room.MIN_STAY
-    )
-    max_stay = serializers.ChoiceField(
-        source="get_max_stay_display", choices=Room.MAX_STAY
-    )
+    capacity = ChoiceLabelField(Room.ROOM_LABELS["capacity"])
+    room_type = ChoiceLabelField(Room.ROOM_LABELS["room_type"])
+    space = ChoiceLabelField(Room.ROOM_LABELS["space"])
+    bedroom = ChoiceLabelField(Room.ROOM_LABELS["bedroom"])
+    bath_type = ChoiceLabelField(Room.ROOM_LABELS["bath_type"])
+    bathroom = ChoiceLabelField(Room.ROOM_LABELS["bathroom"])
+    cancellation = ChoiceLabelField(Room.ROOM_LABELS["cancellation"])
+    min_stay = ChoiceLabelField(Room.ROOM_LABELS["min_stay"])
+    max_stay = ChoiceLabelField(Room.ROOM_LABELS["max_stay"])
     facilities = serializers.SerializerMethodField()
     reservations = serializers.SerializerMethodField()
+    cover = RoomPhotoSerializer(read_only=True)
+
+    # relation joined in -> field reading it
+    RELATED = {"host": "host", "cover": "cover"}
 
     def get_facilities(self, obj):
         facilities = obj.facilities.all()
@@ -119,11 +198,40 @@ class RoomDetailSerializer(serializers.ModelSerializer):
 
     def get_reservations(self, obj):
         reservations = obj.reservations.all()
-        return [[v.start_date, v.end_date] for v in reservations if v.is_active]
+        return [[v.start_date, v.end_date] for v in reservations]
 
     def get_host(self, obj):
         return obj.host.username
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        if fields is not None:
+            # joined rows load whole, so only() keeps the relations themselves
+            related = [
+                relation
+                for relation, field in RoomDetailSerializer.RELATED.items()
+                if field in fields
+            ]
+            columns = RoomDetailSerializer.sparse_columns(fields)
+            queryset = queryset.only(*columns, *related)
+        else:
+            related = list(RoomDetailSerializer.RELATED)
+        if related:
+            queryset = queryset.select_related(*related)
+        if fields is None or "facilities" in fields:
+            facilities = Room.Facility.objects.only("name")
+            queryset = queryset.prefetch_related(
+                Prefetch("facilities", queryset=facilities)
+            )
+        if fields is None or "reservations" in fields:
+            reservations = RoomReservation.objects.filter(is_active=True).only(
+                "room_id", "start_date", "end_date"
+            )
+            queryset = queryset.prefetch_related(
+                Prefetch("reservations", queryset=reservations)
+            )
+        return queryset
+
     class Meta:
         model = Room.Room
         fields = [
@@ -134,11 +242,7 @@ class RoomDetailSerializer(serializers.ModelSerializer):
             "state",
             "postal_code",
             "mobile",
-            "image",
-            "image_1",
-            "image_2",
-            "image_3",
-            "image_4",
+            "cover",
             "total_rating",
             "capacity",
             "space",
@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from config.cache import bump, term_tags
+from locations.models import Country, State
+from rooms import images
+from rooms.documents import search_terms, sync_documents
+from rooms.models import Facility, Room, RoomPhoto
+
+
+def invalidate_rooms(room_ids, terms=()):
+    """Bump cached responses showing the rooms or searches matching them."""
+    room_ids = list(room_ids)
+    if not room_ids:
+        return
+    terms = set(terms) | search_terms(room_ids)
+    bump("rooms", *[f"room:{room_id}" for room_id in room_ids], *term_tags(terms))
+
+
+@receiver(pre_save, sender=Room)
+def remember_room_terms(sender, instance=None, **kwargs):
+    instance._previous_terms = search_terms([instance.pk]) if instance.pk else set()
+
+
+@receiver(post_save, sender=Room)
+def sync_room_document(sender, instance=None, **kwargs):
+    sync_documents([instance.id])
+    invalidate_rooms([instance.id], getattr(instance, "_previous_terms", ()))
+
+
+@receiver(pre_delete, sender=Room)
+def invalidate_deleted_room(sender, instance=None, **kwargs):
+    invalidate_rooms([instance.id])
+
+
+# fields copied into search documents, per model that can rename them
+RENAMING_FIELDS = {State: ("name", "country_id"), Country: ("name",)}
+
+
+def renaming_fields(instance):
+    return RENAMING_FIELDS.get(type(instance), ("username",))
+
+
+def rooms_of(instance):
+    if isinstance(instance, State):
+        rooms = Room.objects.filter(state=instance)
+    elif isinstance(instance, Country):
+        rooms = Room.objects.filter(state__country=instance)
+    else:
+        rooms = Room.objects.filter(host=instance)
+    return list(rooms.values_list("id", flat=True))
+
+
+def renaming_values(instance):
+    """The renaming fields as loaded, or None if one of them was deferred."""
+    fields = renaming_fields(instance)
+    if set(fields) & instance.get_deferred_fields():
+        return None
+    return tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(post_init, sender=State)
+@receiver(post_init, sender=Country)
+@receiver(post_init, sender=get_user_model())
+def remember_loaded_names(sender, instance=None, **kwargs):
+    # compared on save, so that only renames cost a query
+    instance._loaded_names = renaming_values(instance)
+
+
+@receiver(pre_save, sender=State)
+@receiver(pre_save, sender=Country)
+@receiver(pre_save, sender=get_user_model())
+def remember_renamed_terms(sender, instance=None, update_fields=None, **kwargs):
+    instance._previous_terms = None
+    if not instance.pk:
+        return
+    fields = renaming_fields(instance)
+    if update_fields is not None:
+        saved = {instance._meta.get_field(name).attname for name in update_fields}
+        if not saved & set(fields):
+            return
+    previous = getattr(instance, "_loaded_names", None)
+    if previous is None:
+        previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    if previous != tuple(getattr(instance, field) for field in fields):
+        instance._previous_terms = search_terms(rooms_of(instance))
+
+
+@receiver(post_save, sender=State)
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=get_user_model())
+def sync_renamed_documents(sender, instance=None, **kwargs):
+    instance._loaded_names = renaming_values(instance)
+    previous_terms = getattr(instance, "_previous_terms", None)
+    if previous_terms is None:
+        return
+    room_ids = rooms_of(instance)
+    sync_documents(room_ids)
+    invalidate_rooms(room_ids, previous_terms)
+
+
+@receiver(m2m_changed, sender=Room.facilities.through)
+def invalidate_facility_set(
+    sender, instance=None, reverse=False, pk_set=None, **kwargs
+):
+    room_ids = (pk_set or []) if reverse else [instance.id]
+    bump(*[f"room:{room_id}" for room_id in room_ids])
+
+
+@receiver(post_save, sender=Facility)
+@receiver(pre_delete, sender=Facility)
+def invalidate_facility(sender, instance=None, **kwargs):
+    room_ids = instance.rooms.values_list("id", flat=True)
+    bump(*[f"room:{room_id}" for room_id in room_ids])
+
+
+def refresh_cover(room_id):
+    """Point the room's cover at its first photo."""
+    cover = RoomPhoto.objects.filter(room_id=room_id).values_list("id", flat=True)
+    Room.objects.filter(id=room_id).update(cover_id=cover.first())
+    invalidate_rooms([room_id])
+
+
+@receiver(post_save, sender=RoomPhoto)
+def process_room_photo(sender, instance=None, raw=False, **kwargs):
+    if raw:
+        return
+    if images.is_stale(instance):
+        images.schedule(instance.id)
+    refresh_cover(instance.room_id)
+
+
+@receiver(post_delete, sender=RoomPhoto)
+def replace_deleted_cover(sender, instance=None, **kwargs):
+    refresh_cover(instance.room_id)
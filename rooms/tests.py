@@ -1,3 +1,841 @@
-from django.test import TestCase
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from hashlib import md5
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone, translation
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.serializers import ChoiceField, ListSerializer
+from rest_framework.test import APIClient
+
+from config.async_views import asyncify
+from config.cache import term_tags
+from config.db import Pool, PoolTimeout
+from config.fields import FastListSerializer
+from config.routers import PIN_COOKIE, read_alias
+from config.metrics import Histogram, registry
+from locations.models import Country, State
+from locations.serializers import StateSerializer
+from reservations.availability import is_room_available
+from reservations.booking import book
+from reservations.models import RoomCalendar, RoomReservation
+from rooms import benchmark, images, search
+from rooms.models import (
+    ROOM_LABELS,
+    Facility,
+    Room,
+    RoomPhoto,
+    RoomSearchDocument,
+)
+from rooms.serializers import RoomDetailSerializer, RoomListSerializer
+from rooms.views import RoomDetailView
+from rooms.seed import seed
+
+
+class RoomsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+
+class QueryCountTest(RoomsTestCase):
+    """Endpoints must issue a constant number of queries at any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        facilities = [Facility.objects.create(name=f"facility {i}") for i in range(3)]
+        for i in range(30):
+            host = get_user_model().objects.create_user(
+                username=f"host{i}", password="pw"
+            )
+            room = Room.objects.create(
+                host=host, title=f"room {i}", mobile=0, state=state, price=i
+            )
+            room.facilities.set(facilities)
+        cls.room = room
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def list_rooms(self, page_size, **params):
+        params.update(
+            {"search": "Seoul", "ordering": "price", "page": 1, "page_size": page_size}
+        )
+        return self.client.get("/api/rooms/", params)
+
+    def test_list_query_count_is_flat(self):
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                response = self.list_rooms(page_size)
+            self.assertEqual(len(response.json()["results"]), page_size)
+
+    def test_date_filtered_list_query_count_is_flat(self):
+        start = timezone.now().date() + timedelta(10)
+        end = start + timedelta(2)
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                self.list_rooms(page_size, start_date=start, end_date=end)
+
+    def test_detail_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/rooms/{self.room.id}/")
+        self.assertEqual(len(response.json()["facilities"]), 3)
+
+
+class KeysetPaginationTest(RoomsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        host = get_user_model().objects.create_user(username="host", password="pw")
+        for i in range(23):
+            Room.objects.create(
+                host=host,
+                title=f"room {i}",
+                mobile=0,
+                state=state,
+                price=i % 4,
+                total_rating=i % 3,
+            )
+
+    def walk(self, ordering):
+        params = {
+            "search": "Seoul",
+            "ordering": ordering,
+            "page_size": 5,
+            "pagination": "cursor",
+        }
+        seen, url = [], "/api/rooms/"
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [room["id"] for room in response.json()["results"]]
+            url, params = response.json()["next"], None
+        return seen
+
+    def test_every_ordering_visits_each_room_once(self):
+        expected = sorted(Room.objects.values_list("id", flat=True))
+        for ordering in ("price", "created_at", "updated_at", "total_rating"):
+            seen = self.walk(ordering)
+            self.assertEqual(sorted(seen), expected, ordering)
+
+    def test_count_is_optional(self):
+        params = {"search": "Seoul", "ordering": "price", "page_size": 5}
+        params["pagination"] = "cursor"
+        self.assertNotIn("count", self.client.get("/api/rooms/", params).json())
+        params["count"] = "true"
+        self.assertEqual(self.client.get("/api/rooms/", params).json()["count"], 23)
+
+
+class SearchDocumentTest(RoomsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.host = get_user_model().objects.create_user(
+            username="JuneHan", password="pw"
+        )
+        self.room = Room.objects.create(
+            host=self.host, title="room", mobile=0, state=self.state, price=10
+        )
+
+    def search(self, term):
+        params = {"search": term, "ordering": "price", "page": 1, "page_size": 10}
+        response = self.client.get("/api/rooms/", params)
+        return [room["id"] for room in response.json()["results"]]
+
+    def test_search_matches_state_country_and_host_prefix(self):
+        for term in ("Seoul", "seoul", "KOREA", "june"):
+            self.assertEqual(self.search(term), [self.room.id], term)
+        self.assertEqual(self.search("han"), [])
+
+    def test_documents_follow_renames(self):
+        self.state.name = "Busan"
+        self.state.save()
+        self.host.username = "charles"
+        self.host.save()
+        self.assertEqual(self.search("busan"), [self.room.id])
+        self.assertEqual(self.search("seoul"), [])
+        self.assertEqual(self.search("char"), [self.room.id])
+
+    def test_saves_without_renames_read_nothing(self):
+        user = get_user_model().objects.get(id=self.host.id)
+        with self.assertNumQueries(1):
+            user.save(update_fields=["last_login"])
+        user.description = "hello"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith("SELECT")
+                and ("accounts_user" in query["sql"] or "rooms_" in query["sql"])
+            ]
+        )
+
+
+class FullTextSearchTest(RoomsTestCase):
+    def setUp(self):
+        super().setUp()
+        state = State.objects.create(
+            name="Jeju", country=Country.objects.create(name="Korea")
+        )
+        host = get_user_model().objects.create_user(username="host", password="pw")
+        texts = [
+            ("Ocean view villa", "Wake up to the ocean. Ocean breeze all day."),
+            ("City loft", "Close to the ocean market"),
+            ("Mountain cabin", "Quiet forest retreat"),
+        ]
+        self.rooms = [
+            Room.objects.create(
+                host=host, title=title, description=text, mobile=0, state=state, price=1
+            )
+            for title, text in texts
+        ]
+
+    def search(self, text, **params):
+        params.update({"q": text, "ordering": "price", "page": 1, "page_size": 10})
+        response = self.client.get("/api/rooms/", params)
+        return [room["id"] for room in response.json()["results"]]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.search("ocean"), [self.rooms[0].id, self.rooms[1].id])
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.search("forrest"), [self.rooms[2].id])
+
+    def test_place_names_and_filters_combine(self):
+        self.assertEqual(len(self.search("jeju")), 3)
+        self.assertEqual(self.search("jeju", min_price=2), [])
+
+    def test_cut_applies_after_filters(self):
+        cheap = self.rooms[1]
+        for room in self.rooms:
+            if room != cheap:
+                room.price = 5
+                room.save()
+        with mock.patch.object(search, "MAX_CANDIDATES", 1):
+            self.assertEqual(self.search("ocean", max_price=1), [cheap.id])
+
+    def test_index_reloads_only_changed_documents(self):
+        self.search("ocean")
+        backend = search.get_backend()
+        index = backend.index()
+        self.rooms[2].title = "Ocean cabin"
+        self.rooms[2].save()
+        with mock.patch.object(search, "InvertedIndex", side_effect=AssertionError):
+            self.assertIs(backend.index(), index)
+        self.assertIn(self.rooms[2].id, self.search("cabin ocean")[:1])
+
+
+class ResponseCacheTest(RoomsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.other = State.objects.create(name="Busan", country=self.state.country)
+        self.host = get_user_model().objects.create_user(username="host", password="pw")
+        self.room = Room.objects.create(
+            host=self.host, title="room", mobile=0, state=self.state, price=10
+        )
+
+    def list_rooms(self, term="seoul", **headers):
+        params = {"search": term, "ordering": "price", "page": 1, "page_size": 10}
+        return self.client.get("/api/rooms/", params, **headers)
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        self.list_rooms()
+        with self.assertNumQueries(0):
+            response = self.list_rooms()
+        self.assertEqual(response.json()["results"][0]["title"], "room")
+
+    def test_term_tags_do_not_embed_search_input(self):
+        term = "seoul \x00" + "x" * 300
+        (tag,) = term_tags([term], prefix="dates:")
+        self.assertEqual(tag, f"dates:term:{md5(term.encode()).hexdigest()}")
+
+    def test_room_change_invalidates_its_pages(self):
+        self.list_rooms()
+        self.room.title = "renamed"
+        self.room.save()
+        self.assertEqual(self.list_rooms().json()["results"][0]["title"], "renamed")
+
+    def test_changes_elsewhere_keep_scoped_pages(self):
+        self.list_rooms()
+        Room.objects.create(
+            host=self.host, title="new", mobile=0, state=self.other, price=1
+        )
+        with self.assertNumQueries(0):
+            self.list_rooms()
+        self.assertEqual(len(self.list_rooms("busan").json()["results"]), 1)
+
+    def test_new_room_joins_matching_search(self):
+        self.list_rooms()
+        Room.objects.create(
+            host=self.host, title="new", mobile=0, state=self.state, price=1
+        )
+        self.assertEqual(len(self.list_rooms().json()["results"]), 2)
+
+    def test_reservation_invalidates_detail(self):
+        url = f"/api/rooms/{self.room.id}/"
+        self.assertEqual(self.client.get(url).json()["reservations"], [])
+        start = timezone.now().date() + timedelta(3)
+        end = start + timedelta(2)
+        RoomReservation.objects.create(
+            user=self.host, room=self.room, start_date=start, end_date=end
+        )
+        self.assertEqual(len(self.client.get(url).json()["reservations"]), 1)
+
+    def test_etag_revalidation(self):
+        etag = self.list_rooms()["ETag"]
+        self.assertEqual(self.list_rooms(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.room.price = 20
+        self.room.save()
+        self.assertEqual(self.list_rooms(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_hits_replay_headers(self):
+        url = f"/api/rooms/{self.room.id}/"
+        fresh = self.client.get(url)
+        cached = self.client.get(url)
+        for header in ("Content-Type", "Allow", "Vary", "ETag"):
+            self.assertEqual(cached[header], fresh[header])
+
+    def test_write_while_rendering_is_not_cached_as_fresh(self):
+        url = f"/api/rooms/{self.room.id}/"
+        retrieve = RoomDetailView.retrieve
+
+        def racing(view, request, *args, **kwargs):
+            response = retrieve(view, request, *args, **kwargs)
+            self.room.title = "renamed"
+            self.room.save()
+            return response
+
+        with mock.patch.object(RoomDetailView, "retrieve", racing):
+            self.assertEqual(self.client.get(url).json()["title"], "room")
+        self.assertEqual(self.client.get(url).json()["title"], "renamed")
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0)
+class RoomPhotoTest(RoomsTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.host = get_user_model().objects.create_user(username="host", password="pw")
+        self.room = Room.objects.create(
+            host=self.host, title="room", mobile=0, state=state, price=1
+        )
+        self.url = f"/api/rooms/{self.room.id}/photos/"
+
+    def upload(self, name, size, **data):
+        buffer = BytesIO()
+        Image.new("RGBA", size, (200, 30, 30, 128)).save(buffer, "PNG")
+        data["image"] = SimpleUploadedFile(name, buffer.getvalue())
+        client = APIClient()
+        client.force_authenticate(self.host)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(self.url, data)
+        self.assertEqual(response.status_code, 201, response.data)
+        return RoomPhoto.objects.latest("id")
+
+    def list_cover(self):
+        params = {"search": "seoul", "ordering": "price", "page": 1, "page_size": 5}
+        return self.client.get("/api/rooms/", params).json()["results"][0]["cover"]
+
+    def test_upload_generates_variants(self):
+        photo = self.upload("wide.png", (1000, 500), photo_type=2)
+        self.assertEqual((photo.width, photo.height), (1000, 500))
+        cover = self.list_cover()
+        self.assertEqual(cover["photo_type"], "View of the room")
+        widths = [part.split()[-1] for part in cover["srcset"]["webp"].split(", ")]
+        self.assertEqual(widths, ["320w", "720w", "1000w"])
+        for variant, _ in images.VARIANTS:
+            for _, extension, _ in images.FORMATS:
+                name = images.variant_name(photo.image.name, variant, extension)
+                self.assertTrue(default_storage.exists(name), name)
+
+    def test_cover_is_first_photo_and_photos_page(self):
+        second = self.upload("b.png", (40, 20), order=2)
+        first = self.upload("a.png", (40, 20), order=1)
+        self.upload("c.png", (40, 20), order=3)
+        self.assertEqual(self.list_cover()["id"], first.id)
+
+        page = self.client.get(self.url, {"page": 1, "page_size": 2}).json()
+        self.assertEqual(page["count"], 3)
+        self.assertEqual([photo["id"] for photo in page["results"]][1], second.id)
+
+        first.delete()
+        self.assertEqual(self.list_cover()["id"], second.id)
+
+    def test_only_host_adds_photos(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(username="guest", password="pw")
+        )
+        response = client.post(self.url, {"order": 1})
+        self.assertEqual(response.status_code, 401)
+
+    def put_upload(self, client, content, content_type="image/png"):
+        ticket = client.post(
+            "/api/uploads/",
+            {"kind": "room_photo", "content_type": content_type, "size": len(content)},
+        ).json()
+        path = ticket["url"].split("testserver", 1)[-1]
+        response = client.put(path, content, content_type=content_type)
+        self.assertEqual(response.status_code, 201)
+        return ticket
+
+    @override_settings(UPLOAD_VALIDATION_WORKERS=0)
+    def test_direct_upload_is_claimed_and_validated(self):
+        client = APIClient()
+        client.force_authenticate(self.host)
+        buffer = BytesIO()
+        Image.new("RGB", (40, 20)).save(buffer, "PNG")
+        good = self.put_upload(client, buffer.getvalue())
+        bad = self.put_upload(client, b"not a png at all")
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(self.url, {"upload": good["ticket"], "order": 1})
+            client.post(self.url, {"upload": bad["ticket"], "order": 2})
+
+        photos = RoomPhoto.objects.filter(room=self.room)
+        self.assertEqual([photo.image.name for photo in photos], [good["key"]])
+        self.assertEqual((photos[0].width, photos[0].height), (40, 20))
+        self.assertFalse(default_storage.exists(bad["key"]))
+
+        replay = client.post(self.url, {"upload": good["ticket"], "order": 3})
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(RoomPhoto.objects.filter(room=self.room).count(), 1)
+
+    def test_upload_ticket_belongs_to_its_user(self):
+        client = APIClient()
+        client.force_authenticate(self.host)
+        ticket = self.put_upload(client, b"x")
+        other = get_user_model().objects.create_user(username="other", password="pw")
+        self.room.host = other
+        self.room.save()
+        client.force_authenticate(other)
+        response = client.post(self.url, {"upload": ticket["ticket"]})
+        self.assertEqual(response.status_code, 400)
+
+
+class PhotoMigrationTest(TransactionTestCase):
+    """The legacy image columns become photos between the schema migrations."""
+
+    before = [("rooms", "0011_roomphoto")]
+    after = [("rooms", "0012_move_room_photos")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_legacy_images_move_to_photos(self):
+        apps = self.migrate(self.before)
+        host = apps.get_model("accounts", "User").objects.create(username="host")
+        room = apps.get_model("rooms", "Room").objects.create(
+            host=host, title="room", mobile=0, image_1="rooms/b.jpg", image_3="c.jpg"
+        )
+        apps = self.migrate(self.after)
+        photos = apps.get_model("rooms", "RoomPhoto").objects.filter(room_id=room.id)
+        photos = list(photos.order_by("order").values_list("id", "image"))
+        self.assertEqual([image for _, image in photos], ["rooms/b.jpg", "c.jpg"])
+        room = apps.get_model("rooms", "Room").objects.get(id=room.id)
+        self.assertEqual(room.cover_id, photos[0][0])
+
+
+class SparseFieldsTest(RoomsTestCase):
+    """``fields``/``omit`` narrow payload and SQL; the fast path renders alike."""
+
+    @classmethod
+    def setUpTestData(cls):
+        host = get_user_model().objects.create_user(username="host", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        cls.rooms = [
+            Room.objects.create(
+                host=host, title=f"room {i}", mobile=0, state=state, price=i
+            )
+            for i in range(3)
+        ]
+        RoomPhoto.objects.create(
+            room=cls.rooms[0], image="rooms/cover.jpg", width=4, height=3
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_fields_and_omit(self):
+        url = f"/api/rooms/{self.rooms[0].id}/"
+        data = self.client.get(url, {"fields": "title,price"}).json()
+        self.assertEqual(set(data), {"id", "title", "price"})
+        data = self.client.get(url, {"omit": "description,reservations"}).json()
+        self.assertNotIn("description", data)
+        self.assertIn("cover", data)
+        response = self.client.get(url, {"fields": "title,secret"})
+        self.assertEqual(response.status_code, 400)
+        data = self.client.get("/api/locations/state/", {"fields": "name"}).json()
+        self.assertEqual(set(data[0]), {"id", "name"})
+
+    def test_fields_without_query_plan(self):
+        with mock.patch.object(StateSerializer, "setup_eager_loading", None):
+            response = self.client.get("/api/locations/state/", {"fields": "name"})
+        state_id = self.rooms[0].state_id
+        self.assertEqual(response.json(), [{"id": state_id, "name": "Seoul"}])
+
+    def test_list_fields_narrow_the_select(self):
+        params = {"search": "Seoul", "ordering": "price", "page": 1, "page_size": 5}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/rooms/", dict(params, fields="title"))
+        self.assertEqual(set(response.json()["results"][0]), {"id", "title"})
+        select = queries[-1]["sql"]
+        self.assertIn('"title"', select)
+        self.assertNotIn('"description"', select)
+        self.assertNotIn("rooms_roomphoto", select)
+
+    def test_compiled_list_matches_drf(self):
+        context = {"request": APIClient().get("/api/").wsgi_request}
+        rooms = RoomListSerializer.setup_eager_loading(Room.objects.order_by("id"))
+        for serializer_class, queryset in [
+            (RoomListSerializer, rooms),
+            (StateSerializer, State.objects.all()),
+        ]:
+            rows = list(queryset)
+            stock = ListSerializer(rows, child=serializer_class(), context=context)
+            fast = serializer_class(rows, many=True, context=context)
+            self.assertIsInstance(fast, FastListSerializer)
+            self.assertEqual(fast.data, stock.data)
+        self.assertIsNotNone(fast.data[0]["country"])
+
+
+class ChoiceLabelsTest(RoomsTestCase):
+    """Label tables render what ``get_FOO_display`` through DRF rendered."""
+
+    def test_labels_match_get_display(self):
+        for name, labels in ROOM_LABELS.items():
+            field = ChoiceField(choices=labels.choices)
+            for value, _ in labels.choices:
+                room = Room(**{name: value})
+                display = getattr(room, f"get_{name}_display")()
+                self.assertEqual(labels.label(value), field.to_representation(display))
+        self.assertEqual(ROOM_LABELS["max_stay"].label(0), "Unlimited")
+        self.assertEqual(ROOM_LABELS["max_stay"].label(3), 3)
+        self.assertEqual(ROOM_LABELS["room_type"].label(50), "Office")
+
+    def test_detail_renders_labels(self):
+        room = Room(room_type=2, capacity=0, max_stay=7, bath_type=2)
+        fields = RoomDetailSerializer().fields
+        self.assertEqual(fields["room_type"].to_representation(room.room_type), "House")
+        self.assertEqual(fields["capacity"].to_representation(room.capacity), "-")
+        self.assertEqual(fields["max_stay"].to_representation(room.max_stay), 7)
+
+    def test_localized_once_per_language(self):
+        labels = ROOM_LABELS["space"]
+        with translation.override("ko"):
+            korean = labels.localized()
+            self.assertIs(labels.localized(), korean)
+        with translation.override("en"):
+            self.assertEqual(labels.localized()[2], "Private Room")
+        with self.settings(USE_I18N=False):
+            self.assertIs(labels.localized(), labels.labels)
+
+
+class MetricsTest(RoomsTestCase):
+    """Requests are measured per view and exported as Prometheus text."""
+
+    view = "rooms.views.RoomDetailView"
+
+    @classmethod
+    def setUpTestData(cls):
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        host = get_user_model().objects.create_user(username="host", password="pw")
+        cls.room = Room.objects.create(
+            host=host, title="room", mobile=0, state=state, price=1
+        )
+        cls.staff = get_user_model().objects.create_user(
+            username="staff", password="pw", is_staff=True
+        )
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.client = APIClient()
+
+    def test_histogram_quantiles_stay_within_bucket_error(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        for q in (0.5, 0.95, 0.99):
+            self.assertAlmostEqual(histogram.quantile(q), q * 1000, delta=q * 125)
+        self.assertEqual(list(histogram.cumulative())[-1], (float("inf"), 1000))
+
+    def test_request_is_recorded_per_view(self):
+        self.client.get(f"/api/rooms/{self.room.id}/")
+        labels = {"view": self.view, "method": "GET"}
+        self.assertEqual(registry.summary("http_request_db_queries", labels)["max"], 3)
+        for name in (
+            "http_request_duration_ms",
+            "http_request_serializer_duration_ms",
+            "http_response_bytes",
+        ):
+            self.assertEqual(registry.summary(name, labels)["count"], 1)
+
+    def test_error_paths_are_counted(self):
+        response = self.client.get("/api/rooms/0/")
+        text = registry.render()
+        self.assertIn(
+            f'fbinb_http_errors_total{{exception="Http404",view="{self.view}"}} 1',
+            text,
+        )
+        status = response.status_code
+        self.assertIn(
+            f'{{method="GET",status="{status}",view="{self.view}"}} 1', text
+        )
+
+    def test_metrics_are_for_staff(self):
+        self.assertIn(self.client.get("/api/_metrics").status_code, (401, 403))
+        self.client.force_authenticate(self.staff)
+        response = self.client.get("/api/_metrics")
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn("# TYPE fbinb_http_request_duration_ms histogram", text)
+        self.assertIn("fbinb_token_cache_hit_ratio", text)
+
+    def test_slow_queries_are_logged_with_stack(self):
+        with override_settings(SLOW_QUERY_MS=0), self.assertLogs(
+            "config.metrics.slow", "WARNING"
+        ) as logs:
+            self.client.get(f"/api/rooms/{self.room.id}/")
+        self.assertIn("rooms/views.py", logs.output[0])
+
+
+class BenchmarkTest(RoomsTestCase):
+    """A seeded dataset runs through every endpoint without errors."""
+
+    sizes = {
+        "countries": 2,
+        "states": 3,
+        "hosts": 2,
+        "guests": 3,
+        "rooms": 8,
+        "reservations": 80,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(random_seed=1, **cls.sizes)
+
+    def test_seed_rebuilds_what_signals_would(self):
+        self.assertEqual(Room.objects.count(), 8)
+        self.assertEqual(RoomReservation.objects.count(), 80)
+        self.assertEqual(RoomSearchDocument.objects.count(), 8)
+        rated = Room.objects.filter(review_count__gt=0).first()
+        self.assertGreater(rated.total_rating, 0)
+        self.assertEqual(RoomCalendar.objects.count(), 8)
+        reservation = RoomReservation.objects.filter(
+            is_active=True, start_date__gt=timezone.now().date()
+        ).first()
+        self.assertFalse(
+            is_room_available(
+                reservation.room_id, reservation.start_date, reservation.end_date
+            )
+        )
+
+    def test_seed_is_reproducible(self):
+        columns = ("price", "capacity", "room_type", "review_count")
+        first = list(Room.objects.order_by("id").values_list(*columns))
+        seed(random_seed=1, **self.sizes)
+        again = list(Room.objects.order_by("id").values_list(*columns))
+        self.assertEqual(again[len(first) :], first)
+
+    def test_seed_skews_states_and_hosts(self):
+        seed(random_seed=2, countries=1, states=10, hosts=10, rooms=300, reservations=0)
+        rooms = Room.objects.order_by().values_list
+        for column in ("state_id", "host_id"):
+            counts = Counter(rooms(column, flat=True)[8:])
+            ranked = [counts[key] for key in sorted(counts)]
+            self.assertGreater(ranked[0], 3 * ranked[-1])
+
+    def test_report_covers_endpoints(self):
+        only = ("list:price:page:none", "list:total_rating:cursor:dates", "detail")
+        report = benchmark.run(repeat=3, only=only + ("booking", "review"))
+        scenarios = report["scenarios"]
+        self.assertEqual(
+            set(scenarios),
+            {
+                "list:price:page:none",
+                "list:total_rating:cursor:dates",
+                "list:total_rating:cursor:dates+capacity",
+                "detail",
+                "booking",
+                "review",
+            },
+        )
+        for name, result in scenarios.items():
+            self.assertEqual(result["errors"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertEqual(RoomReservation.objects.count(), 80)
+
+    def test_compare_flags_regressions(self):
+        before = {"p95_ms": 10.0, "queries_max": 2, "errors": 0}
+        baseline = {"scenarios": {"detail": before}}
+        slower = {"scenarios": {"detail": dict(before, p95_ms=20.0)}}
+        noisy = {"scenarios": {"detail": dict(before, p95_ms=13.0)}}
+        chattier = {"scenarios": {"detail": dict(before, queries_max=3)}}
+        self.assertEqual(benchmark.compare(noisy, baseline), [])
+        self.assertEqual(len(benchmark.compare(slower, baseline)), 1)
+        self.assertEqual(len(benchmark.compare(chattier, baseline)), 1)
+
+
+class AsyncViewTest(TransactionTestCase):
+    """Read endpoints answer the same through the pooled async adapters."""
+
+    def setUp(self):
+        cache.clear()
+        seed(random_seed=3, countries=1, states=2, hosts=2, guests=2, rooms=4)
+
+    def test_asyncify_adapts_every_view(self):
+        from locations.urls import locations_router
+
+        patterns = asyncify(locations_router.urls, force=True)
+        self.assertTrue(all(iscoroutinefunction(p.callback) for p in patterns))
+        plain = asyncify(locations_router.urls)
+        self.assertFalse(any(iscoroutinefunction(p.callback) for p in plain))
+
+    def test_throughput_modes_serve_without_errors(self):
+        report = benchmark.throughput(requests=9, concurrency=3, latency_ms=0)
+        for mode in ("wsgi", "asgi_sync", "asgi_async"):
+            self.assertEqual(report[mode]["errors"], 0, mode)
+        # the query delay is only hooked in while the benchmark runs
+        self.assertFalse(connection_created.disconnect(benchmark.install_delay))
+        self.assertNotIn(benchmark.delay_query, connection.execute_wrappers)
+
+
+class ConnectionPoolTest(TransactionTestCase):
+    """Pooled connections are reused, bounded and checked before reuse."""
+
+    def connect(self):
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def test_reuses_released_connection(self):
+        pool = Pool(max_size=2)
+        first = pool.acquire(self.connect)
+        pool.release(first)
+        self.assertIs(pool.acquire(self.connect), first)
+        stats = pool.stats()
+        self.assertEqual((stats["created"], stats["reused"]), (1, 1))
+        self.assertEqual((stats["size"], stats["in_use"]), (1, 1))
+
+    def test_times_out_when_exhausted(self):
+        pool = Pool(max_size=1, timeout=0.01)
+        pool.acquire(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_replaces_dead_and_broken_connections(self):
+        pool = Pool(max_size=1, health_check_after=0)
+        dead = pool.acquire(self.connect)
+        pool.release(dead)
+        dead.close()
+        alive = pool.acquire(self.connect)
+        self.assertIsNot(alive, dead)
+        pool.release(alive, reusable=False)
+        self.assertIsNot(pool.acquire(self.connect), alive)
+        self.assertEqual(pool.stats()["discarded"], 2)
+
+    def test_connection_cost_modes(self):
+        State.objects.create(name="Seoul", country=Country.objects.create(name="Korea"))
+        report = benchmark.connection_cost(requests=5, connect_ms=0)
+        for mode in benchmark.CONNECTION_MODES:
+            self.assertEqual(report[mode]["errors"], 0, mode)
+        self.assertEqual(report["pooled"]["pool"]["created"], 1)
+        self.assertIn("fbinb_db_pool_saturation", registry.render())
+
+
+@override_settings(REPLICA_DATABASES=["replica"])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Safe reads go to the replica unless the client just wrote."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="guest", password="pw")
+        state = State.objects.create(
+            name="Seoul", country=Country.objects.create(name="Korea")
+        )
+        self.room = Room.objects.create(
+            host=self.user, title="room", mobile=0, state=state, price=10
+        )
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_reads_replica_until_client_writes(self):
+        url = f"/api/rooms/{self.room.id}/"
+        self.assertGreater(self.replica_queries(url), 0)
+        self.assertGreater(self.replica_queries("/api/locations/state/"), 0)
+        data = {"start_date": "2019-08-01", "end_date": "2019-08-04"}
+        response = self.client.post(f"/api/rooms/{self.room.id}", data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.replica_queries(url), 0)
+        # another worker does not see this one's cache, only the cookie
+        cache.clear()
+        self.assertEqual(self.replica_queries(url), 0)
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertGreater(self.replica_queries(url), 0)
+
+    @override_settings(REPLICA_MAX_LAG=-1)
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.assertEqual(self.replica_queries(f"/api/rooms/{self.room.id}/"), 0)
+
+    def test_booking_checks_primary(self):
+        token = read_alias.set("replica")
+        try:
+            with CaptureQueriesContext(connections["replica"]) as queries:
+                book(self.user, self.room.id, date(2019, 8, 1), date(2019, 8, 4))
+        finally:
+            read_alias.reset(token)
+        self.assertEqual(len(queries), 0)
@@ -1,13 +1,15 @@
 from django.urls import include, path
+from config.async_views import serve
 from rest_framework import routers
 from rooms import views
 from reservations.views import ReservationCreateView
 
 app_name = "rooms"
 urlpatterns = [
-    path("", views.RoomListView.as_view()),
+    path("", serve(views.RoomListView.as_view())),
     path("create/", views.RoomCreateView.as_view()),
     path("<int:pk>", ReservationCreateView.as_view()),
-    path("<int:pk>/", views.RoomDetailView.as_view()),
+    path("<int:pk>/", serve(views.RoomDetailView.as_view())),
+    path("<int:pk>/photos/", views.RoomPhotoListView.as_view()),
     path("update/<int:pk>/", views.RoomUpdateView.as_view()),
 ]
@@ -6,19 +6,27 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import filters
 from rest_framework import status
-from rooms.models import Room
+from rooms.models import Room, RoomPhoto
 from rooms.serializers import (
     RoomListSerializer,
     RoomCreateSerializer,
     RoomDetailSerializer,
+    RoomPhotoSerializer,
+    RoomPhotoCreateSerializer,
 )
 from rooms.filter_backends import (
     CapacityFilterBackend,
     DateFilterBackend,
+    DocumentSearchFilter,
+    FullTextSearchBackend,
     PriceFilterBackend,
 )
 from reservations.views import reservation_validation
-from config.utils import response_error_handler
+from config.cache import CachedResponseMixin, term_tags
+from config.metrics import SerializerMetricsMixin
+from config.pagination import KeysetPagination
+from config.routers import ReplicaReadMixin
+from config.utils import EagerLoadingMixin, response_error_handler
 
 
 class StandardResultSetPagination(PageNumberPagination):
@@ -28,7 +36,19 @@ class StandardResultSetPagination(PageNumberPagination):
     page_size_query_param = "page_size"
 
 
-class RoomListView(generics.ListAPIView):
+class RoomKeysetPagination(KeysetPagination):
+    page_size = 12
+    max_page_size = 100
+    ordering = "updated_at"
+
+
+class RoomListView(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SerializerMetricsMixin,
+    EagerLoadingMixin,
+    generics.ListAPIView,
+):
     """A function, able to get list of Room
     - GET[list]
     Arguments:
@@ -38,9 +58,16 @@ class RoomListView(generics.ListAPIView):
         ordering -- [default update_at, price, updated_at, created_at, total_rating]
         page_size -- [default 12, data amount in page]
         page -- [default 1, page of data-perpage]
+        pagination -- [default page, "cursor" pages by keyset instead of page number]
+        cursor -- [cursor mode only, token from "next" link of previous page]
+        count -- [cursor mode only, "true" adds cached total count]
+        fields -- [default all, comma separated fields to return, id always]
+        omit -- [default none, comma separated fields to leave out]
 
         #filterings-required
         search -- [could come state or country or part of host email]
+        q -- [free text on title, description, address, state and country,
+              typo tolerant, may replace search; ranked by relevance in page mode]
 
         #filterings-Non_required
         min_price -- [default All, filter price greater than input]
@@ -66,26 +93,56 @@ class RoomListView(generics.ListAPIView):
 
     serializer_class = RoomListSerializer
     pagination_class = StandardResultSetPagination
+    pagination_classes = {
+        "page": StandardResultSetPagination,
+        "cursor": RoomKeysetPagination,
+    }
     queryset = Room.objects.all()
     filter_backends = [
-        filters.SearchFilter,
+        DocumentSearchFilter,
         filters.OrderingFilter,
         PriceFilterBackend,
         DateFilterBackend,
         CapacityFilterBackend,
+        FullTextSearchBackend,
     ]
     filterset_fields = ["start_date", "end_date", "min_price", "max_price", "capacity"]
-    search_fields = ["=state__name", "=state__country__name", "^host__username"]
     ordering_fields = ["price", "created_at", "updated_at", "total_rating"]
     ordering = ["updated_at"]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            mode = self.request.query_params.get("pagination", "page")
+            if mode not in self.pagination_classes:
+                raise AttributeError(
+                    "query of pagination not matched",
+                    f"specify in {list(self.pagination_classes)}",
+                )
+            self._paginator = self.pagination_classes[mode]()
+        return self._paginator
+
+    def get_cache_tags(self, request):
+        """The searches a page answers; room writes bump their rooms' terms."""
+        terms = DocumentSearchFilter().get_search_terms(request)
+        terms = [term.lower() for term in terms]
+        scoped = terms and not request.query_params.get("q")
+        dated = request.query_params.get("start_date")
+        if scoped:
+            return term_tags(terms) + (term_tags(terms, "dates:") if dated else [])
+        return ["rooms", "dates"] if dated else ["rooms"]
+
     @response_error_handler
     def get(self, request, *args, **kwargs):
         query_order = request.query_params.get("ordering")
         query_search = request.query_params.get("search")
+        query_text = request.query_params.get("q")
         page = request.query_params.get("page")
         page_size = request.query_params.get("page_size")
-        if not all([query_search, query_order, page, page_size]):
+        cursor_mode = isinstance(self.paginator, KeysetPagination)
+        if not all(
+            [query_search or query_text, query_order, page or cursor_mode, page_size]
+        ):
             raise AttributeError("all Query string not specified", "?ordering=price")
         if query_order not in self.ordering_fields:
             raise AttributeError(
@@ -158,11 +215,20 @@ class RoomUpdateView(generics.UpdateAPIView):
             raise PermissionError("you are no host or staff", "dont do it")
 
 
-class RoomDetailView(generics.RetrieveAPIView):
+class RoomDetailView(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SerializerMetricsMixin,
+    EagerLoadingMixin,
+    generics.RetrieveAPIView,
+):
     """A function, able to GET Room Detail data
     - GET
     Arguments:
         viewsets {[RetrieveAPIView]} -- [GET handler]
+    QuerystringOptions:
+        fields -- [default all, comma separated fields to return, id always]
+        omit -- [default none, comma separated fields to leave out]
     Raises:
         ValueError: [GET-HTTP_404_NOT_FOUND]
     Returns:
@@ -196,12 +262,75 @@ class RoomDetailView(generics.RetrieveAPIView):
 
     serializer_class = RoomDetailSerializer
     permission_classes = (AllowAny,)
+    queryset = Room.objects.all()
+
+    def get_cache_tags(self, request):
+        return [f"room:{self.kwargs['pk']}"]
+
+    @response_error_handler
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class RoomPhotoListView(
+    CachedResponseMixin, SerializerMetricsMixin, generics.ListCreateAPIView
+):
+    """A function, able to page through and add photos of a Room
+    - GET[list]
+    Arguments:
+        generics {[ListCreateAPIView]} -- [GET, POST handler]
+    QuerystringOptions:
+        page_size -- [default 12, data amount in page]
+        page -- [default 1, page of data-perpage]
+    Returns:
+        [status] -- [GET-HTTP_200_OK]
+
+    - POST(create)
+    multipart form of image, photo_type and order, by host or staff only
+    Raises:
+        ValueError: [POST-HTTP_400_BAD_REQUEST]
+        PermissionError: [POST-HTTP_401_UNAUTHORIZED]
+        ValidationError: [POST-HTTP_400_BAD_REQUEST]
+    Returns:
+        [status] -- [POST-HTTP_201_CREATED]
+    """
+
+    pagination_class = StandardResultSetPagination
+
+    def get_permissions(self):
+        if self.request.method == "POST":
+            return [IsAuthenticated()]
+        return [AllowAny()]
+
+    def get_serializer_class(self):
+        if self.request.method == "POST":
+            return RoomPhotoCreateSerializer
+        return RoomPhotoSerializer
 
     def get_queryset(self):
-        room_id = self.kwargs.get("pk", None)
-        queryset = Room.objects.filter(id=room_id)
-        return queryset
+        columns = RoomPhotoSerializer.columns()
+        return RoomPhoto.objects.filter(room_id=self.kwargs["pk"]).only(*columns)
+
+    def get_cache_tags(self, request):
+        return [f"room:{self.kwargs['pk']}"]
 
     @response_error_handler
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
+
+    @response_error_handler
+    def post(self, request, *args, **kwargs):
+        host_id = (
+            Room.objects.filter(id=self.kwargs["pk"])
+            .values_list("host_id", flat=True)
+            .first()
+        )
+        if host_id is None:
+            raise ValueError("room does not exist", "check room id")
+        if not (
+            request.user.id == host_id
+            or request.user.is_staff
+            or request.user.is_superuser
+        ):
+            raise PermissionError("you are no host or staff", "dont do it")
+        return super().post(request, *args, **kwargs)